@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+OCR em lote das sondagens de uma área selecionada no canvas (sem Qt)
+O retângulo arrastado pelo usuário é lido do raster uma única vez (com a
+margem de meio recorte); as sondagens candidatas são localizadas na própria
+janela pelo mesmo detector do índice de texto e os recortes saem da janela
+em memória, sem novas leituras do GDAL. O OCR roda em paralelo em um pool
+que compartilha o OCRPipeline, e os resultados voltam todos de uma vez para
+a revisão em tabela.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import raster_io
+from . import text_index
+from . import result_store
+from .point_batch import STATUS_OK, STATUS_LOW_CONFIDENCE, STATUS_FAILED, review
+from .ocr_pipeline import OCRPipeline
+
+# Acima deste número de pixels a seleção não é lida de uma vez (use o lote das cartas do projeto)
+MAX_AREA_PIXELS = 64 * 1024 * 1024
+
+
+def _no_progress(message, percent):
+    pass
+
+
+def _never_cancelled():
+    return False
+
+
+class AreaBatch:
+    """Localiza e lê todas as sondagens de uma janela retangular de um raster"""
+
+    def __init__(self, pipeline, raster_path, clip_size=96, workers=None, store=None, prior=None,
+                 min_score=OCRPipeline.LOW_CONFIDENCE_SCORE):
+        """
+        :param pipeline: OCRPipeline compartilhado por todos os workers.
+        :param store: ResultStore opcional (reaproveita janelas já analisadas e guarda o
+            id de cada recorte para o veredito da revisão).
+        :param prior: DepthPrior opcional (estimativa pelas sondagens já capturadas).
+        :param min_score: Score abaixo do qual a leitura fica desmarcada na revisão.
+        """
+        self.pipeline = pipeline
+        self.raster_path = raster_path
+        self.clip_size = clip_size
+        self.workers = workers or pipeline.governor.workers
+        self.store = store
+        self.prior = prior
+        self.min_score = min_score
+        self.stats = {}
+        self._fingerprint = None
+        self._config = None
+
+    # ---------- Detecção ----------
+    def _read_area(self, dataset, window):
+        """Lê a seleção com margem de meio recorte. Retorna (imagem, x0, y0) ou None se vazia."""
+        half = self.clip_size // 2
+        x0, y0, x1, y1 = window
+        x0, y0 = max(0, int(x0) - half), max(0, int(y0) - half)
+        x1, y1 = min(dataset.RasterXSize, int(x1) + half), min(dataset.RasterYSize, int(y1) + half)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        if (x1 - x0) * (y1 - y0) > MAX_AREA_PIXELS:
+            raise RuntimeError("Área selecionada grande demais: use o processamento das cartas do projeto")
+        return raster_io.read_window(dataset, x0, y0, x1 - x0, y1 - y0), x0, y0
+
+    def detect(self, area, window):
+        """TextIndex (em pixels da carta) das sondagens com centro dentro da seleção"""
+        img, origin_x, origin_y = area
+        x0, y0, x1, y1 = window
+        rows = []
+        for bx0, by0, bx1, by1, glyph_height, n_glyphs, orientation in text_index.find_soundings(
+                self.pipeline._to_gray(img), self.clip_size):
+            cx, cy = origin_x + (bx0 + bx1) / 2.0, origin_y + (by0 + by1) / 2.0
+            if x0 <= cx < x1 and y0 <= cy < y1:
+                rows.append((origin_x + bx0, origin_y + by0, origin_x + bx1, origin_y + by1, glyph_height, n_glyphs,
+                             orientation))
+        return text_index.TextIndex(self.raster_path, rows, [], self.clip_size)
+
+    @staticmethod
+    def _crop(area, px, py, size):
+        """Recorte quadrado centrado no pixel a partir da janela em memória; None se não couber."""
+        img, origin_x, origin_y = area
+        x, y = px - size // 2 - origin_x, py - size // 2 - origin_y
+        if x < 0 or y < 0 or y + size > img.shape[0] or x + size > img.shape[1]:
+            return None
+        return img[y:y + size, x:x + size]
+
+    # ---------- Leitura ----------
+    @staticmethod
+    def _failed_result(key, index, geotransform):
+        px, py = index.center(key)
+        x, y = raster_io.pixel_to_map(geotransform, px + 0.5, py + 0.5)
+        return {'key': key, 'x': x, 'y': y, 'px': px, 'py': py, 'depth_cm': None, 'score': None,
+                'status': STATUS_FAILED, 'clip_id': None}
+
+    def _read_sounding(self, key, index, area, geotransform, is_cancelled):
+        if is_cancelled():
+            return None
+        result = self._failed_result(key, index, geotransform)
+        px, py, x, y = result['px'], result['py'], result['x'], result['y']
+        size = index.clip_size_for(key, self.pipeline.CLIP_SIZES, self.clip_size)
+        clip = self._crop(area, px, py, size)
+        if clip is None:
+            return result
+        region = index.region_in_clip(key, px, py, size)
+
+        stored = None
+        if self._fingerprint is not None:
+            stored = self.store.lookup(self._fingerprint, px, py, size, result_store.config_hash(self._config))
+        if stored is not None and stored['verdict'] != result_store.VERDICT_REJECTED and stored['chosen_cm'] is not None:
+            corrected = stored['verdict'] == result_store.VERDICT_CORRECTED
+            depth_cm, score = stored['final_cm'] if corrected else stored['chosen_cm'], stored['score']
+            result['clip_id'] = stored['id']
+            result['resumed'] = True
+            # Valores já confirmados pelo usuário entram marcados na revisão
+            confirmed = stored['verdict'] in (result_store.VERDICT_ACCEPTED, result_store.VERDICT_CORRECTED)
+        else:
+            prior = self.prior.estimate(x, y) if self.prior is not None else None
+            # O pool já ocupa os workers: as variantes de cada sondagem rodam em série
+            outcome = self.pipeline.process(clip, region, x_m=x, y_m=y, is_cancelled=is_cancelled, workers=1,
+                                            prior=prior)
+            if outcome is None:
+                return None
+            depth_cm, candidates = outcome
+            score = self.pipeline._best_score(candidates, prior)
+            confirmed = False
+            if self._fingerprint is not None:
+                result['clip_id'] = self.store.save_result(
+                    self._fingerprint, px, py, size, self._config, depth_cm, candidates, score=score,
+                    img_hash=result_store.clip_hash(clip), x_m=x, y_m=y)
+
+        if depth_cm not in (None, OCRPipeline.OCR_FAILED):
+            result['depth_cm'] = depth_cm
+            result['score'] = score
+            result['status'] = STATUS_OK if confirmed or (score or 0.0) >= self.min_score else STATUS_LOW_CONFIDENCE
+        return result
+
+    def run(self, window, progress=_no_progress, is_cancelled=_never_cancelled):
+        """
+        Processa a seleção window = (x0, y0, x1, y1) em pixels do raster. Retorna os
+        resultados (dicts com key, x, y, px, py, depth_cm, score, status, clip_id) na
+        ordem de leitura da carta, ou None se cancelado.
+        """
+        self.stats = {'soundings': 0, 'ok': 0, 'review': 0, 'failed': 0, 'resumed': 0}
+        dataset = raster_io.gdal.Open(self.raster_path, raster_io.gdal.GA_ReadOnly)
+        if dataset is None:
+            raise RuntimeError(f"Não foi possível abrir o raster com GDAL: {self.raster_path}")
+        progress("🗺️ Lendo a área selecionada...", 2)
+        area = self._read_area(dataset, window)
+        geotransform = dataset.GetGeoTransform()
+        if self.store is not None:
+            self._config = self.pipeline.config_signature()
+            self._fingerprint = self.store.raster_fingerprint(self.raster_path, dataset.RasterXSize,
+                                                              dataset.RasterYSize)
+        dataset = None
+        if area is None:
+            return []
+
+        progress("🔢 Localizando as sondagens da área...", 5)
+        index = self.detect(area, window)
+        self.stats['soundings'] = len(index)
+        if is_cancelled():
+            return None
+        if not len(index):
+            return []
+        self.pipeline._get_easyocr_reader()
+        progress(f"🔢 {len(index)} sondagem(ns) encontradas. Iniciando OCR...", 10)
+
+        results = [None] * len(index)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._read_sounding, key, index, area, geotransform, is_cancelled): key
+                       for key in range(len(index))}
+            for done, future in enumerate(as_completed(futures), 1):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    # A sondagem com erro aparece na tabela como falha e o lote segue
+                    print(f"⚠️ Erro na sondagem {key} da área: {e}")
+                    results[key] = self._failed_result(key, index, geotransform)
+                if is_cancelled():
+                    for pending in futures:
+                        pending.cancel()
+                    return None
+                progress(f"🤖 OCR das sondagens: {done}/{len(index)}", 10 + int(done / len(index) * 88))
+        if any(r is None for r in results):
+            return None
+
+        # Ordem de leitura da carta: faixas de uma altura de recorte, da esquerda para a direita
+        results.sort(key=lambda r: (r['py'] // self.clip_size, r['px']))
+        self.stats['ok'] = sum(1 for r in results if r['status'] == STATUS_OK)
+        self.stats['failed'] = sum(1 for r in results if r['status'] == STATUS_FAILED)
+        self.stats['review'] = len(review(results))
+        self.stats['resumed'] = sum(1 for r in results if r.get('resumed'))
+        return results
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark offline do pipeline OCR com cartas náuticas sintéticas
+Gera recortes reproduzíveis (tintas de profundidade, isóbatas, sondagens
+rotacionadas e ruído) com gabarito conhecido e mede, para cada configuração,
+latência p50/p95, recortes/s, pico de memória (RSS) e acurácia.
+
+Uso (a partir da pasta de plugins do QGIS, com o Python do QGIS):
+    python -m deep_reader_ocr.benchmark --clips 200 --output base.json
+    python -m deep_reader_ocr.benchmark --configs minhas_configs.json --output novo.json
+    python -m deep_reader_ocr.benchmark --compare base.json novo.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime
+
+import numpy as np
+
+from .ocr_pipeline import OCRPipeline, EASYOCR_AVAILABLE, TESSERACT_AVAILABLE, cv2
+from .instrumentation import NULL_TRACE
+
+REPORT_SCHEMA = 1
+DEFAULT_SEED = 1234
+DEFAULT_CLIP_SIZE = 96
+
+# Configurações comparadas por padrão (as chaves espelham a aba Avançado)
+BENCHMARK_CONFIGS = {
+    "padrao": {
+        "rotations": [-90, -45, 0, 45, 90, 180, 270],
+        "filters": {"clahe": True, "gaussian": True, "mean": True},
+        "ocr_backend": "torch",
+        "use_click_roi": True,
+        "adaptive_clip": True,
+    },
+    "legado": {
+        "rotations": [-90, -45, 0, 45, 90, 180, 270],
+        "filters": {"clahe": True, "gaussian": True, "mean": True},
+        "ocr_backend": "torch",
+        "use_click_roi": False,
+        "adaptive_clip": False,
+    },
+    # Filtros de threshold antes da rotação (mais rápido, resultado aproximado): só vira
+    # padrão se a acurácia empatar com a das demais configurações
+    "filtro_antes_rotacao": {
+        "rotations": [-90, -45, 0, 45, 90, 180, 270],
+        "filters": {"clahe": True, "gaussian": True, "mean": True},
+        "ocr_backend": "torch",
+        "use_click_roi": True,
+        "adaptive_clip": True,
+        "filter_before_rotate": True,
+    },
+    "onnx_int8": {
+        "rotations": [-90, -45, 0, 45, 90, 180, 270],
+        "filters": {"clahe": True, "gaussian": True, "mean": True},
+        "ocr_backend": "onnx_int8",
+        "use_click_roi": True,
+        "adaptive_clip": True,
+    },
+    "sem_cascata": {
+        "rotations": [-90, -45, 0, 45, 90, 180, 270],
+        "filters": {"clahe": True, "gaussian": True, "mean": True},
+        "ocr_backend": "torch",
+        "use_click_roi": True,
+        "adaptive_clip": True,
+        "cascade": {"enabled": False},
+    },
+    "tesseract_primeiro": {
+        "rotations": [-90, -45, 0, 45, 90, 180, 270],
+        "filters": {"clahe": True, "gaussian": True, "mean": True},
+        "ocr_backend": "torch",
+        "use_click_roi": True,
+        "adaptive_clip": True,
+        "cascade": {"order": ["tesseract", "easyocr"]},
+    },
+    "tesseract_por_variante": {
+        "rotations": [-90, -45, 0, 45, 90, 180, 270],
+        "filters": {"clahe": True, "gaussian": True, "mean": True},
+        "ocr_backend": "torch",
+        "use_click_roi": True,
+        "adaptive_clip": True,
+        "tesseract_montage": False,
+    },
+    "sem_separacao_de_cor": {
+        "rotations": [-90, -45, 0, 45, 90, 180, 270],
+        "filters": {"clahe": True, "gaussian": True, "mean": True},
+        "ocr_backend": "torch",
+        "use_click_roi": True,
+        "adaptive_clip": True,
+        "color_separation": False,
+    },
+    "sem_consenso": {
+        "rotations": [-90, -45, 0, 45, 90, 180, 270],
+        "filters": {"clahe": True, "gaussian": True, "mean": True},
+        "ocr_backend": "torch",
+        "use_click_roi": True,
+        "adaptive_clip": True,
+        "scoring": {"CONSENSUS_WEIGHT": 0.0, "CONSENSUS_STOP_VOTES": 0},
+    },
+    "rapido": {
+        "rotations": [-90, 0, 90],
+        "filters": {"clahe": True},
+        "ocr_backend": "torch",
+        "use_click_roi": True,
+        "adaptive_clip": True,
+    },
+}
+
+# Tintas das cartas da Marinha (RGB): branco, azul claro e azuis de áreas rasas
+CHART_TINTS = [(255, 255, 255), (214, 236, 248), (190, 224, 244), (166, 210, 238)]
+CONTOUR_COLORS = [(90, 90, 90), (60, 110, 170), (170, 60, 150)]
+# Fontes Hershey que mais se aproximam das sondagens (itálico sem serifa)
+CHART_FONTS = [
+    cv2.FONT_HERSHEY_SIMPLEX | cv2.FONT_ITALIC,
+    cv2.FONT_HERSHEY_DUPLEX | cv2.FONT_ITALIC,
+    cv2.FONT_HERSHEY_SIMPLEX,
+    cv2.FONT_HERSHEY_COMPLEX_SMALL | cv2.FONT_ITALIC,
+] if cv2 is not None else []
+SOUNDING_ANGLES = [0, 0, 0, 0, -45, 45, -90, 90]
+
+
+# ============== GERAÇÃO DE CARTAS SINTÉTICAS ==============
+def _random_depth(rng):
+    n_digits = rng.choice([1, 2, 3], p=[0.35, 0.5, 0.15])
+    low, high = {1: (1, 9), 2: (10, 99), 3: (100, 999)}[n_digits]
+    return int(rng.integers(low, high + 1))
+
+
+def _render_text_layer(text, rng, size, angle, center):
+    """Desenha o texto numa camada (máscara 0-255) rotacionada em torno do próprio centro"""
+    font = CHART_FONTS[int(rng.integers(len(CHART_FONTS)))]
+    glyph_height = float(rng.uniform(9, 16))
+    base_height = cv2.getTextSize("0", font, 1.0, 1)[0][1]
+    scale = glyph_height / base_height
+    thickness = 1 if glyph_height < 13 else 2
+    (text_w, text_h), _ = cv2.getTextSize(text, font, scale, thickness)
+
+    layer = np.zeros((size, size), dtype=np.uint8)
+    origin = (int(center[0] - text_w / 2), int(center[1] + text_h / 2))
+    cv2.putText(layer, text, origin, font, scale, 255, thickness, cv2.LINE_AA)
+    if angle:
+        M = cv2.getRotationMatrix2D((float(center[0]), float(center[1])), angle, 1.0)
+        layer = cv2.warpAffine(layer, M, (size, size), flags=cv2.INTER_LINEAR, borderValue=0)
+    return layer
+
+
+def render_chart_clip(rng, size=DEFAULT_CLIP_SIZE):
+    """
+    Gera um recorte RGB de carta náutica com a sondagem gabarito no centro.
+    Retorna (imagem RGB uint8, profundidade em metros).
+    """
+    ys, xs = np.mgrid[0:size, 0:size]
+
+    # Duas tintas separadas por uma isóbata suave
+    tint_a, tint_b = rng.choice(len(CHART_TINTS), size=2, replace=False)
+    amplitude, freq, phase = rng.uniform(3, 15), rng.uniform(0.02, 0.08), rng.uniform(0, 2 * np.pi)
+    offset = rng.uniform(0.15, 0.85) * size
+    boundary = offset + amplitude * np.sin(xs * freq + phase)
+    img = np.where((ys > boundary)[..., None], np.array(CHART_TINTS[tint_a], np.uint8), np.array(CHART_TINTS[tint_b], np.uint8)).astype(np.uint8)
+
+    # Isóbata desenhada (às vezes tracejada) e uma segunda linha de contorno
+    contour_color = CONTOUR_COLORS[int(rng.integers(len(CONTOUR_COLORS)))]
+    curve_x = np.arange(size)
+    curve_y = (offset + amplitude * np.sin(curve_x * freq + phase)).astype(np.int32)
+    points = np.stack([curve_x, curve_y], axis=1).reshape(-1, 1, 2)
+    if rng.random() < 0.5:
+        for start in range(0, size, 8):
+            cv2.polylines(img, [points[start:start + 5]], False, contour_color, 1, cv2.LINE_AA)
+    else:
+        cv2.polylines(img, [points], False, contour_color, 1, cv2.LINE_AA)
+    if rng.random() < 0.4:
+        y_line = int(rng.uniform(0, size))
+        cv2.line(img, (0, y_line), (size - 1, int(y_line + rng.uniform(-20, 20))), contour_color, 1, cv2.LINE_AA)
+
+    # Sondagem gabarito perto do centro (o clique nunca é perfeito)
+    depth = _random_depth(rng)
+    angle = SOUNDING_ANGLES[int(rng.integers(len(SOUNDING_ANGLES)))]
+    center = (size / 2 + rng.uniform(-3, 3), size / 2 + rng.uniform(-3, 3))
+    ink = _render_text_layer(str(depth), rng, size, angle, center)
+
+    # Sondagem vizinha (distração), como acontece nas cartas densas
+    if rng.random() < 0.5:
+        direction = rng.uniform(0, 2 * np.pi)
+        distance = rng.uniform(0.3, 0.42) * size
+        neighbor_center = (size / 2 + distance * np.cos(direction), size / 2 + distance * np.sin(direction))
+        neighbor = _render_text_layer(str(_random_depth(rng)), rng, size, 0, neighbor_center)
+        ink = np.maximum(ink, neighbor)
+
+    ink_color = np.array([int(rng.integers(10, 45))] * 3, dtype=np.float32)
+    alpha = (ink.astype(np.float32) / 255.0)[..., None]
+    img = img.astype(np.float32) * (1 - alpha) + ink_color * alpha
+
+    # Ruído de digitalização e leve desfoque
+    img += rng.normal(0, 6, img.shape)
+    img = cv2.GaussianBlur(np.clip(img, 0, 255).astype(np.uint8), (3, 3), 0.6)
+    return img, depth
+
+
+def generate_dataset(n_clips, seed=DEFAULT_SEED, size=DEFAULT_CLIP_SIZE):
+    """Conjunto determinístico de (recorte, profundidade) para uma semente"""
+    rng = np.random.default_rng(seed)
+    return [render_chart_clip(rng, size) for _ in range(n_clips)]
+
+
+def center_crop(img, size):
+    """Simula a leitura GDAL de uma janela menor centrada no clique"""
+    full = img.shape[0]
+    if size > full:
+        return None
+    start = (full - size) // 2
+    return img[start:start + size, start:start + size]
+
+
+# ============== EXECUÇÃO ==============
+def _peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta em KB, macOS em bytes
+        return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024.0 * 1024.0)
+    except ImportError:
+        return None
+
+
+def build_pipeline(config):
+    return OCRPipeline.from_config(config)
+
+
+def _run_clip(pipeline, clip, max_size, trace=NULL_TRACE):
+    if pipeline.adaptive_clip:
+        read_clip = lambda size: center_crop(clip, size)
+        with trace.stage("adaptive_clip"):
+            img, region, size = pipeline.select_adaptive_clip(read_clip, max_size)
+        clip_loader = pipeline.make_clip_loader(read_clip, size, max_size)
+    else:
+        img, region, clip_loader = clip, None, None
+    return pipeline.process(img, region, clip_loader, trace=trace)
+
+
+def run_config(config, dataset, verbose=False):
+    """Executa uma configuração sobre o conjunto e retorna as métricas"""
+    sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        t0 = time.perf_counter()
+        pipeline = build_pipeline(config)
+        pipeline._get_easyocr_reader()
+        load_s = time.perf_counter() - t0
+
+        max_size = dataset[0][0].shape[0] if dataset else DEFAULT_CLIP_SIZE
+        # Aquecimento fora da medição (alocações e caches das engines)
+        if dataset:
+            _run_clip(pipeline, dataset[0][0], max_size)
+            pipeline.engine_stats.reset()
+
+        latencies, correct, failures, n_candidates = [], 0, 0, []
+        wall_start = time.perf_counter()
+        for clip, depth in dataset:
+            start = time.perf_counter()
+            result, candidates = _run_clip(pipeline, clip, max_size)
+            latencies.append(time.perf_counter() - start)
+            n_candidates.append(len(candidates))
+            if result == OCRPipeline.OCR_FAILED:
+                failures += 1
+            elif result == depth * 100:
+                correct += 1
+        wall_s = time.perf_counter() - wall_start
+
+    latencies_ms = np.array(latencies) * 1000.0 if latencies else np.zeros(1)
+    n = len(dataset)
+    peak_rss = _peak_rss_mb()
+    return {
+        "config": config,
+        # O backend pode cair para PyTorch se o onnxruntime não estiver instalado
+        "effective_backend": pipeline.ocr_backend,
+        "clips": n,
+        "engine_load_s": round(load_s, 3),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies_ms, 50)), 2),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 2),
+            "mean": round(float(latencies_ms.mean()), 2),
+            "max": round(float(latencies_ms.max()), 2),
+        },
+        "clips_per_sec": round(n / wall_s, 3) if wall_s > 0 else None,
+        "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+        "accuracy": round(correct / n, 4) if n else None,
+        "failures": failures,
+        "mean_candidates": round(float(np.mean(n_candidates)), 2) if n_candidates else 0.0,
+        # Execuções, pulos da cascata e taxas de acerto por engine
+        "engines": pipeline.engine_stats.snapshot()["engines"],
+    }
+
+
+def _run_isolated(name, config, args):
+    """Roda a configuração em um processo separado para que o pico de RSS seja só dela"""
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, "config.json")
+        output_path = os.path.join(tmp, "result.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump({name: config}, f)
+        cmd = [sys.executable, "-m", __spec__.name, "--configs", config_path, "--in-process",
+               "--clips", str(args.clips), "--seed", str(args.seed), "--clip-size", str(args.clip_size),
+               "--output", output_path]
+        package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        completed = subprocess.run(cmd, cwd=package_parent, capture_output=not args.verbose, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Configuração '{name}' falhou:\n{completed.stderr or ''}")
+        with open(output_path, "r", encoding="utf-8") as f:
+            return json.load(f)["configs"][name]
+
+
+def run_benchmark(configs, args):
+    report = {
+        "schema": REPORT_SCHEMA,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "seed": args.seed,
+        "clips": args.clips,
+        "clip_size": args.clip_size,
+        "platform": {
+            "python": platform.python_version(),
+            "system": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__ if cv2 is not None else None,
+        },
+        "engines": {"easyocr": EASYOCR_AVAILABLE, "tesseract": TESSERACT_AVAILABLE},
+        "configs": {},
+    }
+    dataset = generate_dataset(args.clips, args.seed, args.clip_size) if args.in_process else None
+    for name, config in configs.items():
+        print(f"⏱️ Executando configuração '{name}'...", file=sys.stderr)
+        if args.in_process:
+            report["configs"][name] = run_config(config, dataset, args.verbose)
+        else:
+            report["configs"][name] = _run_isolated(name, config, args)
+        metrics = report["configs"][name]
+        print(f"   p50={metrics['latency_ms']['p50']}ms p95={metrics['latency_ms']['p95']}ms "
+              f"{metrics['clips_per_sec']} recortes/s acurácia={metrics['accuracy']} RSS={metrics['peak_rss_mb']}MB",
+              file=sys.stderr)
+    return report
+
+
+# ============== COMPARAÇÃO ==============
+def _delta(old, new, higher_is_better):
+    if old is None or new is None:
+        return "n/d"
+    if old == 0:
+        return f"{new}"
+    change = (new - old) / abs(old) * 100.0
+    better = change > 0 if higher_is_better else change < 0
+    marker = "✅" if better and abs(change) >= 1 else ("❌" if abs(change) >= 1 else "≈")
+    return f"{old} → {new} ({change:+.1f}%) {marker}"
+
+
+def compare_reports(base, new):
+    """Retorna um resumo textual das diferenças entre dois relatórios"""
+    lines = []
+    if base.get("seed") != new.get("seed") or base.get("clips") != new.get("clips"):
+        lines.append("⚠️ Relatórios com semente/quantidade de recortes diferentes: comparação aproximada")
+    for name in sorted(set(base["configs"]) & set(new["configs"])):
+        old_m, new_m = base["configs"][name], new["configs"][name]
+        lines.append(f"[{name}]")
+        lines.append(f"  latência p50 (ms): {_delta(old_m['latency_ms']['p50'], new_m['latency_ms']['p50'], False)}")
+        lines.append(f"  latência p95 (ms): {_delta(old_m['latency_ms']['p95'], new_m['latency_ms']['p95'], False)}")
+        lines.append(f"  recortes/s:        {_delta(old_m['clips_per_sec'], new_m['clips_per_sec'], True)}")
+        lines.append(f"  acurácia:          {_delta(old_m['accuracy'], new_m['accuracy'], True)}")
+        lines.append(f"  pico RSS (MB):     {_delta(old_m['peak_rss_mb'], new_m['peak_rss_mb'], False)}")
+    missing = set(base["configs"]) ^ set(new["configs"])
+    if missing:
+        lines.append(f"ℹ️ Configurações presentes em apenas um relatório: {', '.join(sorted(missing))}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline do Depth Reader OCR com cartas sintéticas")
+    parser.add_argument("--clips", type=int, default=100, help="Quantidade de recortes sintéticos")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Semente do gerador (reprodutibilidade)")
+    parser.add_argument("--clip-size", type=int, default=DEFAULT_CLIP_SIZE, help="Tamanho máximo do recorte (pixels)")
+    parser.add_argument("--configs", help="JSON com {nome: configuração}; padrão: configurações embutidas")
+    parser.add_argument("--only", help="Executa apenas as configurações listadas (separadas por vírgula)")
+    parser.add_argument("--output", help="Arquivo JSON do relatório (padrão: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NOVO"), help="Compara dois relatórios")
+    parser.add_argument("--in-process", action="store_true", help="Não isola cada configuração em um subprocesso")
+    parser.add_argument("--verbose", action="store_true", help="Mostra a saída do pipeline")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], "r", encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.compare[1], "r", encoding="utf-8") as f:
+            new = json.load(f)
+        print(compare_reports(base, new))
+        return 0
+
+    if cv2 is None:
+        print("❌ OpenCV não disponível: o benchmark precisa do opencv-python", file=sys.stderr)
+        return 1
+
+    configs = BENCHMARK_CONFIGS
+    if args.configs:
+        with open(args.configs, "r", encoding="utf-8") as f:
+            configs = json.load(f)
+    if args.only:
+        wanted = [name.strip() for name in args.only.split(",")]
+        configs = {name: configs[name] for name in wanted}
+
+    report = run_benchmark(configs, args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"💾 Relatório salvo em: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
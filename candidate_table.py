@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Tabela colunar de candidatos de um clique (sem Qt)
+As leituras das engines são guardadas em um array estruturado numpy (valor,
+engine, variante, confiança, comprimento, score) em vez de tuplas. O score
+de cada leitura é calculado em bloco ao inserir, e os agregados por valor
+(melhor score, número de variantes que leram o valor e primeira leitura do
+valor) são atualizados de forma incremental: o ranking com o voto de consenso entre ângulos/filtros
+custa O(valores possíveis) e pode ser consultado após cada variante.
+"""
+
+import re
+
+import numpy as np
+
+# Valores de profundidade aceitos (metros inteiros, 1 a 3 dígitos)
+MAX_VALUE = 999
+MAX_DIGITS = 3
+
+ROW_DTYPE = np.dtype([
+    ('value', np.int64),        # dígitos lidos como inteiro (o texto é refeito com o comprimento)
+    ('length', np.int8),        # número de dígitos lidos (preserva zeros à esquerda)
+    ('engine', np.int8),        # índice em CandidateTable.engines
+    ('variant', np.int16),      # índice em CandidateTable.variants (ângulo, filtro)
+    ('confidence', np.float32),
+    ('score', np.float32),      # score individual (sem consenso); -inf se inválido
+])
+
+
+class CandidateTable:
+    """
+    Candidatos de um clique com pontuação vetorizada. Iterar a tabela produz as
+    tuplas (texto, engine, ângulo, filtro, confiança, comprimento) usadas pelo
+    banco de resultados e pelas ferramentas headless.
+    """
+
+    def __init__(self, scoring, prior=None, capacity=64):
+        """
+        :param scoring: objeto com as constantes de pontuação (o OCRPipeline).
+        :param prior: DepthEstimate da vizinhança (opcional).
+        """
+        self.scoring = scoring
+        self.prior = prior
+        self.engines = []
+        self.variants = []
+        self._engine_codes = {}
+        self._variant_codes = {}
+        self._rows = np.zeros(capacity, dtype=ROW_DTYPE)
+        self._size = 0
+        # Agregados por valor: melhor score individual e variantes que leram o valor
+        self._best = np.full(MAX_VALUE + 1, -np.inf, dtype=np.float32)
+        self._votes = np.zeros(MAX_VALUE + 1, dtype=np.int32)
+        self._voted = set()
+        # Linha da primeira leitura de cada valor: desempate por ordem de chegada
+        self._first = np.full(MAX_VALUE + 1, np.iinfo(np.int64).max, dtype=np.int64)
+        # Fatores constantes por valor (profundidades comuns x vizinhança)
+        self._value_factor = self._build_value_factor()
+
+    @classmethod
+    def from_rows(cls, scoring, rows, prior=None):
+        table = cls(scoring, prior)
+        table.extend(rows)
+        return table
+
+    # ---------- Inserção ----------
+    def _build_value_factor(self):
+        values = np.arange(MAX_VALUE + 1, dtype=np.float64)
+        common = np.zeros(MAX_VALUE + 1, dtype=bool)
+        common[np.array([v for v in self.scoring.common_depths if 0 <= v <= MAX_VALUE], dtype=np.int64)] = True
+        factor = np.where(common, self.scoring.COMMON_DEPTH_BONUS, self.scoring.UNCOMMON_DEPTH_PENALTY)
+        if self.prior is not None:
+            deviation = np.abs(values - self.prior.depth_m) / self.prior.tolerance_m
+            bonus, floor = self.scoring.PRIOR_BONUS, self.scoring.PRIOR_MIN_FACTOR
+            factor = factor * np.where(deviation <= 1.0, bonus, np.maximum(floor, bonus / np.maximum(deviation, 1.0)))
+        return factor.astype(np.float32)
+
+    def _code(self, codes, names, key):
+        code = codes.get(key)
+        if code is None:
+            code = codes[key] = len(names)
+            names.append(key)
+        return code
+
+    def _grow(self, needed):
+        if self._size + needed > len(self._rows):
+            rows = np.zeros(max(2 * len(self._rows), self._size + needed), dtype=ROW_DTYPE)
+            rows[:self._size] = self._rows[:self._size]
+            self._rows = rows
+
+    def extend(self, rows):
+        """Acrescenta leituras (texto, engine, ângulo, filtro, confiança, comprimento)"""
+        parsed = []
+        for text, method, angle, pp_name, confidence, *_ in rows:
+            digits = re.sub(r'[^\d]', '', str(text))
+            if not digits:
+                continue
+            parsed.append((int(digits[:18]), min(len(digits), 127),
+                           self._code(self._engine_codes, self.engines, method),
+                           self._code(self._variant_codes, self.variants, (angle, pp_name)), confidence))
+        if not parsed:
+            return
+        self._grow(len(parsed))
+        block = self._rows[self._size:self._size + len(parsed)]
+        for name, column in zip(('value', 'length', 'engine', 'variant', 'confidence'), zip(*parsed)):
+            block[name] = column
+        self._score(block, self._size)
+        self._size += len(parsed)
+
+    def _score(self, block, offset):
+        """Score individual vetorizado e atualização incremental dos agregados por valor"""
+        value, length = block['value'], block['length']
+        valid = (length >= 1) & (length <= MAX_DIGITS) & (value >= 1) & (value <= MAX_VALUE)
+        calibration = np.array([self.scoring.engine_calibration(name) for name in self.engines], dtype=np.float32)
+        safe_value = np.where(valid, value, 0)
+        score = (block['confidence'] * calibration[block['engine']] * self._value_factor[safe_value] +
+                 length * self.scoring.TEXT_LENGTH_BONUS_FACTOR)
+        block['score'] = np.where(valid, score, -np.inf)
+
+        values, scores, variants = value[valid], block['score'][valid], block['variant'][valid]
+        np.maximum.at(self._best, values, scores)
+        np.minimum.at(self._first, values, offset + np.nonzero(valid)[0])
+        # Consenso: cada variante vota uma vez em cada valor que leu
+        for v, variant in set(zip(values.tolist(), variants.tolist())):
+            if (v, variant) not in self._voted:
+                self._voted.add((v, variant))
+                self._votes[v] += 1
+
+    # ---------- Consulta ----------
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for row in self._rows[:self._size]:
+            angle, pp_name = self.variants[row['variant']]
+            text = str(int(row['value'])).zfill(int(row['length']))
+            yield (text, self.engines[row['engine']], angle, pp_name, float(row['confidence']), int(row['length']))
+
+    def totals(self):
+        """Score de cada valor (0..MAX_VALUE): melhor leitura + peso do consenso; -inf sem leituras"""
+        extra_votes = np.minimum(np.maximum(self._votes - 1, 0), self.scoring.CONSENSUS_MAX_VOTES)
+        return self._best + self.scoring.CONSENSUS_WEIGHT * extra_votes
+
+    def ranking(self, limit=None):
+        """
+        [(valor, score, votos)] em ordem decrescente de score; empates ficam com o
+        valor lido primeiro (mesmo critério da ordenação estável das tuplas).
+        """
+        totals = self.totals()
+        candidates = np.nonzero(self._votes)[0]
+        # lexsort: a última chave é a principal
+        order = candidates[np.lexsort((self._first[candidates], -totals[candidates]))]
+        if limit is not None:
+            order = order[:limit]
+        return [(int(v), float(totals[v]), int(self._votes[v])) for v in order]
+
+    def best(self):
+        """(valor, score) da melhor leitura, ou None se não há leitura válida"""
+        ranked = self.ranking(limit=1)
+        return (ranked[0][0], ranked[0][1]) if ranked else None
+
+    def methods_for(self, value):
+        """Engines que leram o valor"""
+        rows = self._rows[:self._size]
+        codes = np.unique(rows['engine'][(rows['value'] == value) & np.isfinite(rows['score'])])
+        return {self.engines[c] for c in codes}
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Corpus de cliques reais para regressão de desempenho offline
+Com a gravação ativada, cada clique analisado pelo OCR guarda o recorte bruto
+(comprimido sem perdas), a configuração ativa e o valor confirmado pelo
+usuário em um arquivo SQLite compacto. O replay roda o corpus no pipeline
+headless e relata tempos por etapa, vazão e concordância com os valores
+confirmados, no mesmo formato do relatório do benchmark.
+
+Uso (a partir da pasta de plugins do QGIS, com o Python do QGIS):
+    python -m deep_reader_ocr.click_corpus info
+    python -m deep_reader_ocr.click_corpus replay --output atual.json
+    python -m deep_reader_ocr.click_corpus replay --configs minhas_configs.json --output novo.json
+    python -m deep_reader_ocr.benchmark --compare atual.json novo.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import argparse
+import platform
+import threading
+import contextlib
+from datetime import datetime
+
+import numpy as np
+
+from .instrumentation import ClickTrace, TraceRecorder
+
+DEFAULT_CORPUS_PATH = os.path.join(os.path.expanduser("~"), ".depth_reader_ocr", "corpus.sqlite")
+SCHEMA_VERSION = 1
+REPORT_SCHEMA = 1
+# Nome da configuração no relatório quando cada clique roda com a configuração gravada
+RECORDED_CONFIG = "gravada"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clicks (
+    id INTEGER PRIMARY KEY,
+    created REAL,
+    raster TEXT,
+    x_m REAL,
+    y_m REAL,
+    clip_size INTEGER NOT NULL,
+    shape TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    clip BLOB NOT NULL,
+    config TEXT NOT NULL,
+    chosen_cm INTEGER,
+    verdict TEXT,
+    final_cm INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_clicks_verdict ON clicks (verdict);
+"""
+
+
+class ClickCorpus:
+    """Arquivo SQLite com os recortes clicados, a configuração e o valor confirmado"""
+
+    def __init__(self, path=DEFAULT_CORPUS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record(self, clip, config, clip_size, raster=None, x_m=None, y_m=None, chosen_cm=None, verdict=None,
+               final_cm=None):
+        """
+        Grava um clique. clip é o recorte bruto do tamanho máximo (como lido do
+        raster); final_cm é o valor confirmado ou corrigido (None se rejeitado).
+        """
+        clip = np.ascontiguousarray(clip)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO clicks (created, raster, x_m, y_m, clip_size, shape, dtype, clip, config, chosen_cm, "
+                "verdict, final_cm) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), raster, x_m, y_m, int(clip_size), json.dumps(list(clip.shape)), clip.dtype.str,
+                 sqlite3.Binary(zlib.compress(clip.tobytes(), 6)), json.dumps(config, sort_keys=True),
+                 chosen_cm, verdict, final_cm))
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def clicks(self, only_confirmed=False, limit=None):
+        """Cliques gravados (dicts com o recorte já descomprimido), do mais antigo ao mais novo"""
+        query = "SELECT * FROM clicks"
+        if only_confirmed:
+            query += " WHERE final_cm IS NOT NULL"
+        query += " ORDER BY id"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._conn.execute(query).fetchall()
+        for row in rows:
+            click = dict(row)
+            click['clip'] = np.frombuffer(zlib.decompress(row['clip']), dtype=np.dtype(row['dtype'])).reshape(
+                json.loads(row['shape'])).copy()
+            click['config'] = json.loads(row['config'])
+            yield click
+
+    def summary(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT verdict, COUNT(*) AS n FROM clicks GROUP BY verdict").fetchall()
+        return {row['verdict'] or "sem veredito": row['n'] for row in rows}
+
+
+# ============== REPLAY ==============
+class _PipelineCache:
+    """Um pipeline por configuração; o leitor do EasyOCR é compartilhado entre pipelines do mesmo backend"""
+
+    def __init__(self):
+        self.pipelines = {}
+        self.readers = {}
+        self.load_s = 0.0
+
+    def get(self, config):
+        from .ocr_pipeline import OCRPipeline
+
+        key = json.dumps(config, sort_keys=True)
+        pipeline = self.pipelines.get(key)
+        if pipeline is None:
+            pipeline = OCRPipeline.from_config(config)
+            pipeline.easyocr_reader = self.readers.get(pipeline.ocr_backend)
+            if pipeline.easyocr_reader is None:
+                t0 = time.perf_counter()
+                self.readers[pipeline.ocr_backend] = pipeline._get_easyocr_reader()
+                self.load_s += time.perf_counter() - t0
+            self.pipelines[key] = pipeline
+        return pipeline
+
+
+def _stage_summary(recorder):
+    return {name: {"count": h["count"], "p50": round(h["p50"], 2), "p95": round(h["p95"], 2)}
+            for name, h in recorder.histograms().items()}
+
+
+def replay_clicks(clicks, config=None, verbose=False):
+    """
+    Roda os cliques no pipeline headless. config=None usa a configuração gravada
+    em cada clique. Retorna as métricas (mesmas chaves do benchmark, mais as
+    etapas e a concordância com os valores gravados).
+    """
+    from .benchmark import _run_clip, _peak_rss_mb
+    from .ocr_pipeline import OCRPipeline
+
+    cache = _PipelineCache()
+    recorder = TraceRecorder()
+    latencies, n_candidates = [], []
+    confirmed = agreed = failures = changed = 0
+    sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        if clicks:
+            # Aquecimento fora da medição (engines e caches)
+            _run_clip(cache.get(config or clicks[0]['config']), clicks[0]['clip'], clicks[0]['clip_size'])
+        wall_start = time.perf_counter()
+        for click in clicks:
+            pipeline = cache.get(config or click['config'])
+            trace = ClickTrace(click['x_m'], click['y_m'], raster=click['raster'], corpus_id=click['id'])
+            start = time.perf_counter()
+            result, candidates = _run_clip(pipeline, click['clip'], click['clip_size'], trace)
+            latencies.append(time.perf_counter() - start)
+            trace.finish(result)
+            recorder.record(trace)
+            n_candidates.append(len(candidates))
+            if result == OCRPipeline.OCR_FAILED:
+                failures += 1
+            if click['final_cm'] is not None:
+                confirmed += 1
+                agreed += int(result == click['final_cm'])
+            if click['chosen_cm'] is not None and result != click['chosen_cm']:
+                changed += 1
+        wall_s = time.perf_counter() - wall_start
+
+    latencies_ms = np.array(latencies) * 1000.0 if latencies else np.zeros(1)
+    n = len(clicks)
+    peak_rss = _peak_rss_mb()
+    return {
+        "config": config or RECORDED_CONFIG,
+        "clips": n,
+        "engine_load_s": round(cache.load_s, 3),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies_ms, 50)), 2),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 2),
+            "mean": round(float(latencies_ms.mean()), 2),
+            "max": round(float(latencies_ms.max()), 2),
+        },
+        "clips_per_sec": round(n / wall_s, 3) if n and wall_s > 0 else None,
+        "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+        # Concordância com os valores confirmados/corrigidos pelos operadores
+        "accuracy": round(agreed / confirmed, 4) if confirmed else None,
+        "confirmed": confirmed,
+        "failures": failures,
+        # Cliques cujo resultado mudou em relação ao valor escolhido na hora da gravação
+        "changed_vs_recorded": changed,
+        "mean_candidates": round(float(np.mean(n_candidates)), 2) if n_candidates else 0.0,
+        "stages_ms": _stage_summary(recorder),
+    }
+
+
+def run_replay(corpus, configs=None, only_confirmed=False, limit=None, verbose=False):
+    clicks = list(corpus.clicks(only_confirmed, limit))
+    report = {
+        "schema": REPORT_SCHEMA,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "corpus": os.path.abspath(corpus.path),
+        "clips": len(clicks),
+        "platform": {
+            "python": platform.python_version(),
+            "system": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "configs": {},
+    }
+    for name, config in (configs or {RECORDED_CONFIG: None}).items():
+        print(f"⏱️ Replay de {len(clicks)} clique(s) com a configuração '{name}'...", file=sys.stderr)
+        metrics = replay_clicks(clicks, config, verbose)
+        report["configs"][name] = metrics
+        print(f"   p50={metrics['latency_ms']['p50']}ms p95={metrics['latency_ms']['p95']}ms "
+              f"{metrics['clips_per_sec']} cliques/s concordância={metrics['accuracy']} " +
+              f"mudaram={metrics['changed_vs_recorded']}", file=sys.stderr)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Corpus de cliques reais do Depth Reader OCR")
+    parser.add_argument("command", choices=["info", "replay"])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_PATH, help=f"Arquivo do corpus (padrão: {DEFAULT_CORPUS_PATH})")
+    parser.add_argument("--configs", help="JSON com {nome: configuração}; padrão: a configuração gravada em cada clique")
+    parser.add_argument("--only-confirmed", action="store_true", help="Só cliques com valor confirmado ou corrigido")
+    parser.add_argument("--limit", type=int, help="Quantidade máxima de cliques")
+    parser.add_argument("--output", help="Arquivo JSON do relatório (padrão: stdout)")
+    parser.add_argument("--verbose", action="store_true", help="Mostra a saída do pipeline")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.corpus):
+        print(f"❌ Corpus não encontrado: {args.corpus}", file=sys.stderr)
+        return 1
+    corpus = ClickCorpus(args.corpus)
+    if args.command == "info":
+        summary = corpus.summary()
+        print(f"📼 {args.corpus}: {sum(summary.values())} clique(s)")
+        for verdict, n in sorted(summary.items()):
+            print(f"   {verdict}: {n}")
+        return 0
+
+    configs = None
+    if args.configs:
+        with open(args.configs, "r", encoding="utf-8") as f:
+            configs = json.load(f)
+    report = run_replay(corpus, configs, args.only_confirmed, args.limit, args.verbose)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"💾 Relatório salvo em: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,59 +9,37 @@
         email                : carvalhovaldo09@gmail.com
  ***************************************************************************/
 """
-from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication, QThread, pyqtSignal
-from qgis.PyQt.QtGui import QIcon
-from qgis.PyQt.QtWidgets import QAction, QMessageBox, QProgressDialog, QApplication, QInputDialog
-from qgis.gui import QgsMapToolEmitPoint
-from qgis.core import QgsProject, QgsCoordinateTransform, QgsMessageLog, Qgis
+from qgis.PyQt.QtCore import Qt, QSettings, QTranslator, QCoreApplication, QThread, QTimer, pyqtSignal
+from qgis.PyQt.QtGui import QIcon, QColor
+from qgis.PyQt.QtWidgets import QAction, QMessageBox, QProgressDialog, QApplication, QInputDialog, QFileDialog
+from qgis.gui import QgsMapToolEmitPoint, QgsRubberBand
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (QgsProject, QgsCoordinateTransform, QgsMessageLog, Qgis, QgsRasterLayer, QgsPointXY,
+                       QgsGeometry, QgsRectangle, QgsWkbTypes, QgsVectorLayer, QgsField, QgsFeature,
+                       QgsCoordinateReferenceSystem)
 
 import csv
 import numpy as np
 import os.path
-import logging
-import warnings
-import re
+from collections import deque
 
 # ============== SISTEMA DE DEPENDÊNCIAS ==============
 from .dependency_manager import DependencyChecker
-
-# Imports opcionais - só importa se estiver disponível
-OPENCV_AVAILABLE = False
-TESSERACT_AVAILABLE = False
-EASYOCR_AVAILABLE = False
-PIL_AVAILABLE = False
-
-try:
-    import cv2
-    OPENCV_AVAILABLE = True
-    print("✅ OpenCV disponível")
-except ImportError:
-    cv2 = None
-    print("❌ OpenCV não disponível")
-
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-    print("✅ PyTesseract disponível")
-except ImportError:
-    pytesseract = None
-    print("❌ PyTesseract não disponível")
-
-try:
-    import easyocr
-    EASYOCR_AVAILABLE = True
-    print("✅ EasyOCR disponível")
-except ImportError:
-    easyocr = None
-    print("❌ EasyOCR não disponível")
-
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-    print("✅ PIL disponível")
-except ImportError:
-    Image = None
-    print("❌ PIL não disponível")
+from .resource_governor import ResourceGovernor
+from .instrumentation import ClickTrace, TraceRecorder, NULL_TRACE
+from . import raster_io
+from . import project_batch
+from . import point_batch
+from . import area_batch
+from . import glyph_bank
+from . import text_index
+from . import result_store
+from . import ocr_server
+from . import click_corpus
+from . import memory_budget
+# Imports opcionais das engines ficam no pipeline (sem dependência de Qt)
+from .ocr_pipeline import OCRPipeline, OPENCV_AVAILABLE, cv2
+from .depth_prior import DepthPrior
 
 try:
     from osgeo import gdal
@@ -73,28 +51,8 @@ except ImportError:
 # Initialize Qt resources from file resources.py
 from .resources import *
 # Import the code for the dialog
-from .deep_reader_ocr_dialog import DepthReaderOCRDialog
-
-# Configuração do Tesseract para Windows (só se disponível)
-if TESSERACT_AVAILABLE and pytesseract:
-    try:
-        config_file = os.path.join(os.path.expanduser('~'), 'tesseract_config.txt')
-        if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                pytesseract.pytesseract.tesseract_cmd = f.read().strip()
-        else:
-            # Tenta caminhos comuns no Windows
-            possible_paths = [
-                r"C:\Program Files\Tesseract-OCR\tesseract.exe",
-                r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
-            ]
-            for path in possible_paths:
-                if os.path.exists(path):
-                    pytesseract.pytesseract.tesseract_cmd = path
-                    break
-    except Exception as e:
-        QgsMessageLog.logMessage(f"Erro na configuração do Tesseract: {e}", "DepthReaderOCR", Qgis.Warning)
-        pytesseract.pytesseract.tesseract_cmd = None
+from .deep_reader_ocr_dialog import DepthReaderOCRDialog, AreaReviewDialog
+from .review_queue import ReviewQueueDock
 
 
 # ============== CLASSE PARA PROCESSAMENTO EM BACKGROUND ==============
@@ -105,143 +63,163 @@ class OCRWorkerThread(QThread):
     result_ready = pyqtSignal(int, float, float)
     error_occurred = pyqtSignal(str)
     
-    # SUGESTÃO: Preparação para Parâmetros Configuráveis
-    # O construtor agora aceita os parâmetros de OCR para que não sejam fixos.
-    def __init__(self, click_tool, img_data_raw, x_m, y_m, rotations, preprocess_methods):
+    def __init__(self, pipeline, img_data_raw, x_m, y_m, region=None, clip_loader=None, trace=None, trace_recorder=None,
+                 prior=None):
         super().__init__()
-        self.click_tool = click_tool
+        self.pipeline = pipeline
         self.img_data_raw = img_data_raw
         self.x_m = x_m
         self.y_m = y_m
         self.is_cancelled = False
-        # Armazena os parâmetros recebidos
-        self.rotations = rotations
-        self.preprocess_methods = preprocess_methods
+        # Região já localizada pelo recorte adaptativo e leitor de recortes maiores
+        self.region = region
+        self.clip_loader = clip_loader
+        self.candidates = None
+        # Registro de tempos do clique (criado no canvasReleaseEvent)
+        self.trace = trace or ClickTrace(x_m, y_m)
+        self.trace_recorder = trace_recorder
+        # Estimativa das sondagens vizinhas já capturadas (DepthEstimate ou None)
+        self.prior = prior
     
     def cancel(self):
         self.is_cancelled = True
     
     def run(self):
+        result = None
         try:
-            self.progress_update.emit("🧠 Carregando motor EasyOCR...", 3)
-            self.click_tool._get_easyocr_reader()
+            if self.pipeline.ocr_backend != "torch" and self.pipeline.easyocr_reader is None:
+                self.progress_update.emit("🧠 Carregando EasyOCR via ONNX Runtime...\n💾 A primeira execução exporta os modelos", 3)
+            else:
+                self.progress_update.emit("🧠 Carregando motor EasyOCR...", 3)
+            with self.trace.stage("engine_load"):
+                self.pipeline._get_easyocr_reader()
             if self.is_cancelled:
                 return
 
             self.progress_update.emit("🔍 Preparando imagem para análise...", 5)
-            self.msleep(200)
             
-            if self.is_cancelled:
-                return
-            
-            if len(self.img_data_raw.shape) == 3:
-                gray = cv2.cvtColor(self.img_data_raw, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = self.img_data_raw
-            
-            self.progress_update.emit("📐 Configurando rotações e filtros...", 10)
-            self.msleep(100)
-            
-            if self.is_cancelled:
+            outcome = self.pipeline.process(
+                self.img_data_raw, self.region, self.clip_loader, self.x_m, self.y_m,
+                progress=self.progress_update.emit, is_cancelled=lambda: self.is_cancelled, trace=self.trace,
+                prior=self.prior)
+            if outcome is None or self.is_cancelled:
+                result = "cancelled"
                 return
-            
-            # SUGESTÃO: Preparação para Parâmetros Configuráveis
-            # Usa os parâmetros recebidos em vez de valores fixos.
-            rotations = self.rotations
-            preprocess_methods = self.preprocess_methods
-            
-            self.progress_update.emit("🔬 Aumentando resolução da imagem...", 15)
-            scale_factor = 2
-            new_width = int(gray.shape[1] * scale_factor)
-            new_height = int(gray.shape[0] * scale_factor)
-            upscaled_gray = cv2.resize(gray, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
-            
-            if self.is_cancelled:
-                return
-            
-            all_results = []
-            total_iterations = len(rotations) * len(preprocess_methods)
-            current_iteration = 0
-            best_angle_debug_saved = False
-            
-            for angle in rotations:
-                if self.is_cancelled:
-                    return
-                
-                center = (upscaled_gray.shape[1] // 2, upscaled_gray.shape[0] // 2)
-                M = cv2.getRotationMatrix2D(center, angle, 1.0)
-                rotated_upscaled = cv2.warpAffine(
-                    upscaled_gray, M, 
-                    (upscaled_gray.shape[1], upscaled_gray.shape[0]),
-                    borderMode=cv2.BORDER_CONSTANT,
-                    borderValue=255
-                )
-                
-                for pp_name, pp_func in preprocess_methods.items():
-                    if self.is_cancelled:
-                        return
-                    
-                    current_iteration += 1
-                    progress_percent = 20 + int((current_iteration / total_iterations) * 60)
-                    
-                    if angle == 0:
-                        angle_msg = "↗️ Analisando orientação normal"
-                    elif angle > 0:
-                        angle_msg = f"🔄 Rotacionando +{angle}° (horário)"
-                    else:
-                        angle_msg = f"🔄 Rotacionando {angle}° (anti-horário)"
-                    
-                    filter_name = pp_name.replace("adaptive_thresh_", "").replace("_", " ")
-                    self.progress_update.emit(f"{angle_msg}\n🎛️ Filtro: {filter_name}", progress_percent)
-                    
-                    processed_img = pp_func(rotated_upscaled)
-                    
-                    if not best_angle_debug_saved:
-                        self.click_tool._save_debug_data(processed_img, self.x_m, self.y_m, f"processed_{pp_name}_{angle}")
-                        best_angle_debug_saved = True
-                    
-                    if self.is_cancelled:
-                        return
-                    
-                    if EASYOCR_AVAILABLE:
-                        self.progress_update.emit(f"🤖 EasyOCR analisando {angle}°...\n🎛️ Filtro: {filter_name}", progress_percent)
-                        easyocr_results = self.click_tool._perform_ocr_easyocr(processed_img)
-                        for text, method, confidence in easyocr_results:
-                            all_results.append((text, method, angle, pp_name, confidence, len(text)))
-                            print(f"🔄 Rot {angle:+4d}° PP {pp_name}: {method} detectou '{text}' (conf: {confidence:.2f}, len: {len(text)})")
-                    
-                    if self.is_cancelled:
-                        return
-                    
-                    if self.click_tool.tesseract_available:
-                        self.progress_update.emit(f"🔤 Tesseract analisando {angle}°...\n🎛️ Filtro: {filter_name}", progress_percent)
-                        tesseract_results = self.click_tool._perform_ocr_tesseract(processed_img)
-                        for text, method, confidence in tesseract_results:
-                            all_results.append((text, method, angle, pp_name, confidence, len(text)))
-                            print(f"🔄 Rot {angle:+4d}° PP {pp_name}: {method} detectou '{text}' (conf: {confidence:.2f}, len: {len(text)})")
-                    
-                    self.msleep(50)
-            
-            if self.is_cancelled:
-                return
-            
-            self.progress_update.emit("🧮 Analisando resultados e calculando scores...", 85)
-            self.msleep(200)
-            
-            if self.is_cancelled:
-                return
-            
-            self.progress_update.emit("🎯 Selecionando melhor resultado...", 95)
-            result = self.click_tool._process_all_results(all_results)
+            result, self.candidates = outcome
             
             self.progress_update.emit("✅ Análise concluída com sucesso!", 100)
             self.msleep(300)
             
             self.result_ready.emit(result, self.x_m, self.y_m)
             
+        except Exception as e:
+            result = f"error: {e}"
+            self.error_occurred.emit(str(e))
+        finally:
+            self._record_trace(result)
+
+    def _record_trace(self, result):
+        """Fecha o trace do clique, agrega no recorder e registra o resumo no log."""
+        self.trace.finish(result)
+        if self.trace_recorder is not None:
+            self.trace_recorder.record(self.trace)
+        QgsMessageLog.logMessage(self.trace.summary(), "DepthReaderOCR", Qgis.Info)
+
+
+class PrefetchThread(OCRWorkerThread):
+    """Leitura (e opcionalmente análise) especulativa do recorte sob o cursor parado"""
+
+    def __init__(self, tool, raster_path, x_m, y_m, screen_pos, extent, analyze):
+        trace = ClickTrace(x_m, y_m, raster=os.path.basename(raster_path), backend=tool.pipeline.ocr_backend,
+                           prefetch=True)
+        super().__init__(tool.pipeline, None, x_m, y_m, trace=trace)
+        self.tool = tool
+        self.raster_path = raster_path
+        # Posição na tela e extensão do canvas: o clique só aproveita o trabalho se coincidirem
+        self.screen_pos = screen_pos
+        self.extent = extent
+        self.analyze = analyze
+        self.prepared = None
+        self.outcome = None
+        # Assumida pela ferramenta quando o clique cai na janela pré-carregada
+        self.adopted = False
+
+    def run(self):
+        try:
+            self.prepared = self.tool._prepare_click(self.raster_path, self.x_m, self.y_m, self.trace)
+        except Exception as e:
+            print(f"⚠️ Pré-carregamento falhou: {e}")
+            return
+        if self.prepared is None or not self.analyze or self.is_cancelled:
+            return
+        self.img_data_raw, self.region = self.prepared['img'], self.prepared['region']
+        self.x_m, self.y_m = self.prepared['x_m'], self.prepared['y_m']
+        self.clip_loader = self.tool._clip_loader(self.prepared, self.trace)
+        self.prior = self.tool._depth_estimate(self.x_m, self.y_m)
+        super().run()
+
+    def _record_trace(self, result):
+        # Só entra nos tempos da sessão se um clique assumir a análise
+        self.trace.finish(result)
+
+
+class BatchThread(QThread):
+    """Thread que executa um lote (cartas do projeto ou lista de pontos) com um único pipeline"""
+
+    progress_update = pyqtSignal(str, int)
+    batch_finished = pyqtSignal(object, object)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, batch, items):
+        super().__init__()
+        self.batch = batch
+        self.items = items
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def run(self):
+        try:
+            results = self.batch.run(self.items, progress=self.progress_update.emit,
+                                     is_cancelled=lambda: self.is_cancelled)
+            if results is not None and not self.is_cancelled:
+                self.batch_finished.emit(results, dict(self.batch.stats))
         except Exception as e:
             self.error_occurred.emit(str(e))
 
+
+class TextIndexThread(QThread):
+    """Thread que indexa as sondagens de uma carta inteira em segundo plano"""
+
+    index_ready = pyqtSignal(str, object)
+    error_occurred = pyqtSignal(str, str)
+
+    def __init__(self, raster_path, clip_size, to_gray):
+        super().__init__()
+        self.raster_path = raster_path
+        self.clip_size = clip_size
+        self.to_gray = to_gray
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def run(self):
+        try:
+            index = text_index.build_text_index(self.raster_path, self.clip_size, self.to_gray,
+                                                is_cancelled=lambda: self.is_cancelled)
+            if index is None or self.is_cancelled:
+                return
+            try:
+                index.save()
+            except OSError as e:
+                print(f"⚠️ Não foi possível gravar o índice de texto: {e}")
+            self.index_ready.emit(self.raster_path, index)
+        except Exception as e:
+            self.error_occurred.emit(self.raster_path, str(e))
+
+
 class DepthReaderOCR:
     def __init__(self, iface):
         self.iface = iface
@@ -262,6 +240,21 @@ class DepthReaderOCR:
         self.first_start = None
         self.dependencies_ok = False
         self.dependency_checker = DependencyChecker(self.iface.mainWindow())
+        # Tempos por etapa de todos os cliques da sessão (alimenta o diagnóstico)
+        self.trace_recorder = TraceRecorder()
+        # Teto de memória dos caches por carta (os menos usados são descartados e relidos do disco)
+        self.memory_budget = memory_budget.MemoryBudget()
+        # Índices de texto por carta (compartilhados com a ferramenta de clique)
+        self.text_indexes = memory_budget.BoundedCache(self.memory_budget, "Índices de texto", lambda index: index.nbytes)
+        self.index_threads = {}
+        # Bancos de glifos por carta (aprendidos com as confirmações do usuário)
+        self.glyph_banks = memory_budget.BoundedCache(self.memory_budget, "Bancos de glifos", lambda bank: bank.nbytes)
+        self.result_store = None
+        self.click_corpus = None
+        # Painel da fila de revisão (criado na primeira ativação que o usa)
+        self.review_dock = None
+        # Cliente do servidor OCR local (só conecta se o servidor estiver em execução)
+        self.ocr_server = ocr_server.OCRServerClient()
 
     def tr(self, message):
         return QCoreApplication.translate('DepthReaderOCR', message)
@@ -286,13 +279,434 @@ class DepthReaderOCR:
     def initGui(self):
         icon_path = ':/plugins/deep_reader_ocr/icon.png'
         self.add_action(icon_path, text=self.tr(u'Depth Reader OCR'), callback=self.run, parent=self.iface.mainWindow())
+        self.add_action(icon_path, text=self.tr(u'Processar Cartas do Projeto'), callback=self.run_project_batch,
+                        add_to_toolbar=False, parent=self.iface.mainWindow())
+        self.add_action(icon_path, text=self.tr(u'Ler Profundidades de Pontos Existentes'), callback=self.run_point_batch,
+                        add_to_toolbar=False, parent=self.iface.mainWindow())
+        self.add_action(icon_path, text=self.tr(u'Diagnóstico de Desempenho'), callback=self.show_diagnostics,
+                        add_to_toolbar=False, parent=self.iface.mainWindow())
+        self.iface.currentLayerChanged.connect(self._on_active_layer_changed)
         self.first_start = True
 
     def unload(self):
+        try:
+            self.iface.currentLayerChanged.disconnect(self._on_active_layer_changed)
+        except TypeError:
+            pass
+        for thread in list(self.index_threads.values()):
+            thread.cancel()
+            thread.wait()
+        self.index_threads.clear()
+        tool = getattr(self, 'tool', None)
+        if tool is not None:
+            tool.clear_candidate_highlight()
+            tool.stop_prefetch()
+            tool.stop_area_batch()
+            tool.detach_review_queue()
+            tool.release_engines()
+        if self.review_dock is not None:
+            self.iface.removeDockWidget(self.review_dock)
+            self.review_dock.deleteLater()
+            self.review_dock = None
+        self.memory_budget.clear()
+        for resource in (self.result_store, self.click_corpus):
+            self._close_resource(resource)
+        self.result_store = None
+        self.click_corpus = None
+        self.ocr_server.close()
         for action in self.actions:
             self.iface.removePluginMenu(self.tr(u'&Depth Reader OCR'), action)
             self.iface.removeToolBarIcon(action)
 
+    def _get_review_dock(self, auto_accept_score):
+        """Painel da fila de revisão, criado uma vez e mantido entre reconfigurações."""
+        if self.review_dock is None:
+            self.review_dock = ReviewQueueDock(self.iface.mainWindow())
+            self.iface.addDockWidget(Qt.RightDockWidgetArea, self.review_dock)
+        self.review_dock.set_auto_accept(auto_accept_score)
+        self.review_dock.show()
+        return self.review_dock
+
+    # ---------- Índice de texto em segundo plano ----------
+    def _on_active_layer_changed(self, layer):
+        tool = getattr(self, 'tool', None)
+        if tool is None or not tool.use_text_index:
+            return
+        if isinstance(layer, QgsRasterLayer) and layer.providerType() == 'gdal':
+            self._ensure_text_index(layer.source(), tool.clip_size)
+
+    def _ensure_text_index(self, raster_path, clip_size):
+        """Carrega o índice gravado ao lado do raster ou inicia a indexação em segundo plano."""
+        index = self.text_indexes.get(raster_path)
+        if (index is not None and index.clip_size == clip_size) or raster_path in self.index_threads:
+            return
+        index = text_index.TextIndex.load(raster_path, clip_size)
+        if index is not None:
+            self._handle_text_index(raster_path, index)
+            return
+        QgsMessageLog.logMessage(f"🗂️ Indexando o texto de {os.path.basename(raster_path)} em segundo plano...",
+                                 "DepthReaderOCR", Qgis.Info)
+        thread = TextIndexThread(raster_path, clip_size, self.tool.pipeline._to_gray)
+        thread.index_ready.connect(self._handle_text_index)
+        thread.error_occurred.connect(self._handle_text_index_error)
+        thread.finished.connect(lambda path=raster_path: self.index_threads.pop(path, None))
+        self.index_threads[raster_path] = thread
+        thread.start()
+
+    def _handle_text_index(self, raster_path, index):
+        self.text_indexes[raster_path] = index
+        QgsMessageLog.logMessage(f"✅ Índice de texto pronto: {len(index)} sondagem(ns) em {os.path.basename(raster_path)}",
+                                 "DepthReaderOCR", Qgis.Info)
+        tool = getattr(self, 'tool', None)
+        if tool is not None:
+            tool.refresh_candidate_highlight()
+
+    def _handle_text_index_error(self, raster_path, error_message):
+        QgsMessageLog.logMessage(f"❌ Erro ao indexar {raster_path}: {error_message}", "DepthReaderOCR", Qgis.Warning)
+
+    def show_diagnostics(self):
+        """Exibe os valores efetivos de concorrência da ferramenta ativa."""
+        tool = getattr(self, 'tool', None)
+        governor = tool.pipeline.governor if tool is not None else ResourceGovernor()
+        sections = ["⚙️ CONCORRÊNCIA (CPU)\n" + governor.diagnostics_text()]
+        sections.append("⏱️ TEMPOS POR ETAPA\n" + self.trace_recorder.diagnostics_text())
+        if tool is not None:
+            sections.append("🔀 CASCATA DE ENGINES\n" + tool.pipeline.engine_stats.diagnostics_text())
+        if self.glyph_banks:
+            sections.append("🔠 RECONHECEDOR POR CARTA\n" +
+                            "\n".join(bank.diagnostics_line() for bank in self.glyph_banks.snapshot()))
+        if self.result_store is not None:
+            sections.append("🗃️ RESULTADOS GRAVADOS\n" + self.result_store.diagnostics_text())
+        sections.append("🧠 MEMÓRIA\n" + self.memory_budget.diagnostics_text(self._memory_components(tool)))
+        sections.append("🔌 SERVIDOR OCR\n" + self._ocr_server_status(tool))
+        if tool is None:
+            sections.append("ℹ️ Ferramenta de clique ainda não ativada: valores padrão exibidos.")
+        QMessageBox.information(self.iface.mainWindow(), "Depth Reader OCR - Diagnóstico", "\n\n".join(sections))
+
+    def _memory_components(self, tool):
+        """MB dos componentes fora do orçamento de caches (modelos e estimativa pela vizinhança)"""
+        if tool is None:
+            return {}
+        pipeline = tool.pipeline
+        components = {"EasyOCR (modelos carregados)": 0.0 if pipeline.engines_unloaded else pipeline.engine_memory_mb}
+        if tool.depth_prior is not None:
+            components["Estimativa pela vizinhança"] = tool.depth_prior.nbytes / memory_budget.MB
+        return components
+
+    def _ocr_server_status(self, tool):
+        if tool is not None and tool.pipeline.ocr_server is None:
+            return "Desativado na aba Avançado."
+        info = self.ocr_server.available()
+        if info is None:
+            return f"Não está em execução ({self.ocr_server.address}): engines carregadas no QGIS."
+        return (f"PID {info['pid']} em {self.ocr_server.address}\n" +
+                f"Backend: {info['backend']} | EasyOCR: {'sim' if info['easyocr'] else 'não'} | " +
+                f"Tesseract: {'sim' if info['tesseract'] else 'não'}\n" +
+                f"Ativo há {info['uptime'] / 60:.0f} min, {info['requests']} requisições atendidas")
+
+    def _project_charts(self):
+        """Cartas (rasters GDAL) do projeto, com transformação para o CRS do projeto."""
+        project = QgsProject.instance()
+        charts = []
+        for layer in project.mapLayers().values():
+            if not isinstance(layer, QgsRasterLayer) or layer.providerType() != 'gdal':
+                continue
+            transform_xy = None
+            if layer.crs() != project.crs():
+                transform = QgsCoordinateTransform(layer.crs(), project.crs(), project)
+
+                def transform_xy(x, y, transform=transform):
+                    point = transform.transform(QgsPointXY(x, y))
+                    return point.x(), point.y()
+            charts.append(project_batch.ChartSource(layer.name(), layer.source(), transform_xy))
+        return charts
+
+    def run_project_batch(self):
+        """Lê todas as sondagens de todas as cartas do projeto e grava um único CSV."""
+        if not self.dependencies_ok:
+            self.dependencies_ok = self._check_and_install_dependencies()
+            if not self.dependencies_ok:
+                return
+        if getattr(self, 'batch_thread', None) is not None:
+            QMessageBox.information(self.iface.mainWindow(), "Depth Reader OCR", "⏳ Um processamento em lote já está em andamento.")
+            return
+
+        charts = self._project_charts()
+        if not charts:
+            QMessageBox.warning(self.iface.mainWindow(), "Depth Reader OCR", "❌ Nenhuma carta raster no projeto.")
+            return
+
+        csv_path, _ = QFileDialog.getSaveFileName(
+            self.iface.mainWindow(), "Salvar Sondagens do Projeto",
+            os.path.join(os.path.expanduser("~"), "batimetria_projeto.csv"), "Arquivos CSV (*.csv)")
+        if not csv_path:
+            return
+
+        # Reaproveita o pipeline (e o modelo já carregado) da ferramenta de clique, se houver
+        tool = getattr(self, 'tool', None)
+        pipeline = tool.pipeline if tool is not None else OCRPipeline(ocr_server=self.ocr_server)
+        clip_size = tool.clip_size if tool is not None else 96
+        # Com o banco de resultados o lote grava cada sondagem e retoma de onde parou
+        store = tool.result_store if tool is not None else self._get_result_store(result_store.DEFAULT_DB_PATH)
+        batch = project_batch.ProjectBatch(pipeline, clip_size=clip_size, store=store)
+
+        self.batch_csv_path = csv_path
+        self.batch_progress = QProgressDialog(f"🗺️ Preparando {len(charts)} carta(s)...", "❌ Cancelar", 0, 100, self.iface.mainWindow())
+        self.batch_progress.setWindowTitle("🤖 Depth Reader OCR - Cartas do Projeto")
+        self.batch_progress.setAutoClose(False)
+        self.batch_progress.setAutoReset(False)
+        self.batch_progress.setMinimumWidth(400)
+
+        self.batch_thread = BatchThread(batch, charts)
+        self.batch_progress.canceled.connect(self.batch_thread.cancel)
+        self.batch_thread.progress_update.connect(self._update_batch_progress)
+        self.batch_thread.batch_finished.connect(self._handle_batch_result)
+        self.batch_thread.error_occurred.connect(self._handle_batch_error)
+        self.batch_thread.finished.connect(self._cleanup_batch)
+        self.batch_thread.start()
+        self.batch_progress.show()
+
+    def _update_batch_progress(self, message, progress):
+        if self.batch_progress:
+            self.batch_progress.setLabelText(message)
+            self.batch_progress.setValue(progress)
+
+    def _handle_batch_result(self, points, stats):
+        try:
+            project_batch.write_csv(points, self.batch_csv_path)
+        except Exception as e:
+            QMessageBox.critical(self.iface.mainWindow(), "❌ Erro ao Salvar", f"❌ Erro ao salvar dados:\n\n{str(e)}")
+            return
+        QMessageBox.information(
+            self.iface.mainWindow(), "Depth Reader OCR",
+            f"✅ Cartas processadas: {stats['charts']}\n" +
+            f"🔢 Sondagens localizadas: {stats['soundings']}\n" +
+            f"🌊 Profundidades salvas: {len(points)}\n" +
+            f"🧩 Duplicatas removidas (sobreposição): {stats['duplicates']}\n" +
+            f"❌ Falhas de OCR: {stats['failed']}\n" +
+            f"🗃️ Reaproveitadas do banco: {stats['resumed']}\n\n" +
+            f"💾 {self.batch_csv_path}")
+
+    def _handle_batch_error(self, error_message):
+        QMessageBox.critical(self.iface.mainWindow(), "❌ Erro no Processamento em Lote", f"❌ Erro durante a análise:\n\n{error_message}")
+
+    def _cleanup_batch(self):
+        if self.batch_progress:
+            self.batch_progress.close()
+        self.batch_progress = None
+        self.batch_thread = None
+
+    # ---------- OCR de posições já conhecidas ----------
+    def _choose_point_source(self):
+        """Camada de pontos ou CSV de coordenadas. Retorna ('layer', camada), ('csv', caminho) ou None."""
+        point_layers = [layer for layer in QgsProject.instance().mapLayers().values()
+                        if isinstance(layer, QgsVectorLayer) and layer.geometryType() == QgsWkbTypes.PointGeometry]
+        csv_option = "📄 Arquivo CSV de coordenadas..."
+        options = [layer.name() for layer in point_layers] + [csv_option]
+        choice, ok = QInputDialog.getItem(self.iface.mainWindow(), "Depth Reader OCR",
+                                          "Posições das sondagens:", options, 0, False)
+        if not ok:
+            return None
+        if choice != csv_option:
+            return 'layer', point_layers[options.index(choice)]
+        csv_path, _ = QFileDialog.getOpenFileName(self.iface.mainWindow(), "Abrir CSV de Coordenadas",
+                                                  os.path.expanduser("~"), "Arquivos CSV (*.csv *.txt)")
+        return ('csv', csv_path) if csv_path else None
+
+    def _choose_raster(self):
+        """Carta a ser lida (a camada ativa, se for raster, é a primeira opção)."""
+        rasters = [layer for layer in QgsProject.instance().mapLayers().values()
+                   if isinstance(layer, QgsRasterLayer) and layer.providerType() == 'gdal']
+        if not rasters:
+            return None
+        active = self.iface.activeLayer()
+        if active in rasters:
+            rasters.remove(active)
+            rasters.insert(0, active)
+        if len(rasters) == 1:
+            return rasters[0]
+        names = [layer.name() for layer in rasters]
+        choice, ok = QInputDialog.getItem(self.iface.mainWindow(), "Depth Reader OCR", "Carta:", names, 0, False)
+        return rasters[names.index(choice)] if ok else None
+
+    def run_point_batch(self):
+        """Lê as profundidades de uma camada de pontos ou CSV de coordenadas em uma única passada."""
+        if not self.dependencies_ok:
+            self.dependencies_ok = self._check_and_install_dependencies()
+            if not self.dependencies_ok:
+                return
+        if getattr(self, 'batch_thread', None) is not None:
+            QMessageBox.information(self.iface.mainWindow(), "Depth Reader OCR", "⏳ Um processamento em lote já está em andamento.")
+            return
+
+        source = self._choose_point_source()
+        if source is None:
+            return
+        raster = self._choose_raster()
+        if raster is None:
+            QMessageBox.warning(self.iface.mainWindow(), "Depth Reader OCR", "❌ Nenhuma carta raster no projeto.")
+            return
+
+        # Coordenadas de entrada -> CRS da carta (a transformação roda aqui, na thread principal)
+        project = QgsProject.instance()
+        kind, origin = source
+        source_crs = origin.crs() if kind == 'layer' else project.crs()
+        transform = QgsCoordinateTransform(source_crs, raster.crs(), project) if source_crs != raster.crs() else None
+        try:
+            if kind == 'layer':
+                positions = [(feature.id(), feature.geometry().asPoint()) for feature in origin.getFeatures()
+                             if feature.hasGeometry() and not feature.geometry().isMultipart()]
+                positions = [(fid, point.x(), point.y()) for fid, point in positions]
+                self.point_batch_source = ('layer', origin, None)
+            else:
+                rows, x_column, y_column, positions = point_batch.read_csv_points(origin)
+                output_path, _ = QFileDialog.getSaveFileName(
+                    self.iface.mainWindow(), "Salvar Profundidades",
+                    os.path.splitext(origin)[0] + "_profundidades.csv", "Arquivos CSV (*.csv)")
+                if not output_path:
+                    return
+                self.point_batch_source = ('csv', rows, output_path)
+        except Exception as e:
+            QMessageBox.critical(self.iface.mainWindow(), "❌ Erro ao Ler Posições", f"❌ {str(e)}")
+            return
+        if not positions:
+            QMessageBox.warning(self.iface.mainWindow(), "Depth Reader OCR", "❌ Nenhuma posição encontrada.")
+            return
+        self.point_batch_positions = {key: (x, y) for key, x, y in positions}
+        self.point_batch_crs = source_crs
+        if transform is not None:
+            positions = [(key, *self._transform_xy(transform, x, y)) for key, x, y in positions]
+
+        tool = getattr(self, 'tool', None)
+        pipeline = tool.pipeline if tool is not None else OCRPipeline(ocr_server=self.ocr_server)
+        clip_size = tool.clip_size if tool is not None else 96
+        store = tool.result_store if tool is not None else self._get_result_store(result_store.DEFAULT_DB_PATH)
+        index = self.text_indexes.get(raster.source()) if tool is not None and tool.use_text_index else None
+        if index is not None and index.clip_size != clip_size:
+            index = None
+        batch = point_batch.PointBatch(pipeline, raster.source(), clip_size=clip_size, store=store, index=index)
+
+        self.batch_progress = QProgressDialog(f"📍 Preparando {len(positions)} posição(ões)...", "❌ Cancelar", 0, 100, self.iface.mainWindow())
+        self.batch_progress.setWindowTitle("🤖 Depth Reader OCR - Pontos Existentes")
+        self.batch_progress.setAutoClose(False)
+        self.batch_progress.setAutoReset(False)
+        self.batch_progress.setMinimumWidth(400)
+
+        self.batch_thread = BatchThread(batch, positions)
+        self.batch_progress.canceled.connect(self.batch_thread.cancel)
+        self.batch_thread.progress_update.connect(self._update_batch_progress)
+        self.batch_thread.batch_finished.connect(self._handle_point_batch_result)
+        self.batch_thread.error_occurred.connect(self._handle_batch_error)
+        self.batch_thread.finished.connect(self._cleanup_batch)
+        self.batch_thread.start()
+        self.batch_progress.show()
+
+    def _transform_xy(self, transform, x, y):
+        point = transform.transform(QgsPointXY(x, y))
+        return point.x(), point.y()
+
+    def _handle_point_batch_result(self, results, stats):
+        kind, origin, output_path = self.point_batch_source
+        try:
+            if kind == 'layer':
+                self._write_point_attributes(origin, results)
+                destination = f"🗂️ Atributos gravados em: {origin.name()}"
+            else:
+                rows = origin
+                fieldnames = list(rows[0].keys()) if rows else []
+                point_batch.write_csv_results(rows, fieldnames, results, output_path)
+                destination = f"💾 {output_path}"
+        except Exception as e:
+            QMessageBox.critical(self.iface.mainWindow(), "❌ Erro ao Salvar", f"❌ Erro ao salvar dados:\n\n{str(e)}")
+            return
+
+        to_review = point_batch.review(results)
+        if to_review:
+            self._add_review_layer(to_review)
+        QMessageBox.information(
+            self.iface.mainWindow(), "Depth Reader OCR",
+            f"📍 Posições: {stats['points']}\n" +
+            f"✅ Lidas com confiança: {stats['ok']}\n" +
+            f"🔍 Para revisão: {stats['review']} (camada \"Revisão OCR\")\n" +
+            f"🚫 Fora da carta: {stats['outside']}\n" +
+            f"🧲 Ajustadas ao índice de texto: {stats['snapped']}\n" +
+            f"🗃️ Reaproveitadas do banco: {stats['resumed']}\n\n" +
+            destination)
+
+    def _write_point_attributes(self, layer, results):
+        """Acrescenta as colunas de resultado (se faltarem) e grava todos os valores em uma única edição."""
+        provider = layer.dataProvider()
+        field_types = {"Profundidade_cm": QVariant.Int, "Profundidade_m": QVariant.Double,
+                       "Confianca": QVariant.Double, "Status_OCR": QVariant.String}
+        missing = [QgsField(name, field_type) for name, field_type in field_types.items()
+                   if layer.fields().indexOf(name) < 0]
+        if missing and not provider.addAttributes(missing):
+            raise RuntimeError(f"A camada {layer.name()} não permite criar campos")
+        layer.updateFields()
+        indexes = [layer.fields().indexOf(name) for name in point_batch.RESULT_COLUMNS]
+        changes = {r['key']: dict(zip(indexes, point_batch.result_values(r))) for r in results}
+        if not provider.changeAttributeValues(changes):
+            raise RuntimeError(f"A camada {layer.name()} não permite alterar atributos")
+        layer.triggerRepaint()
+
+    def _add_review_layer(self, to_review):
+        """Camada temporária com as posições que precisam de revisão (no CRS de entrada)."""
+        crs = self.point_batch_crs or QgsCoordinateReferenceSystem()
+        layer = QgsVectorLayer(f"Point?crs={crs.authid()}", "Revisão OCR", "memory")
+        provider = layer.dataProvider()
+        provider.addAttributes([QgsField("Origem", QVariant.String), QgsField("Status_OCR", QVariant.String),
+                                QgsField("Profundidade_cm", QVariant.Int), QgsField("Confianca", QVariant.Double)])
+        layer.updateFields()
+        features = []
+        for r in to_review:
+            x, y = self.point_batch_positions[r['key']]
+            feature = QgsFeature(layer.fields())
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+            feature.setAttributes([str(r['key']), r['status'], r['depth_cm'],
+                                   round(r['score'], 3) if r['score'] is not None else None])
+            features.append(feature)
+        provider.addFeatures(features)
+        layer.updateExtents()
+        QgsProject.instance().addMapLayer(layer)
+
+    def _get_result_store(self, db_path):
+        """Abre o banco de resultados uma única vez por sessão (None se desativado ou com erro)."""
+        if not db_path:
+            return None
+        if self.result_store is None or self.result_store.db_path != db_path:
+            # O banco anterior é fechado (conexão SQLite, WAL e lock) antes de ser substituído
+            self._close_resource(self.result_store)
+            self.result_store = None
+            try:
+                self.result_store = result_store.ResultStore(db_path)
+            except Exception as e:
+                QgsMessageLog.logMessage(f"❌ Banco de resultados indisponível: {e}", "DepthReaderOCR", Qgis.Warning)
+                self.result_store = None
+        return self.result_store
+
+    @staticmethod
+    def _close_resource(resource):
+        if resource is None:
+            return
+        try:
+            resource.close()
+        except Exception as e:
+            print(f"⚠️ Erro ao fechar {type(resource).__name__}: {e}")
+
+    def _get_click_corpus(self, corpus_path):
+        """Abre o corpus de cliques uma única vez por sessão (None se a gravação estiver desativada)."""
+        if not corpus_path:
+            return None
+        if self.click_corpus is None or self.click_corpus.path != corpus_path:
+            self._close_resource(self.click_corpus)
+            self.click_corpus = None
+            try:
+                self.click_corpus = click_corpus.ClickCorpus(corpus_path)
+            except Exception as e:
+                QgsMessageLog.logMessage(f"❌ Corpus de cliques indisponível: {e}", "DepthReaderOCR", Qgis.Warning)
+                self.click_corpus = None
+        return self.click_corpus
+
     def _check_and_install_dependencies(self):
         try:
             has_minimum, missing_packages = self.dependency_checker.has_minimum_requirements()
@@ -351,29 +765,63 @@ class DepthReaderOCR:
             # SUGESTÃO: Lê os novos parâmetros configuráveis diretamente da interface!
             rotations_config = self.dialog.get_rotations()
             filters_config = self.dialog.get_preprocess_methods_config()
+            ocr_backend = self.dialog.get_ocr_backend()
+            concurrency_config = self.dialog.get_concurrency_config()
+            cascade_config = self.dialog.get_cascade_config()
+            use_click_roi = self.dialog.get_use_click_roi()
+            adaptive_clip = self.dialog.get_adaptive_clip()
+            color_separation = self.dialog.get_color_separation()
+            tesseract_montage = self.dialog.get_tesseract_montage()
+            use_depth_prior = self.dialog.get_use_depth_prior()
+            use_text_index = self.dialog.get_use_text_index()
+            highlight_candidates = self.dialog.get_highlight_candidates()
+            use_glyph_recognizer = self.dialog.get_use_glyph_recognizer()
+            prefetch_mode = self.dialog.get_prefetch_mode()
+            store = self._get_result_store(self.dialog.get_result_store_path())
+            server = self.ocr_server if self.dialog.get_use_ocr_server() else None
+            self.trace_recorder.trace_path = self.dialog.get_trace_path()
+            corpus = self._get_click_corpus(self.dialog.get_corpus_path())
+            memory_config = self.dialog.get_memory_config()
+            self.memory_budget.configure(memory_config["cache_limit_mb"])
             
-            # Constrói o dicionário de métodos de pré-processamento com base na seleção do usuário
-            preprocess_methods_config = {}
-            temp_tool = ClickTool(self.iface.mapCanvas(), self.iface, None, None, None, False) # Usado para acessar os métodos
-            if filters_config.get("clahe"):
-                preprocess_methods_config["clahe"] = temp_tool._preprocess_clahe
-            if filters_config.get("gaussian"):
-                preprocess_methods_config["adaptive_thresh_gaussian"] = lambda img: temp_tool._preprocess_adaptive_threshold(img, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 11, 2)
-            if filters_config.get("mean"):
-                preprocess_methods_config["adaptive_thresh_mean"] = lambda img: temp_tool._preprocess_adaptive_threshold(img, cv2.ADAPTIVE_THRESH_MEAN_C, 11, 2)
-            # --- FIM DA ALTERAÇÃO ---
-
             canvas = self.iface.mapCanvas()
+            old_tool = getattr(self, 'tool', None)
+            if old_tool is not None:
+                old_tool.clear_candidate_highlight()
+                old_tool.stop_prefetch()
+                old_tool.stop_area_batch()
+                old_tool.detach_review_queue()
+            review_queue = self._get_review_dock(self.dialog.get_auto_accept_score()) \
+                if use_ocr and self.dialog.get_use_review_queue() else None
             self.tool = ClickTool(
                 canvas, self.iface, debug_dir, csv_path, clip_size, use_ocr,
-                rotations_config, preprocess_methods_config  # Passa os parâmetros lidos da UI
+                rotations_config, filters_config,  # Passa os parâmetros lidos da UI
+                ocr_backend=ocr_backend, concurrency_config=concurrency_config,
+                use_click_roi=use_click_roi, adaptive_clip=adaptive_clip, color_separation=color_separation,
+                trace_recorder=self.trace_recorder,
+                text_indexes=self.text_indexes if use_text_index else None,
+                highlight_candidates=use_text_index and highlight_candidates,
+                result_store=store, ocr_server=server, cascade_config=cascade_config,
+                glyph_banks=self.glyph_banks if use_glyph_recognizer else None,
+                prefetch_mode=prefetch_mode, use_depth_prior=use_depth_prior, tesseract_montage=tesseract_montage,
+                click_corpus=corpus, idle_unload_min=memory_config["idle_unload_min"], review_queue=review_queue
             )
+            if old_tool is not None:
+                # O leitor já carregado passa para a nova ferramenta em vez de ficar órfão
+                if self.tool.pipeline.adopt_engines(old_tool.pipeline):
+                    print("♻️ Modelos do EasyOCR reaproveitados da configuração anterior")
+                old_tool.release_engines()
             canvas.setMapTool(self.tool)
+            self._on_active_layer_changed(self.iface.activeLayer())
             
             if use_ocr:
                 message = ("✅ Ferramenta de clique ativada!\n\n" +
                            "🤖 Modo: Visão Computacional (OCR)\n" +
-                           "🖱️ Clique no mapa para detectar profundidades automaticamente.")
+                           "🖱️ Clique no mapa para detectar profundidades automaticamente.\n" +
+                           "⬚ Arraste um retângulo para ler todas as sondagens da área de uma vez.")
+                if review_queue is not None:
+                    message += ("\n📋 Os resultados entram no painel de revisão: continue clicando e " +
+                                "confirme com Enter, corrija digitando o valor ou rejeite com Del.")
             else:
                 message = ("✅ Ferramenta de clique ativada!\n\n" +
                            "✋ Modo: Entrada Manual\n" +
@@ -385,16 +833,25 @@ class DepthReaderOCR:
 
 
 class ClickTool(QgsMapToolEmitPoint):
-    OCR_FAILED = -9999
-    # SUGESTÃO: Constantes para o algoritmo de scoring.
-    # Torna o código mais legível e fácil de ajustar.
-    COMMON_DEPTH_BONUS = 1.5
-    UNCOMMON_DEPTH_PENALTY = 0.8
-    TEXT_LENGTH_BONUS_FACTOR = 0.1
+    OCR_FAILED = OCRPipeline.OCR_FAILED
+    # Acima deste número de caixas na área visível o destaque é omitido (zoom muito afastado)
+    MAX_HIGHLIGHTED = 2000
+    # Pré-carregamento: tempo com o cursor parado, tolerância de movimento (px de tela)
+    # e threads especulativas simultâneas (as canceladas ainda podem estar terminando)
+    PREFETCH_DWELL_MS = 250
+    PREFETCH_JITTER_PX = 3
+    MAX_PREFETCH_THREADS = 2
+    # Arrasto mínimo (px de tela) para o clique virar seleção de área
+    AREA_DRAG_PX = 8
 
     # SUGESTÃO: Preparação para Parâmetros Configuráveis
     # O construtor agora aceita os parâmetros de OCR.
-    def __init__(self, canvas, iface, debug_dir, csv_path, clip_size, use_ocr=True, rotations=None, preprocess_methods=None):
+    def __init__(self, canvas, iface, debug_dir, csv_path, clip_size, use_ocr=True, rotations=None, filters_config=None,
+                 ocr_backend="torch", concurrency_config=None, use_click_roi=True, adaptive_clip=True,
+                 trace_recorder=None, text_indexes=None, highlight_candidates=False, result_store=None,
+                 ocr_server=None, cascade_config=None, glyph_banks=None, prefetch_mode=None, color_separation=True,
+                 use_depth_prior=True, tesseract_montage=True, click_corpus=None,
+                 idle_unload_min=memory_budget.DEFAULT_IDLE_UNLOAD_MIN, review_queue=None):
         super().__init__(canvas)
         self.canvas = canvas
         self.iface = iface
@@ -402,59 +859,81 @@ class ClickTool(QgsMapToolEmitPoint):
         self.csv_path = csv_path
         self.clip_size = clip_size
         self.use_ocr = use_ocr
-        self.easyocr_reader = None
-        self.tesseract_available = False
         self.progress_dialog = None
         self.worker_thread = None
         self.user_cancelled = False
         self.analysis_completed = False
+        self.trace_recorder = trace_recorder if trace_recorder is not None else TraceRecorder()
+        # Índices de texto por carta (preenchidos em segundo plano pelo plugin)
+        self.text_indexes = text_indexes
+        self.use_text_index = text_indexes is not None
+        self.highlight_candidates = highlight_candidates
+        self.candidate_band = None
+        self.pending_candidate = None
+        # Banco de resultados: janela da análise em andamento e recorte aguardando veredito
+        self.result_store = result_store
+        self.pending_store_key = None
+        self.pending_clip_id = None
+        # Reconhecedor por carta: recorte do clique aguardando confirmação para o treino
+        self.glyph_banks = glyph_banks
+        self.pending_harvest = None
+        # Sondagens já capturadas no CSV de saída: estimativa da profundidade pela vizinhança
+        self.depth_prior = DepthPrior.from_csv(csv_path) if use_depth_prior else None
+        if self.depth_prior is not None and len(self.depth_prior):
+            print(f"🧭 {len(self.depth_prior)} sondagem(ns) capturada(s) carregada(s) para a estimativa pela vizinhança")
+        # Corpus de cliques (opcional): recorte do clique aguardando o veredito para ser gravado
+        self.click_corpus = click_corpus
+        self.pending_corpus = None
+        # Painel de revisão (opcional): os resultados entram na fila em vez de abrir diálogos
+        # e os cliques feitos durante uma análise esperam a vez
+        self.review_queue = review_queue
+        self.pending_review = None
+        self.click_backlog = deque()
+        if review_queue is not None:
+            review_queue.decided.connect(self._on_review_decided)
+            review_queue.point_selected.connect(self._show_review_marker)
+            review_queue.cancel_requested.connect(self._cancel_queue)
+        # Pré-carregamento sob o cursor: None, "read" (só o recorte) ou "analyze" (recorte + OCR)
+        self.prefetch_mode = prefetch_mode
+        self.prefetch_thread = None
+        self.prefetch_threads = set()
+        self.prefetch_pos = None
+        self.prefetch_timer = QTimer()
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.timeout.connect(self._start_prefetch)
+        # Seleção de área: início do arrasto, retângulo desenhado e lote em andamento
+        self.area_start = None
+        self.area_dragging = False
+        self.area_band = None
+        self.review_marker = None
+        self.area_thread = None
+        self.area_progress = None
+        self.area_raster_path = None
+        # Modelos liberados após este tempo sem análise (0 = mantidos enquanto a ferramenta existir)
+        self.idle_unload_ms = int(idle_unload_min * 60 * 1000)
+        self.idle_timer = QTimer()
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.timeout.connect(self._unload_idle_engines)
+        if highlight_candidates:
+            self.canvas.extentsChanged.connect(self.refresh_candidate_highlight)
         
-        # Armazena os parâmetros recebidos
-        self.rotations = rotations if rotations is not None else [-90, -45, 0, 45, 90]
-        self.preprocess_methods = preprocess_methods if preprocess_methods is not None else {
-            "clahe": self._preprocess_clahe,
-            "adaptive_thresh_gaussian_11_2": lambda img: self._preprocess_adaptive_threshold(img, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 11, 2),
-        }
-        
-        logging.getLogger('easyocr').setLevel(logging.ERROR)
-        self.common_depths = set(range(1, 100 + 1)) 
-        if 11 in self.common_depths:
-            self.common_depths.remove(11)
-
-        self._check_tesseract()
-
-    def _get_easyocr_reader(self):
-        if self.easyocr_reader is None and EASYOCR_AVAILABLE:
-            try:
-                old_level = logging.getLogger().level
-                logging.getLogger().setLevel(logging.ERROR)
-                warnings.filterwarnings("ignore")
-                try:
-                    self.easyocr_reader = easyocr.Reader(['en'], gpu=False, verbose=False)
-                finally:
-                    logging.getLogger().setLevel(old_level)
-                    warnings.resetwarnings()
-            except Exception as e:
-                print(f"Erro ao inicializar EasyOCR: {e}")
-                self.easyocr_reader = None
-        return self.easyocr_reader
-
-    def _check_tesseract(self):
-        if not hasattr(self, '_tesseract_checked'):
-            self._tesseract_checked = True
-            try:
-                if TESSERACT_AVAILABLE and pytesseract and pytesseract.pytesseract.tesseract_cmd:
-                    pytesseract.get_tesseract_version()
-                    self.tesseract_available = True
-                    print("✅ Tesseract disponível e configurado.")
-                else:
-                    self.tesseract_available = False
-            except Exception as e:
-                self.tesseract_available = False
-                print(f"❌ Tesseract não disponível ou erro: {e}")
-        return self.tesseract_available
+        # Engines, filtros e scoring vivem no pipeline (também usado pelas ferramentas headless)
+        self.pipeline = OCRPipeline(
+            rotations=rotations, ocr_backend=ocr_backend, concurrency_config=concurrency_config,
+            use_click_roi=use_click_roi, adaptive_clip=adaptive_clip, debug_dir=debug_dir,
+            ocr_server=ocr_server, cascade_config=cascade_config, color_separation=color_separation,
+            tesseract_montage=tesseract_montage)
+        if filters_config is not None:
+            self.pipeline.preprocess_methods = self.pipeline.build_preprocess_methods(filters_config)
+        self._touch_idle()
 
     def canvasReleaseEvent(self, event):
+        if self.area_start is not None:
+            start, dragging = self.area_start, self.area_dragging
+            self.area_start, self.area_dragging = None, False
+            if dragging:
+                self._finish_area_selection(start, event.pos())
+                return
         if not self.use_ocr:
             self._handle_manual_mode(event)
             return
@@ -474,51 +953,324 @@ class ClickTool(QgsMapToolEmitPoint):
         print(f"\n🎯 Clique em coordenadas: X={x_m}, Y={y_m}")
 
         raster_path = layer.source()
-        try:
-            dataset = gdal.Open(raster_path, gdal.GA_ReadOnly)
-            if dataset is None:
-                QMessageBox.critical(None, "Erro", "Não foi possível abrir o raster com GDAL")
+        self.prefetch_timer.stop()
+        if self.review_queue is not None and self.worker_thread is not None:
+            # Fila de revisão: o clique espera a análise em andamento terminar
+            self.click_backlog.append((raster_path, x_m, y_m))
+            self._update_queue_status()
+            return
+        self._analyze_click(raster_path, x_m, y_m, event.pos())
+
+    def _analyze_click(self, raster_path, x_m, y_m, pos=None):
+        """Lê o recorte do clique e inicia a análise (pos: posição na tela para o pré-carregamento)."""
+        prefetch = self._claim_prefetch(raster_path, pos) if pos is not None else None
+        if prefetch is not None:
+            # Recorte já lido (e talvez analisado) enquanto o cursor estava parado aqui
+            trace, prepared = prefetch.trace, prefetch.prepared
+            trace.count("prefetch_hits")
+            print("⚡ Usando o recorte pré-carregado sob o cursor")
+        else:
+            trace = ClickTrace(x_m, y_m, raster=os.path.basename(raster_path), backend=self.pipeline.ocr_backend)
+            try:
+                prepared = self._prepare_click(raster_path, x_m, y_m, trace)
+            except Exception as e:
+                QMessageBox.critical(None, "Erro GDAL", f"Erro ao processar com GDAL: {str(e)}")
                 return
+        if prepared is None:
+            self._discard_prefetch(prefetch)
+            self.iface.messageBar().pushWarning("Fora dos limites", "Ponto fora dos limites do raster.")
+            return
+
+        x_m, y_m = prepared['x_m'], prepared['y_m']
+        pixel_x, pixel_y, size = prepared['pixel_x'], prepared['pixel_y'], prepared['size']
+        img_data_raw, region = prepared['img'], prepared['region']
+        self.pending_candidate = prepared['candidate']
+        with trace.stage("debug_save"):
+            self.pipeline._save_debug_data(img_data_raw, x_m, y_m, "gdal_raw")
+
+        self.pending_harvest = (raster_path, img_data_raw) if self.glyph_banks is not None else None
+        self.pending_review = {'img': img_data_raw, 'score': None}
+        self.pending_corpus = None
+        if self.click_corpus is not None:
+            self.pending_corpus = {'raster_path': raster_path, 'x_m': x_m, 'y_m': y_m, 'pixel_x': pixel_x,
+                                   'pixel_y': pixel_y, 'img': img_data_raw, 'chosen_cm': None}
 
-            width, height, geotransform = dataset.RasterXSize, dataset.RasterYSize, dataset.GetGeoTransform()
-            pixel_x = int((x_m - geotransform[0]) / geotransform[1])
-            pixel_y = int((y_m - geotransform[3]) / geotransform[5])
-            print(f"📍 Posição no pixel: X={pixel_x}, Y={pixel_y}")
+        cached = self._lookup_stored_result(raster_path, prepared['width'], prepared['height'], pixel_x, pixel_y, size,
+                                            img_data_raw, trace)
+        if cached is not None:
+            # Janela já analisada com a mesma configuração: reaproveita sem rodar o OCR
+            self._discard_prefetch(prefetch)
+            stored_cm = cached['final_cm'] if cached['verdict'] == result_store.VERDICT_CORRECTED else cached['chosen_cm']
+            print(f"🗃️ Resultado reaproveitado do banco ({cached['verdict']}): {stored_cm}cm")
+            trace.count("store_hits")
+            trace.finish("cached")
+            self.trace_recorder.record(trace)
+            self.pending_clip_id = cached['id']
+            self.pending_review['score'] = cached['score']
+            self._handle_ocr_result(stored_cm, x_m, y_m)
+            return
+
+        recognized = self._recognize_glyphs(raster_path, img_data_raw, trace)
+        if recognized is not None:
+            # Fonte da carta já aprendida: responde sem as engines de OCR
+            self._discard_prefetch(prefetch)
+            text, confidence = recognized
+            profundidade_cm = int(text) * 100
+            print(f"🔠 Reconhecedor da carta: '{text}' (semelhança {confidence:.2f})")
+            trace.count("glyph_hits")
+            trace.finish("glyphs")
+            self.trace_recorder.record(trace)
+            self._store_ocr_result(profundidade_cm, x_m, y_m,
+                                   [(text, "glifos", 0, "glifos", confidence, len(text))])
+            self._handle_ocr_result(profundidade_cm, x_m, y_m)
+            return
+
+        if prefetch is not None and prefetch.analyze:
+            self._adopt_prefetch(prefetch)
+            return
+        self._start_ocr_with_progress(img_data_raw, x_m, y_m, region, self._clip_loader(prepared, trace), trace)
+
+    def _prepare_click(self, raster_path, x_m, y_m, trace=NULL_TRACE):
+        """
+        Lê o recorte de um ponto (ajustado ao índice de texto ou pelo recorte
+        adaptativo). Não altera o estado da ferramenta: também roda na thread de
+        pré-carregamento. Retorna None se o ponto estiver fora do raster.
+        """
+        with trace.stage("gdal_open"):
+            dataset = gdal.Open(raster_path, gdal.GA_ReadOnly)
+        if dataset is None:
+            raise RuntimeError("Não foi possível abrir o raster com GDAL")
+
+        width, height, geotransform = dataset.RasterXSize, dataset.RasterYSize, dataset.GetGeoTransform()
+        pixel_x, pixel_y = raster_io.map_to_pixel(geotransform, x_m, y_m)
+        print(f"📍 Posição no pixel: X={pixel_x}, Y={pixel_y}")
 
+        pending_candidate = None
+        snapped = self._snap_to_candidate(raster_path, pixel_x, pixel_y)
+        if snapped is not None:
+            # Sondagem já localizada pelo índice: vai direto ao reconhecimento
+            index, candidate = snapped
+            pixel_x, pixel_y = index.center(candidate)
+            x_m, y_m = (round(v, 2) for v in raster_io.pixel_to_map(geotransform, pixel_x + 0.5, pixel_y + 0.5))
+            trace.x_m, trace.y_m = x_m, y_m
+            size = index.clip_size_for(candidate, self.pipeline.CLIP_SIZES, self.clip_size)
+            img_data_raw = self._read_clip(dataset, pixel_x, pixel_y, size, trace)
+            region = index.region_in_clip(candidate, pixel_x, pixel_y, size) if img_data_raw is not None else None
+            pending_candidate = (raster_path, candidate)
+            trace.count("index_snaps")
+            print(f"🧲 Ajustado à sondagem indexada: pixel X={pixel_x}, Y={pixel_y} (recorte {size}px)")
+        elif self.pipeline.adaptive_clip:
+            read_clip = lambda clip_size: self._read_clip(dataset, pixel_x, pixel_y, clip_size, trace)
+            with trace.stage("adaptive_clip"):
+                img_data_raw, region, size = self.pipeline.select_adaptive_clip(read_clip, self.clip_size)
+        else:
             size = self.clip_size
-            half = size // 2
-            if not (half <= pixel_x < width - half and half <= pixel_y < height - half):
-                self.iface.messageBar().pushWarning("Fora dos limites", "Ponto fora dos limites do raster.")
-                return
+            img_data_raw, region = self._read_clip(dataset, pixel_x, pixel_y, size, trace), None
 
-            x_start, y_start = pixel_x - half, pixel_y - half
-            img_bands = []
-            for band_num in range(1, min(4, dataset.RasterCount + 1)):
-                band = dataset.GetRasterBand(band_num)
-                band_array = band.ReadAsArray(x_start, y_start, size, size)
-                if band_array is not None:
-                    img_bands.append(band_array)
-
-            dataset = None
-            if not img_bands:
-                QMessageBox.critical(None, "Erro", "Não foi possível ler dados do raster")
-                return
+        dataset = None
+        if img_data_raw is None:
+            return None
+        return {
+            'raster_path': raster_path, 'x_m': x_m, 'y_m': y_m, 'width': width, 'height': height,
+            'pixel_x': pixel_x, 'pixel_y': pixel_y, 'size': size, 'img': img_data_raw, 'region': region,
+            'candidate': pending_candidate,
+        }
 
-            img_data_raw = np.stack(img_bands, axis=-1) if len(img_bands) > 1 else img_bands[0]
-            if len(img_data_raw.shape) == 3 and img_data_raw.shape[-1] >= 3:
-                img_data_raw = img_data_raw[:, :, :3]
+    def _clip_loader(self, prepared, trace):
+        """Leitor de recortes maiores para o recorte adaptativo (None se desativado)."""
+        if not self.pipeline.adaptive_clip:
+            return None
+        raster_path, pixel_x, pixel_y = prepared['raster_path'], prepared['pixel_x'], prepared['pixel_y']
+        return self.pipeline.make_clip_loader(
+            lambda clip_size: self._read_clip_from_path(raster_path, pixel_x, pixel_y, clip_size, trace),
+            prepared['size'], self.clip_size)
 
-            if img_data_raw.dtype != np.uint8:
-                img_min, img_max = img_data_raw.min(), img_data_raw.max()
-                img_data_raw = ((img_data_raw - img_min) / (img_max - img_min) * 255).astype(np.uint8) if img_max > img_min else np.full_like(img_data_raw, 128, dtype=np.uint8)
+    def _lookup_stored_result(self, raster_path, width, height, pixel_x, pixel_y, size, img_data_raw, trace):
+        """Consulta o banco pela janela do clique; guarda a chave para gravar o resultado depois."""
+        self.pending_store_key = None
+        self.pending_clip_id = None
+        if self.result_store is None:
+            return None
+        try:
+            with trace.stage("store_lookup"):
+                fingerprint = self.result_store.raster_fingerprint(raster_path, width, height)
+                img_hash = result_store.clip_hash(img_data_raw)
+                config = self.pipeline.config_signature()
+                cached = self.result_store.lookup(fingerprint, pixel_x, pixel_y, size,
+                                                  result_store.config_hash(config), img_hash)
+        except Exception as e:
+            print(f"⚠️ Erro ao consultar o banco de resultados: {e}")
+            return None
+        self.pending_store_key = (fingerprint, pixel_x, pixel_y, size, config, img_hash)
+        if cached is None or cached['verdict'] == result_store.VERDICT_REJECTED or cached['chosen_cm'] is None:
+            return None
+        return cached
+
+    def _store_ocr_result(self, profundidade_cm, x_m, y_m, candidates):
+        """Grava o resultado e todos os candidatos da análise concluída."""
+        if self.result_store is None or self.pending_store_key is None or candidates is None:
+            return
+        fingerprint, pixel_x, pixel_y, size, config, img_hash = self.pending_store_key
+        self.pending_store_key = None
+        try:
+            self.pending_clip_id = self.result_store.save_result(
+                fingerprint, pixel_x, pixel_y, size, config, profundidade_cm, candidates,
+                score=self.pipeline._best_score(candidates), img_hash=img_hash, x_m=x_m, y_m=y_m)
+        except Exception as e:
+            print(f"⚠️ Erro ao gravar no banco de resultados: {e}")
 
-            self._save_debug_data(img_data_raw, x_m, y_m, "gdal_raw")
+    def _glyph_bank(self, raster_path):
+        bank = self.glyph_banks.get(raster_path)
+        if bank is None:
+            bank = glyph_bank.GlyphBank.load(raster_path)
+            self.glyph_banks[raster_path] = bank
+        return bank
 
+    def _recognize_glyphs(self, raster_path, img_data_raw, trace):
+        """Leitura pelo banco de glifos da carta; None se ainda não aprendido ou incerto."""
+        if self.glyph_banks is None:
+            return None
+        try:
+            bank = self._glyph_bank(raster_path)
+            if not bank.ready:
+                return None
+            with trace.stage("glyph_recognizer"):
+                recognized = bank.recognize(self.pipeline._to_gray(img_data_raw))
         except Exception as e:
-            QMessageBox.critical(None, "Erro GDAL", f"Erro ao processar com GDAL: {str(e)}")
+            print(f"⚠️ Erro no reconhecedor de glifos: {e}")
+            return None
+        if recognized is None:
+            bank.fallbacks += 1
+        else:
+            bank.hits += 1
+        return recognized
+
+    def _harvest_glyphs(self, profundidade_cm):
+        """Treina o banco da carta com os glifos do recorte confirmado (só valores inteiros em metros)."""
+        pending, self.pending_harvest = self.pending_harvest, None
+        if pending is None or profundidade_cm is None or profundidade_cm % 100 != 0:
             return
-        
-        self._start_ocr_with_progress(img_data_raw, x_m, y_m)
+        raster_path, img_data_raw = pending
+        try:
+            bank = self._glyph_bank(raster_path)
+            if bank.harvest(self.pipeline._to_gray(img_data_raw), str(profundidade_cm // 100)):
+                bank.save()
+        except Exception as e:
+            print(f"⚠️ Erro ao treinar o reconhecedor de glifos: {e}")
+
+    def _record_verdict(self, verdict, final_cm=None):
+        self._record_corpus(verdict, final_cm)
+        if verdict in (result_store.VERDICT_ACCEPTED, result_store.VERDICT_CORRECTED):
+            self._harvest_glyphs(final_cm)
+        else:
+            self.pending_harvest = None
+        if self.result_store is None or self.pending_clip_id is None:
+            return
+        try:
+            self.result_store.set_verdict(self.pending_clip_id, verdict, final_cm)
+        except Exception as e:
+            print(f"⚠️ Erro ao gravar o veredito: {e}")
+        self.pending_clip_id = None
+
+    def _record_corpus(self, verdict, final_cm):
+        """Grava no corpus o recorte do tamanho máximo, a configuração e o valor confirmado."""
+        pending, self.pending_corpus = self.pending_corpus, None
+        if self.click_corpus is None or pending is None:
+            return
+        try:
+            clip = pending['img']
+            if clip.shape[0] != self.clip_size:
+                # Recorte adaptativo/índice: o replay precisa da janela máxima para refazer a escolha
+                dataset = gdal.Open(pending['raster_path'], gdal.GA_ReadOnly)
+                full = raster_io.read_clip(dataset, pending['pixel_x'], pending['pixel_y'], self.clip_size) \
+                    if dataset is not None else None
+                if full is not None:
+                    clip = full
+            self.click_corpus.record(
+                clip, self.pipeline.to_config(), clip.shape[0], raster=os.path.basename(pending['raster_path']),
+                x_m=pending['x_m'], y_m=pending['y_m'], chosen_cm=pending['chosen_cm'], verdict=verdict,
+                final_cm=final_cm if verdict != result_store.VERDICT_REJECTED else None)
+        except Exception as e:
+            print(f"⚠️ Erro ao gravar o clique no corpus: {e}")
+
+    def _snap_to_candidate(self, raster_path, pixel_x, pixel_y):
+        """Sondagem indexada mais próxima do clique (até meio recorte), ou None."""
+        if not self.use_text_index:
+            return None
+        index = self.text_indexes.get(raster_path)
+        if index is None:
+            return None
+        candidate = index.nearest(pixel_x, pixel_y, self.clip_size / 2.0)
+        return (index, candidate) if candidate is not None else None
+
+    def _mark_candidate_captured(self):
+        if self.pending_candidate is None:
+            return
+        raster_path, candidate = self.pending_candidate
+        index = self.text_indexes.get(raster_path) if self.text_indexes is not None else None
+        if index is not None:
+            index.captured[candidate] = True
+        self.pending_candidate = None
+        self.refresh_candidate_highlight()
+
+    def refresh_candidate_highlight(self):
+        """Desenha as caixas das sondagens indexadas ainda não capturadas na área visível."""
+        if not self.highlight_candidates:
+            return
+        layer = self.iface.activeLayer()
+        index = self.text_indexes.get(layer.source()) if isinstance(layer, QgsRasterLayer) else None
+        if self.candidate_band is None:
+            self.candidate_band = QgsRubberBand(self.canvas, QgsWkbTypes.PolygonGeometry)
+            self.candidate_band.setColor(QColor(255, 140, 0, 200))
+            self.candidate_band.setFillColor(QColor(255, 140, 0, 40))
+            self.candidate_band.setWidth(1)
+        self.candidate_band.reset(QgsWkbTypes.PolygonGeometry)
+        if index is None or len(index) == 0:
+            return
+
+        extent, width, height = layer.extent(), layer.width(), layer.height()
+        px_w, px_h = extent.width() / width, extent.height() / height
+        view = self.canvas.extent()
+        # Janela visível em pixels do raster
+        x0 = (view.xMinimum() - extent.xMinimum()) / px_w
+        x1 = (view.xMaximum() - extent.xMinimum()) / px_w
+        y0 = (extent.yMaximum() - view.yMaximum()) / px_h
+        y1 = (extent.yMaximum() - view.yMinimum()) / px_h
+        visible = [i for i in index.query_window(x0, y0, x1, y1) if not index.captured[i]]
+        if len(visible) > self.MAX_HIGHLIGHTED:
+            return
+        for i in visible:
+            bx0, by0, bx1, by1 = index.boxes[i, :4]
+            rect = QgsRectangle(extent.xMinimum() + bx0 * px_w, extent.yMaximum() - by1 * px_h,
+                                extent.xMinimum() + bx1 * px_w, extent.yMaximum() - by0 * px_h)
+            self.candidate_band.addGeometry(QgsGeometry.fromRect(rect), None, False)
+        self.candidate_band.updatePosition()
+        self.candidate_band.update()
+
+    def clear_candidate_highlight(self):
+        if self.highlight_candidates:
+            try:
+                self.canvas.extentsChanged.disconnect(self.refresh_candidate_highlight)
+            except TypeError:
+                pass
+            self.highlight_candidates = False
+        if self.candidate_band is not None:
+            self.canvas.scene().removeItem(self.candidate_band)
+            self.candidate_band = None
+
+    def _read_clip(self, dataset, pixel_x, pixel_y, size, trace=NULL_TRACE):
+        """Lê um recorte quadrado centrado no pixel (até 3 bandas, normalizado para uint8)."""
+        return raster_io.read_clip(dataset, pixel_x, pixel_y, size, trace)
+
+    def _read_clip_from_path(self, raster_path, pixel_x, pixel_y, size, trace=NULL_TRACE):
+        """Abre o raster e lê um recorte (usado fora da thread principal)."""
+        with trace.stage("gdal_open"):
+            dataset = gdal.Open(raster_path, gdal.GA_ReadOnly)
+        if dataset is None:
+            return None
+        clip = self._read_clip(dataset, pixel_x, pixel_y, size, trace)
+        dataset = None
+        return clip
 
     def _handle_manual_mode(self, event):
         point = self.canvas.getCoordinateTransform().toMapCoordinates(event.pos())
@@ -535,37 +1287,373 @@ class ClickTool(QgsMapToolEmitPoint):
         if ok and value > 0:
             profundidade_cm = int(value * 100)
             print(f"✅ Profundidade manual inserida: {value}m ({profundidade_cm}cm)")
+            self._record_verdict(result_store.VERDICT_CORRECTED, profundidade_cm)
             self._save_to_csv(x_m, y_m, profundidade_cm)
         else:
+            self._record_verdict(result_store.VERDICT_REJECTED)
             self.iface.messageBar().pushMessage("Depth Reader OCR", "Entrada de dados cancelada.", level=Qgis.Info, duration=3)
     
-    def _start_ocr_with_progress(self, img_data_raw, x_m, y_m):
-        self.user_cancelled = False
-        self.analysis_completed = False
-        
-        self.progress_dialog = QProgressDialog("🔍 Preparando análise OCR...", "❌ Cancelar", 0, 100, self.iface.mainWindow())
-        self.progress_dialog.setWindowTitle("🤖 Depth Reader OCR - Analisando Batimetria")
-        self.progress_dialog.setAutoClose(False)
-        self.progress_dialog.setAutoReset(False)
-        self.progress_dialog.setMinimumWidth(400)
-        self.progress_dialog.canceled.connect(self._cancel_ocr)
+    def _depth_estimate(self, x_m, y_m):
+        """Profundidade esperada pelas capturas vizinhas (DepthEstimate) ou None"""
+        if self.depth_prior is None:
+            return None
+        return self.depth_prior.estimate(x_m, y_m)
+
+    def _start_ocr_with_progress(self, img_data_raw, x_m, y_m, region=None, clip_loader=None, trace=None):
+        self._join_discarded_prefetch()
+        self._show_progress_dialog()
         
         # SUGESTÃO: Preparação para Parâmetros Configuráveis
         # Passa os parâmetros para a thread
-        self.worker_thread = OCRWorkerThread(self, img_data_raw, x_m, y_m, self.rotations, self.preprocess_methods)
+        self.worker_thread = OCRWorkerThread(self.pipeline, img_data_raw, x_m, y_m,
+                                             region=region, clip_loader=clip_loader,
+                                             trace=trace, trace_recorder=self.trace_recorder,
+                                             prior=self._depth_estimate(x_m, y_m))
         self.worker_thread.progress_update.connect(self._update_progress)
         self.worker_thread.result_ready.connect(self._handle_ocr_result)
         self.worker_thread.error_occurred.connect(self._handle_ocr_error)
         self.worker_thread.finished.connect(self._cleanup_progress_safe)
         
         self.worker_thread.start()
-        self.progress_dialog.show()
-    
+        if self.progress_dialog:
+            self.progress_dialog.show()
+
+    def _show_progress_dialog(self):
+        self.user_cancelled = False
+        self.analysis_completed = False
+        if self.review_queue is not None:
+            # Com a fila de revisão o progresso aparece no painel, sem janela
+            self._update_queue_status("🔍 Preparando análise OCR...")
+            return
+        
+        self.progress_dialog = QProgressDialog("🔍 Preparando análise OCR...", "❌ Cancelar", 0, 100, self.iface.mainWindow())
+        self.progress_dialog.setWindowTitle("🤖 Depth Reader OCR - Analisando Batimetria")
+        self.progress_dialog.setAutoClose(False)
+        self.progress_dialog.setAutoReset(False)
+        self.progress_dialog.setMinimumWidth(400)
+        self.progress_dialog.canceled.connect(self._cancel_ocr)
+
+    # ---------- Seleção de área ----------
+    def canvasPressEvent(self, event):
+        if self.use_ocr and event.button() == Qt.LeftButton:
+            self.area_start = event.pos()
+            self.area_dragging = False
+
+    def _update_area_band(self, start, end):
+        to_map = self.canvas.getCoordinateTransform().toMapCoordinates
+        if self.area_band is None:
+            self.area_band = QgsRubberBand(self.canvas, QgsWkbTypes.PolygonGeometry)
+            self.area_band.setColor(QColor(0, 120, 255, 220))
+            self.area_band.setFillColor(QColor(0, 120, 255, 40))
+            self.area_band.setWidth(1)
+        self.area_band.setToGeometry(QgsGeometry.fromRect(QgsRectangle(to_map(start), to_map(end))), None)
+
+    def _clear_area_band(self):
+        if self.area_band is not None:
+            self.canvas.scene().removeItem(self.area_band)
+            self.area_band = None
+
+    def _finish_area_selection(self, start, end):
+        """Converte o retângulo arrastado em janela de pixels e inicia a leitura da área."""
+        self._clear_area_band()
+        if self.area_thread is not None or self.worker_thread is not None:
+            self.iface.messageBar().pushWarning("Depth Reader OCR", "⏳ Aguarde a análise em andamento.")
+            return
+        if not OPENCV_AVAILABLE:
+            QMessageBox.critical(self.iface.mainWindow(), "Dependência Faltando", "❌ OpenCV não está disponível!")
+            return
+        layer = self.iface.activeLayer()
+        if not isinstance(layer, QgsRasterLayer) or layer.providerType() != 'gdal':
+            QMessageBox.warning(None, "Aviso", "Selecione uma carta raster como camada ativa.")
+            return
+
+        raster_path = layer.source()
+        dataset = gdal.Open(raster_path, gdal.GA_ReadOnly)
+        if dataset is None:
+            QMessageBox.critical(None, "Erro GDAL", "Não foi possível abrir o raster com GDAL")
+            return
+        geotransform = dataset.GetGeoTransform()
+        dataset = None
+        to_map = self.canvas.getCoordinateTransform().toMapCoordinates
+        corners = [raster_io.map_to_pixel(geotransform, point.x(), point.y()) for point in (to_map(start), to_map(end))]
+        xs, ys = [px for px, _ in corners], [py for _, py in corners]
+        window = (min(xs), min(ys), max(xs), max(ys))
+        print(f"\n⬚ Área selecionada: pixels X={window[0]}..{window[2]}, Y={window[1]}..{window[3]}")
+
+        self.stop_prefetch(wait=False)
+        batch = area_batch.AreaBatch(self.pipeline, raster_path, clip_size=self.clip_size, store=self.result_store,
+                                     prior=self.depth_prior)
+        self.area_raster_path = raster_path
+        self.area_progress = QProgressDialog("🗺️ Lendo a área selecionada...", "❌ Cancelar", 0, 100, self.iface.mainWindow())
+        self.area_progress.setWindowTitle("🤖 Depth Reader OCR - Sondagens da Área")
+        self.area_progress.setAutoClose(False)
+        self.area_progress.setAutoReset(False)
+        self.area_progress.setMinimumWidth(400)
+
+        self.area_thread = BatchThread(batch, window)
+        self.area_progress.canceled.connect(self.area_thread.cancel)
+        self.area_thread.progress_update.connect(self._update_area_progress)
+        self.area_thread.batch_finished.connect(self._handle_area_result)
+        self.area_thread.error_occurred.connect(self._handle_area_error)
+        self.area_thread.finished.connect(self._cleanup_area)
+        self.area_thread.start()
+        self.area_progress.show()
+
+    def _update_area_progress(self, message, progress):
+        if self.area_progress:
+            self.area_progress.setLabelText(message)
+            self.area_progress.setValue(progress)
+
+    def _handle_area_result(self, results, stats):
+        if self.area_progress:
+            self.area_progress.close()
+            self.area_progress = None
+        if not results:
+            self.iface.messageBar().pushMessage("Depth Reader OCR", "Nenhuma sondagem encontrada na área.",
+                                                level=Qgis.Info, duration=4)
+            return
+        print(f"⬚ {stats['soundings']} sondagem(ns) na área: {stats['ok']} confiáveis, " +
+              f"{stats['review']} para revisão, {stats['resumed']} reaproveitadas do banco")
+        dialog = AreaReviewDialog(results, self.iface.mainWindow())
+        dialog.point_selected.connect(self._show_review_marker)
+        try:
+            if dialog.exec_():
+                self._save_area_decisions(dialog.decisions())
+        finally:
+            self._clear_review_marker()
+
+    def _handle_area_error(self, error_message):
+        QMessageBox.critical(self.iface.mainWindow(), "❌ Erro na Leitura da Área", f"❌ Erro durante a análise:\n\n{error_message}")
+
+    def _cleanup_area(self):
+        if self.area_progress:
+            self.area_progress.close()
+        self.area_progress = None
+        self.area_thread = None
+        self._touch_idle()
+
+    def _show_review_marker(self, x, y):
+        """Destaca no canvas a sondagem da linha selecionada na revisão."""
+        if self.review_marker is None:
+            self.review_marker = QgsRubberBand(self.canvas, QgsWkbTypes.PointGeometry)
+            self.review_marker.setColor(QColor(255, 0, 0, 220))
+            self.review_marker.setIconSize(14)
+            self.review_marker.setWidth(2)
+        self.review_marker.setToGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)), None)
+
+    def _clear_review_marker(self):
+        if self.review_marker is not None:
+            self.canvas.scene().removeItem(self.review_marker)
+            self.review_marker = None
+
+    def _save_area_decisions(self, decisions):
+        """Grava no CSV as sondagens marcadas e os vereditos de todas as linhas de uma vez."""
+        rows = [(round(result['x'], 2), round(result['y'], 2), depth_cm)
+                for result, verdict, depth_cm in decisions if verdict != result_store.VERDICT_REJECTED]
+        if self.result_store is not None:
+            try:
+                for result, verdict, depth_cm in decisions:
+                    if result['clip_id'] is not None:
+                        self.result_store.set_verdict(result['clip_id'], verdict, depth_cm)
+            except Exception as e:
+                print(f"⚠️ Erro ao gravar os vereditos: {e}")
+        if not rows:
+            return
+        try:
+            self._append_csv_rows(rows)
+        except Exception as e:
+            QMessageBox.critical(self.iface.mainWindow(), "❌ Erro ao Salvar", f"❌ Erro ao salvar dados:\n\n{str(e)}")
+            return
+
+        index = self.text_indexes.get(self.area_raster_path) if self.text_indexes is not None else None
+        if index is not None:
+            for result, verdict, _ in decisions:
+                candidate = index.nearest(result['px'], result['py'], self.clip_size / 2.0)
+                if verdict != result_store.VERDICT_REJECTED and candidate is not None:
+                    index.captured[candidate] = True
+            self.refresh_candidate_highlight()
+        corrected = sum(1 for _, verdict, _ in decisions if verdict == result_store.VERDICT_CORRECTED)
+        message = f"✅ {len(rows)} profundidade(s) salva(s) da área ({corrected} corrigida(s))"
+        self.iface.messageBar().pushMessage("Depth Reader OCR", message, level=Qgis.Success, duration=5)
+
+    def stop_area_batch(self):
+        """Cancela a leitura de área em andamento (troca de ferramenta e unload)."""
+        self._clear_area_band()
+        self._clear_review_marker()
+        if self.area_thread is not None:
+            self.area_thread.cancel()
+            self.area_thread.wait()
+
+    # ---------- Pré-carregamento sob o cursor ----------
+    def canvasMoveEvent(self, event):
+        if self.area_start is not None and event.buttons() & Qt.LeftButton:
+            pos = event.pos()
+            if self.area_dragging or (pos - self.area_start).manhattanLength() > self.AREA_DRAG_PX:
+                if not self.area_dragging:
+                    # O arrasto não é um clique: nada de pré-carregamento sob o cursor
+                    self.prefetch_timer.stop()
+                    self._discard_prefetch(self.prefetch_thread)
+                    self.area_dragging = True
+                self._update_area_band(self.area_start, pos)
+            return
+        if not self.use_ocr or self.prefetch_mode is None:
+            return
+        pos = event.pos()
+        if self.prefetch_pos is not None and (pos - self.prefetch_pos).manhattanLength() <= self.PREFETCH_JITTER_PX:
+            return
+        self.prefetch_pos = pos
+        # O cursor saiu da janela pré-carregada: o trabalho especulativo é descartado
+        self._discard_prefetch(self.prefetch_thread)
+        self.prefetch_timer.start(self.PREFETCH_DWELL_MS)
+
+    def _start_prefetch(self):
+        if self.worker_thread is not None or self.progress_dialog is not None or self.prefetch_pos is None:
+            return
+        if len(self.prefetch_threads) >= self.MAX_PREFETCH_THREADS:
+            return
+        layer = self.iface.activeLayer()
+        if not isinstance(layer, QgsRasterLayer) or layer.providerType() != 'gdal':
+            return
+        point = self.canvas.getCoordinateTransform().toMapCoordinates(self.prefetch_pos)
+        # Passar o cursor não carrega os modelos: sem engines na memória só o recorte é lido
+        analyze = self.prefetch_mode == "analyze" and self.pipeline.easyocr_reader is not None
+        thread = PrefetchThread(self, layer.source(), round(point.x(), 2), round(point.y(), 2),
+                                type(self.prefetch_pos)(self.prefetch_pos), self.canvas.extent(),
+                                analyze=analyze)
+        thread.result_ready.connect(lambda result, x_m, y_m, t=thread: self._on_prefetch_result(t, result, x_m, y_m))
+        thread.progress_update.connect(lambda message, progress, t=thread: t.adopted and self._update_progress(message, progress))
+        thread.error_occurred.connect(lambda message, t=thread: self._on_prefetch_error(t, message))
+        thread.finished.connect(lambda t=thread: self._on_prefetch_finished(t))
+        self.prefetch_threads.add(thread)
+        self.prefetch_thread = thread
+        thread.start()
+
+    def _claim_prefetch(self, raster_path, pos):
+        """Pré-carregamento reaproveitável pelo clique (mesma carta, posição e extensão), ou None."""
+        thread = self.prefetch_thread
+        if thread is None:
+            return None
+        if (thread.is_cancelled or thread.prepared is None or thread.raster_path != raster_path or
+                (pos - thread.screen_pos).manhattanLength() > self.PREFETCH_JITTER_PX or
+                thread.extent != self.canvas.extent()):
+            self._discard_prefetch(thread)
+            return None
+        self.prefetch_thread = None
+        return thread
+
+    def _discard_prefetch(self, thread):
+        if thread is None or thread.adopted:
+            return
+        thread.cancel()
+        if thread is self.prefetch_thread:
+            self.prefetch_thread = None
+
+    def _join_discarded_prefetch(self):
+        """
+        Espera as análises especulativas descartadas saírem do pipeline antes de o
+        clique iniciar a sua (senão disputam as engines e seguram o descarregamento).
+        """
+        for thread in list(self.prefetch_threads):
+            if thread.adopted or thread is self.prefetch_thread:
+                continue
+            thread.cancel()
+            thread.wait()
+
+    def _adopt_prefetch(self, thread):
+        """O clique assume a análise especulativa (concluída ou em andamento)."""
+        thread.adopted = True
+        self.worker_thread = thread
+        finished = thread not in self.prefetch_threads
+        if thread.outcome is not None or finished:
+            # Já terminou e os sinais já chegaram: o resultado aparece sem esperar
+            self.analysis_completed = True
+            self.trace_recorder.record(thread.trace)
+            if thread.outcome is not None:
+                self._handle_ocr_result(*thread.outcome)
+            else:
+                self._handle_ocr_error("A análise antecipada não produziu resultado.")
+            if self.worker_thread is thread:
+                self.worker_thread = None
+            self._schedule_backlog()
+            return
+        # Em andamento (ou terminada com result_ready/finished ainda na fila de eventos):
+        # _on_prefetch_result e _on_prefetch_finished entregam o resultado ou o erro
+        self._show_progress_dialog()
+        if self.progress_dialog:
+            self.progress_dialog.show()
+
+    def _on_prefetch_result(self, thread, result, x_m, y_m):
+        thread.outcome = (result, x_m, y_m)
+        if thread.adopted and thread is self.worker_thread:
+            self._handle_ocr_result(result, x_m, y_m)
+
+    def _on_prefetch_error(self, thread, message):
+        if thread.adopted and thread is self.worker_thread:
+            self._handle_ocr_error(message)
+        else:
+            print(f"⚠️ Erro na análise antecipada: {message}")
+
+    def _on_prefetch_finished(self, thread):
+        self.prefetch_threads.discard(thread)
+        self._touch_idle()
+        if thread is self.prefetch_thread and thread.is_cancelled:
+            self.prefetch_thread = None
+        if thread.adopted and thread is self.worker_thread:
+            self.trace_recorder.record(thread.trace)
+            QgsMessageLog.logMessage(thread.trace.summary(), "DepthReaderOCR", Qgis.Info)
+            if thread.outcome is None and not self.analysis_completed and not self.user_cancelled:
+                self._handle_ocr_error("A análise antecipada não produziu resultado.")
+            self._cleanup_progress_safe()
+
+    def stop_prefetch(self, wait=True):
+        """Cancela o trabalho especulativo; com wait, espera as threads (troca de ferramenta e unload)."""
+        self.prefetch_timer.stop()
+        self.prefetch_thread = None
+        self.prefetch_pos = None
+        for thread in list(self.prefetch_threads):
+            if thread.adopted:
+                continue
+            thread.cancel()
+            if wait:
+                thread.wait()
+                self.prefetch_threads.discard(thread)
+
+    def deactivate(self):
+        self.stop_prefetch(wait=False)
+        super().deactivate()
+
+    # ---------- Memória ----------
+    def _touch_idle(self):
+        """Reinicia a contagem de ociosidade (chamado ao fim de cada análise)."""
+        if self.idle_unload_ms > 0:
+            self.idle_timer.start(self.idle_unload_ms)
+
+    def _unload_idle_engines(self):
+        if self.worker_thread is not None or self.area_thread is not None or self.prefetch_threads:
+            self._touch_idle()
+            return
+        if self.pipeline.easyocr_reader is None:
+            return
+        if self.pipeline.unload_engines():
+            message = f"💤 Modelos do EasyOCR liberados após {self.idle_unload_ms // 60000} min sem uso"
+            print(message)
+            QgsMessageLog.logMessage(message, "DepthReaderOCR", Qgis.Info)
+        else:
+            # Um lote do plugin ainda usa o pipeline: tenta de novo mais tarde
+            self._touch_idle()
+
+    def release_engines(self):
+        """Libera os modelos da ferramenta (troca de configuração e unload)."""
+        self.idle_timer.stop()
+        self.pipeline.unload_engines()
+
     def _update_progress(self, message, progress):
         if self.progress_dialog:
             self.progress_dialog.setLabelText(message)
             self.progress_dialog.setValue(progress)
             QApplication.processEvents()
+        elif self.review_queue is not None:
+            self._update_queue_status(f"{message.splitlines()[0]} ({progress}%)")
     
     def _cancel_ocr(self):
         print("🚫 Usuário solicitou cancelamento da análise OCR")
@@ -578,10 +1666,18 @@ class ClickTool(QgsMapToolEmitPoint):
     
     def _handle_ocr_result(self, profundidade_cm, x_m, y_m):
         print(f"📊 Resultado OCR recebido: {profundidade_cm}cm para coordenadas ({x_m}, {y_m})")
+        if self.pending_corpus is not None:
+            self.pending_corpus['chosen_cm'] = profundidade_cm
         self.analysis_completed = True
         if self.progress_dialog:
             self.progress_dialog.close()
             self.progress_dialog = None
+        if self.worker_thread is not None:
+            self._store_ocr_result(profundidade_cm, x_m, y_m, self.worker_thread.candidates)
+
+        if self.review_queue is not None:
+            self._enqueue_review(profundidade_cm, x_m, y_m)
+            return
         
         if profundidade_cm == self.OCR_FAILED:
             reply = QMessageBox.question(
@@ -591,6 +1687,7 @@ class ClickTool(QgsMapToolEmitPoint):
             if reply == QMessageBox.Yes:
                 self._request_manual_depth_input(x_m, y_m)
             else:
+                self._record_verdict(result_store.VERDICT_REJECTED)
                 self.iface.messageBar().pushMessage("Depth Reader OCR", "Ponto ignorado. Clique em outro local.", level=Qgis.Info, duration=4)
         else:
             profundidade_m = profundidade_cm / 100
@@ -602,16 +1699,118 @@ class ClickTool(QgsMapToolEmitPoint):
                 f"🤖 O Depth Reader detectou:\n\n🌊 Profundidade: {depth_display}\n📍 Coordenadas: X={x_m}, Y={y_m}\n\n❓ A detecção está correta?",
                 QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
             if reply == QMessageBox.Yes:
+                self._record_verdict(result_store.VERDICT_ACCEPTED, profundidade_cm)
                 self._save_to_csv(x_m, y_m, profundidade_cm)
             else:
                 self._request_manual_depth_input(x_m, y_m)
     
+    # ---------- Fila de revisão ----------
+    def _take_pending(self):
+        """Estado do clique aguardando veredito (retirado da ferramenta para a fila)."""
+        pending = {'store_key': self.pending_store_key, 'clip_id': self.pending_clip_id,
+                   'candidate': self.pending_candidate, 'harvest': self.pending_harvest,
+                   'corpus': self.pending_corpus}
+        self._restore_pending({})
+        return pending
+
+    def _restore_pending(self, pending):
+        self.pending_store_key = pending.get('store_key')
+        self.pending_clip_id = pending.get('clip_id')
+        self.pending_candidate = pending.get('candidate')
+        self.pending_harvest = pending.get('harvest')
+        self.pending_corpus = pending.get('corpus')
+
+    def _enqueue_review(self, profundidade_cm, x_m, y_m):
+        review, self.pending_review = self.pending_review or {}, None
+        score = review.get('score')
+        thread = self.worker_thread
+        if thread is not None and thread.candidates is not None:
+            score = self.pipeline._best_score(thread.candidates, thread.prior)
+        failed = profundidade_cm == self.OCR_FAILED
+        self.review_queue.add_result({
+            'x_m': x_m, 'y_m': y_m, 'depth_cm': None if failed else profundidade_cm,
+            'score': None if failed else score, 'img': review.get('img'), 'pending': self._take_pending(),
+        })
+        self._update_queue_status()
+
+    def _on_review_decided(self, item, verdict, final_cm):
+        """Veredito vindo do painel: grava como no fluxo de diálogos, sem perder o clique em andamento."""
+        current = self._take_pending()
+        self._restore_pending(item['pending'])
+        try:
+            self._record_verdict(verdict, final_cm)
+            if verdict == result_store.VERDICT_REJECTED:
+                self.pending_candidate = None
+            else:
+                self._save_to_csv(item['x_m'], item['y_m'], final_cm)
+        finally:
+            self._restore_pending(current)
+
+    def _update_queue_status(self, message=None):
+        if self.review_queue is None:
+            return
+        if message is None:
+            message = "⏳ Analisando..." if self.worker_thread is not None else "✅ Nenhuma análise em andamento"
+        if self.click_backlog:
+            message += f" | 📥 {len(self.click_backlog)} clique(s) aguardando"
+        self.review_queue.set_status(message)
+
+    def _schedule_backlog(self):
+        if self.click_backlog:
+            QTimer.singleShot(0, self._next_backlog_click)
+        else:
+            self._update_queue_status()
+
+    def _next_backlog_click(self):
+        """Inicia o próximo clique feito durante a análise anterior."""
+        if self.worker_thread is not None or not self.click_backlog:
+            return
+        raster_path, x_m, y_m = self.click_backlog.popleft()
+        try:
+            self._analyze_click(raster_path, x_m, y_m)
+        except Exception as e:
+            print(f"❌ Erro ao analisar o clique da fila: {e}")
+        if self.worker_thread is None:
+            # Respondido na hora (banco/reconhecedor) ou fora da carta: segue para o próximo
+            self._schedule_backlog()
+
+    def _cancel_queue(self):
+        """Cancela a análise em andamento e descarta os cliques aguardando."""
+        self.click_backlog.clear()
+        if self.worker_thread is not None and self.worker_thread.isRunning():
+            self.user_cancelled = True
+            self.worker_thread.cancel()
+        self._update_queue_status("🚫 Análises canceladas")
+
+    def detach_review_queue(self):
+        """Desconecta o painel (troca de ferramenta e unload); os itens na fila passam à nova ferramenta."""
+        if self.review_queue is None:
+            return
+        for signal, slot in ((self.review_queue.decided, self._on_review_decided),
+                             (self.review_queue.point_selected, self._show_review_marker),
+                             (self.review_queue.cancel_requested, self._cancel_queue)):
+            try:
+                signal.disconnect(slot)
+            except TypeError:
+                pass
+        self.click_backlog.clear()
+        self._clear_review_marker()
+        self.review_queue = None
+
     def _handle_ocr_error(self, error_message):
         print(f"❌ Erro no processamento OCR: {error_message}")
         self.analysis_completed = True
         if self.progress_dialog:
             self.progress_dialog.close()
             self.progress_dialog = None
+        thread = self.worker_thread
+        if self.review_queue is not None and thread is not None:
+            # Sem janela modal: o clique entra na fila como falha de OCR (valor digitado na revisão)
+            # e os cliques aguardando seguem
+            self._enqueue_review(self.OCR_FAILED, thread.x_m, thread.y_m)
+            self._update_queue_status(f"❌ Erro na análise em ({thread.x_m}, {thread.y_m}): {error_message}")
+            return
+        self.pending_review = None
         QMessageBox.critical(
             self.iface.mainWindow(), "❌ Erro no Processamento OCR",
             f"❌ Erro durante a análise:\n\n{error_message}")
@@ -624,106 +1823,31 @@ class ClickTool(QgsMapToolEmitPoint):
         self.worker_thread = None
         self.user_cancelled = False
         self.analysis_completed = False
+        self._touch_idle()
+        self._schedule_backlog()
         print("✅ Limpeza de recursos concluída")
 
-    def _preprocess_clahe(self, img):
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        return clahe.apply(img)
-
-    def _preprocess_adaptive_threshold(self, img, method, block_size, C):
-        binary = cv2.adaptiveThreshold(img, 255, method, cv2.THRESH_BINARY_INV, block_size, C)
-        kernel = np.ones((2, 2), np.uint8)
-        return cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-
-    def _perform_ocr_easyocr(self, img):
-        results = []
-        if self.easyocr_reader is not None:
-            try:
-                ocr_results = self.easyocr_reader.readtext(img, detail=True, allowlist='0123456789', width_ths=0.001, height_ths=0.001, paragraph=False, min_size=5)
-                for (bbox, text, confidence) in ocr_results:
-                    cleaned_text = re.sub(r'[^\d]', '', str(text))
-                    if cleaned_text and confidence > 0.5:
-                        results.append((cleaned_text, "easyocr", confidence))
-            except Exception as e:
-                print(f"❌ Erro EasyOCR: {e}")
-        return results
-
-    def _perform_ocr_tesseract(self, img):
-        results = []
-        if self.tesseract_available and PIL_AVAILABLE:
-            try:
-                pil_img = Image.fromarray(img)
-                tess_config = r'--psm 6 -c tessedit_char_whitelist=0123456789'
-                data = pytesseract.image_to_data(pil_img, output_type=pytesseract.Output.DICT, config=tess_config)
-                for i in range(len(data['text'])):
-                    text = data['text'][i].strip()
-                    conf = int(data['conf'][i])
-                    cleaned_text = re.sub(r'[^\d]', '', str(text))
-                    if cleaned_text and conf > 50:
-                        results.append((cleaned_text, "tesseract", conf / 100.0))
-            except Exception as e:
-                print(f"❌ Erro Tesseract: {e}")
-        return results
-
-    def _process_all_results(self, candidates):
-        valid_results = []
-        for text, method, angle, pp_method, ocr_confidence, text_len in candidates:
-            numbers_only = re.sub(r'[^\d]', '', str(text))
-            if not numbers_only or not (1 <= len(numbers_only) <= 3):
-                continue
-
-            try:
-                value = int(numbers_only)
-                if 1 <= value <= 999:
-                    # SUGESTÃO: Usar constantes para o algoritmo de scoring.
-                    final_score = ocr_confidence
-                    if value in self.common_depths:
-                        final_score *= self.COMMON_DEPTH_BONUS
-                    else:
-                        final_score *= self.UNCOMMON_DEPTH_PENALTY
-                    final_score += (len(numbers_only) * self.TEXT_LENGTH_BONUS_FACTOR)
-                    
-                    valid_results.append((value, final_score, method, angle, pp_method, ocr_confidence, len(numbers_only)))
-                    print(f"📊 Candidato: {value}m (Score Final: {final_score:.2f}, OCR Conf: {ocr_confidence:.2f}, Len: {len(numbers_only)})")
-            except ValueError:
-                pass
-
-        if not valid_results:
-            return self.OCR_FAILED
-
-        valid_results.sort(key=lambda x: x[1], reverse=True)
-        best_value = valid_results[0][0]
-        return int(best_value * 100)
-
-    def _save_debug_data(self, data, x_m, y_m, suffix):
-        try:
-            debug_dir = self.debug_dir
-            os.makedirs(debug_dir, exist_ok=True)
-            img_to_save = data if len(data.shape) == 3 else data
-            if img_to_save.dtype != np.uint8:
-                img_min, img_max = img_to_save.min(), img_to_save.max()
-                img_to_save = ((img_to_save - img_min) / (img_max - img_min) * 255).astype(np.uint8) if img_max > img_min else np.full_like(img_to_save, 128, dtype=np.uint8)
-            
-            filename = f"{suffix}_{x_m}_{y_m}.png"
-            filepath = os.path.join(debug_dir, filename)
-            cv2.imwrite(filepath, img_to_save)
-            print(f"💾 Debug salvo: {filepath}")
-        except Exception as e:
-            print(f"❌ Erro ao salvar debug: {e}")
+    def _append_csv_rows(self, rows):
+        """Acrescenta [(x_m, y_m, profundidade_cm)] ao CSV de saída em uma única abertura do arquivo."""
+        write_header = not os.path.exists(self.csv_path)
+        with open(self.csv_path, mode='a', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            if write_header:
+                writer.writerow(['X_m', 'Y_m', 'Profundidade_cm', 'Profundidade_m'])
+            for x_m, y_m, profundidade_cm in rows:
+                profundidade_m = profundidade_cm / 100 if profundidade_cm != self.OCR_FAILED else self.OCR_FAILED
+                writer.writerow([x_m, y_m, profundidade_cm, profundidade_m])
+        if self.depth_prior is not None:
+            for x_m, y_m, profundidade_cm in rows:
+                self.depth_prior.add(x_m, y_m, profundidade_cm)
 
     def _save_to_csv(self, x_m, y_m, profundidade_cm):
         try:
-            csv_path = self.csv_path
-            write_header = not os.path.exists(csv_path)
-            with open(csv_path, mode='a', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                if write_header:
-                    writer.writerow(['X_m', 'Y_m', 'Profundidade_cm', 'Profundidade_m'])
-                profundidade_m = profundidade_cm / 100 if profundidade_cm != self.OCR_FAILED else self.OCR_FAILED
-                writer.writerow([x_m, y_m, profundidade_cm, profundidade_m])
-            
+            self._append_csv_rows([(x_m, y_m, profundidade_cm)])
+            profundidade_m = profundidade_cm / 100 if profundidade_cm != self.OCR_FAILED else self.OCR_FAILED
             depth_display = f"{profundidade_m:.1f}m"
             message = f"✅ Profundidade salva: {depth_display} em ({x_m}, {y_m})"
             self.iface.messageBar().pushMessage("Depth Reader OCR", message, level=Qgis.Success, duration=5)
+            self._mark_candidate_captured()
         except Exception as e:
             QMessageBox.critical(self.iface.mainWindow(), "❌ Erro ao Salvar", f"❌ Erro ao salvar dados:\n\n{str(e)}")
\ No newline at end of file
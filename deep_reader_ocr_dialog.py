@@ -27,7 +27,14 @@ import os
 from qgis.PyQt import uic
 from qgis.PyQt import QtWidgets
 from qgis.PyQt.QtWidgets import QFileDialog, QCheckBox, QVBoxLayout
-from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtCore import Qt, pyqtSignal
+
+from .result_store import DEFAULT_DB_PATH as RESULT_STORE_PATH
+from .result_store import VERDICT_ACCEPTED, VERDICT_CORRECTED, VERDICT_REJECTED
+from .point_batch import STATUS_OK
+from .click_corpus import DEFAULT_CORPUS_PATH
+from .memory_budget import DEFAULT_CACHE_LIMIT_MB, DEFAULT_IDLE_UNLOAD_MIN
+from .ocr_pipeline import OCRPipeline
 
 # This loads your .ui file so that PyQt can populate your plugin with the elements from Qt Designer
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
@@ -66,6 +73,10 @@ class DepthReaderOCRDialog(QtWidgets.QDialog, FORM_CLASS):
         # Aba Geral
         if hasattr(self, 'leCSVPath'):
             self.leCSVPath.setText(os.path.join(default_user_dir, "batimetria.csv"))
+        if hasattr(self, 'chkReviewQueue'):
+            self.chkReviewQueue.setChecked(True)
+        if hasattr(self, 'dsbAutoAccept'):
+            self.dsbAutoAccept.setValue(0.0)
 
         # Aba Avançado
         if hasattr(self, 'leDebugDir'):
@@ -76,6 +87,29 @@ class DepthReaderOCRDialog(QtWidgets.QDialog, FORM_CLASS):
             self.cbClipSize.setCurrentText("96")
             self.cbClipSize.setEnabled(True)
         
+        if hasattr(self, 'chkAdaptiveClip'):
+            self.chkAdaptiveClip.setChecked(True)
+        if hasattr(self, 'chkClickRoi'):
+            self.chkClickRoi.setChecked(True)
+        if hasattr(self, 'chkColorSeparation'):
+            self.chkColorSeparation.setChecked(True)
+        if hasattr(self, 'chkDepthPrior'):
+            self.chkDepthPrior.setChecked(True)
+        if hasattr(self, 'chkTextIndex'):
+            self.chkTextIndex.setChecked(True)
+        if hasattr(self, 'chkHighlightCandidates'):
+            self.chkHighlightCandidates.setChecked(False)
+        if hasattr(self, 'chkResultStore'):
+            self.chkResultStore.setChecked(True)
+        if hasattr(self, 'chkGlyphRecognizer'):
+            self.chkGlyphRecognizer.setChecked(True)
+        if hasattr(self, 'chkOcrServer'):
+            self.chkOcrServer.setChecked(True)
+        if hasattr(self, 'chkTraceFile'):
+            self.chkTraceFile.setChecked(False)
+        if hasattr(self, 'chkRecordCorpus'):
+            self.chkRecordCorpus.setChecked(False)
+        
         # Define os valores padrão para os novos campos de configuração do OCR
         if hasattr(self, 'leRotations'):
             self.leRotations.setText("-90, -45, 0, 45, 90, 180, 270")
@@ -85,6 +119,43 @@ class DepthReaderOCRDialog(QtWidgets.QDialog, FORM_CLASS):
             self.chkGaussian.setChecked(True)
         if hasattr(self, 'chkMean'):
             self.chkMean.setChecked(True)
+        if hasattr(self, 'cbOcrBackend'):
+            self.cbOcrBackend.clear()
+            self.cbOcrBackend.addItem("PyTorch (padrão)", "torch")
+            self.cbOcrBackend.addItem("ONNX Runtime (FP32)", "onnx")
+            self.cbOcrBackend.addItem("ONNX Runtime (INT8 quantizado)", "onnx_int8")
+            self.cbOcrBackend.setCurrentIndex(0)
+        if hasattr(self, 'cbEngineOrder'):
+            self.cbEngineOrder.clear()
+            self.cbEngineOrder.addItem("EasyOCR → Tesseract (cascata)", ["easyocr", "tesseract"])
+            self.cbEngineOrder.addItem("Tesseract → EasyOCR (cascata)", ["tesseract", "easyocr"])
+            self.cbEngineOrder.addItem("Ambas em todas as variantes (sem cascata)", None)
+            self.cbEngineOrder.setCurrentIndex(0)
+        if hasattr(self, 'cbPrefetch'):
+            self.cbPrefetch.clear()
+            self.cbPrefetch.addItem("Desativado", None)
+            self.cbPrefetch.addItem("Ler o recorte (padrão)", "read")
+            self.cbPrefetch.addItem("Ler e analisar (resultado quase imediato, usa CPU ociosa)", "analyze")
+            self.cbPrefetch.setCurrentIndex(1)
+        if hasattr(self, 'chkTesseractMontage'):
+            self.chkTesseractMontage.setChecked(True)
+        if hasattr(self, 'dsbCascadeConfidence'):
+            self.dsbCascadeConfidence.setValue(OCRPipeline.CASCADE_CONFIDENCE)
+        if hasattr(self, 'dsbCascadeTieMargin'):
+            self.dsbCascadeTieMargin.setValue(OCRPipeline.CASCADE_TIE_MARGIN)
+        if hasattr(self, 'sbWorkers'):
+            self.sbWorkers.setMaximum(os.cpu_count() or 1)
+            self.sbWorkers.setValue(1)
+        if hasattr(self, 'sbEngineThreads'):
+            self.sbEngineThreads.setMaximum(os.cpu_count() or 1)
+            self.sbEngineThreads.setValue(0)
+        if hasattr(self, 'sbReserveCores'):
+            self.sbReserveCores.setMaximum(max(0, (os.cpu_count() or 1) - 1))
+            self.sbReserveCores.setValue(1 if (os.cpu_count() or 1) > 1 else 0)
+        if hasattr(self, 'sbIdleUnloadMin'):
+            self.sbIdleUnloadMin.setValue(DEFAULT_IDLE_UNLOAD_MIN)
+        if hasattr(self, 'sbCacheLimitMb'):
+            self.sbCacheLimitMb.setValue(DEFAULT_CACHE_LIMIT_MB)
         
         # Aba Sobre
         if hasattr(self, 'tbInfo'):
@@ -227,6 +298,106 @@ class DepthReaderOCRDialog(QtWidgets.QDialog, FORM_CLASS):
         except AttributeError:
             return True
 
+    def get_adaptive_clip(self):
+        try:
+            return self.chkAdaptiveClip.isChecked()
+        except AttributeError:
+            return True
+
+    def get_color_separation(self):
+        """Isola a tinta preta das sondagens (bandas RGB) antes do OCR."""
+        try:
+            return self.chkColorSeparation.isChecked()
+        except AttributeError:
+            return True
+
+    def get_use_depth_prior(self):
+        """Pondera as leituras pelas sondagens vizinhas já capturadas no CSV."""
+        try:
+            return self.chkDepthPrior.isChecked()
+        except AttributeError:
+            return True
+
+    def get_use_review_queue(self):
+        """Resultados vão para o painel de revisão em vez de janelas de confirmação."""
+        try:
+            return self.chkReviewQueue.isChecked()
+        except AttributeError:
+            return True
+
+    def get_auto_accept_score(self):
+        """Score a partir do qual a leitura é gravada sem revisão (0 = desativado)."""
+        try:
+            return self.dsbAutoAccept.value()
+        except AttributeError:
+            return 0.0
+
+    def get_use_click_roi(self):
+        try:
+            return self.chkClickRoi.isChecked()
+        except AttributeError:
+            return True
+
+    def get_use_text_index(self):
+        try:
+            return self.chkTextIndex.isChecked()
+        except AttributeError:
+            return True
+
+    def get_highlight_candidates(self):
+        try:
+            return self.chkHighlightCandidates.isChecked()
+        except AttributeError:
+            return False
+
+    def get_result_store_path(self):
+        """Banco SQLite de resultados, ou None se desativado."""
+        try:
+            if not self.chkResultStore.isChecked():
+                return None
+        except AttributeError:
+            pass
+        return RESULT_STORE_PATH
+
+    def get_use_glyph_recognizer(self):
+        """Aprende a fonte dos dígitos de cada carta com os valores confirmados."""
+        try:
+            return self.chkGlyphRecognizer.isChecked()
+        except AttributeError:
+            return True
+
+    def get_prefetch_mode(self):
+        """Pré-carregamento sob o cursor parado: None, "read" ou "analyze"."""
+        try:
+            return self.cbPrefetch.currentData()
+        except AttributeError:
+            return "read"
+
+    def get_use_ocr_server(self):
+        """Usa o servidor OCR local quando estiver em execução."""
+        try:
+            return self.chkOcrServer.isChecked()
+        except AttributeError:
+            return True
+
+    def get_trace_path(self):
+        """Arquivo JSON lines dos traces de desempenho, ou None se desativado."""
+        try:
+            if not self.chkTraceFile.isChecked():
+                return None
+        except AttributeError:
+            return None
+        return os.path.join(self.get_debug_directory(), "depth_reader_trace.jsonl")
+
+    def get_corpus_path(self):
+        """Corpus de cliques para o replay de desempenho, ou None se a gravação estiver desativada."""
+        try:
+            if not self.chkRecordCorpus.isChecked():
+                return None
+        except AttributeError:
+            return None
+        return DEFAULT_CORPUS_PATH
+
     def get_rotations(self):
         """Lê a string de rotações, limpa e converte para uma lista de inteiros."""
         try:
@@ -248,4 +419,162 @@ class DepthReaderOCRDialog(QtWidgets.QDialog, FORM_CLASS):
             return config
         except AttributeError as e:
             print(f"⚠️ Erro ao ler configuração de filtros: {e}. Usando valores padrão.")
-            return {"clahe": True, "gaussian": True, "mean": True}
\ No newline at end of file
+            return {"clahe": True, "gaussian": True, "mean": True}
+
+    def get_ocr_backend(self):
+        """Retorna o backend de inferência do EasyOCR: 'torch', 'onnx' ou 'onnx_int8'."""
+        try:
+            return self.cbOcrBackend.currentData() or "torch"
+        except AttributeError:
+            return "torch"
+
+    def get_tesseract_montage(self):
+        """Lê todas as variantes do clique em uma única chamada do Tesseract."""
+        try:
+            return self.chkTesseractMontage.isChecked()
+        except AttributeError:
+            return True
+
+    def get_cascade_config(self):
+        """Retorna a configuração da cascata de engines usada pelo OCRPipeline."""
+        try:
+            order = self.cbEngineOrder.currentData()
+            if order is None:
+                return {"enabled": False}
+            return {
+                "enabled": True,
+                "order": list(order),
+                "confidence": self.dsbCascadeConfidence.value(),
+                "tie_margin": self.dsbCascadeTieMargin.value(),
+            }
+        except AttributeError:
+            return None
+
+    def get_concurrency_config(self):
+        """Retorna a configuração de concorrência usada pelo ResourceGovernor."""
+        try:
+            return {
+                "workers": self.sbWorkers.value(),
+                "engine_threads": self.sbEngineThreads.value(),
+                "reserve_ui_cores": self.sbReserveCores.value(),
+            }
+        except AttributeError as e:
+            print(f"⚠️ Erro ao ler configuração de concorrência: {e}. Usando valores padrão.")
+            return {"workers": 1, "engine_threads": 0, "reserve_ui_cores": 1}
+
+    def get_memory_config(self):
+        """Tempo de ociosidade até liberar os modelos e teto de memória dos caches."""
+        try:
+            return {
+                "idle_unload_min": self.sbIdleUnloadMin.value(),
+                "cache_limit_mb": self.sbCacheLimitMb.value(),
+            }
+        except AttributeError:
+            return {"idle_unload_min": DEFAULT_IDLE_UNLOAD_MIN, "cache_limit_mb": DEFAULT_CACHE_LIMIT_MB}
+
+
+class AreaReviewDialog(QtWidgets.QDialog):
+    """
+    Revisão em tabela das sondagens lidas em uma área: as leituras confiáveis já
+    vêm marcadas, a profundidade pode ser corrigida na própria célula e todas as
+    decisões são gravadas de uma vez.
+    """
+
+    # Linha selecionada: coordenadas (x, y) da sondagem no mapa
+    point_selected = pyqtSignal(float, float)
+
+    COLUMNS = ["Salvar", "X", "Y", "Profundidade (m)", "Confiança", "Situação"]
+    COL_SAVE, COL_DEPTH = 0, 3
+
+    def __init__(self, results, parent=None):
+        super(AreaReviewDialog, self).__init__(parent)
+        self.results = results
+        self.setWindowTitle(f"🤖 Depth Reader OCR - Revisão da Área ({len(results)} sondagens)")
+        self.resize(640, 480)
+
+        self.table = QtWidgets.QTableWidget(len(results), len(self.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        for row, result in enumerate(results):
+            self._fill_row(row, result)
+        self.table.resizeColumnsToContents()
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.currentCellChanged.connect(self._on_current_changed)
+
+        btn_all = QtWidgets.QPushButton("✅ Marcar todas")
+        btn_all.clicked.connect(lambda: self._check_rows(lambda result: result['depth_cm'] is not None))
+        btn_confident = QtWidgets.QPushButton("🎯 Só as confiáveis")
+        btn_confident.clicked.connect(lambda: self._check_rows(lambda result: result['status'] == STATUS_OK))
+        btn_none = QtWidgets.QPushButton("⬜ Desmarcar todas")
+        btn_none.clicked.connect(lambda: self._check_rows(lambda result: False))
+        bulk = QtWidgets.QHBoxLayout()
+        for button in (btn_all, btn_confident, btn_none):
+            bulk.addWidget(button)
+        bulk.addStretch()
+
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Save | QtWidgets.QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self._on_save)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QtWidgets.QLabel("💡 Marque as sondagens a salvar e corrija a profundidade direto na tabela."))
+        layout.addWidget(self.table)
+        layout.addLayout(bulk)
+        layout.addWidget(buttons)
+
+    def _fill_row(self, row, result):
+        read_only = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        check = QtWidgets.QTableWidgetItem()
+        check.setFlags(read_only | Qt.ItemIsUserCheckable)
+        check.setCheckState(Qt.Checked if result['status'] == STATUS_OK else Qt.Unchecked)
+        depth = QtWidgets.QTableWidgetItem("" if result['depth_cm'] is None else f"{result['depth_cm'] / 100:.1f}")
+        depth.setFlags(read_only | Qt.ItemIsEditable)
+        score = "" if result['score'] is None else f"{result['score']:.2f}"
+        cells = [check, f"{result['x']:.2f}", f"{result['y']:.2f}", depth, score, result['status']]
+        for column, cell in enumerate(cells):
+            if not isinstance(cell, QtWidgets.QTableWidgetItem):
+                cell = QtWidgets.QTableWidgetItem(cell)
+                cell.setFlags(read_only)
+            self.table.setItem(row, column, cell)
+
+    def _check_rows(self, predicate):
+        for row, result in enumerate(self.results):
+            state = Qt.Checked if predicate(result) else Qt.Unchecked
+            self.table.item(row, self.COL_SAVE).setCheckState(state)
+
+    def _on_current_changed(self, row, column, previous_row, previous_column):
+        if 0 <= row < len(self.results):
+            self.point_selected.emit(self.results[row]['x'], self.results[row]['y'])
+
+    def _depth_cm(self, row):
+        """Profundidade da célula (editada ou não) em cm; None se vazia ou inválida."""
+        text = self.table.item(row, self.COL_DEPTH).text().strip().replace(",", ".")
+        try:
+            value = float(text)
+        except ValueError:
+            return None
+        return int(round(value * 100)) if value > 0 else None
+
+    def _on_save(self):
+        invalid = [row + 1 for row in range(len(self.results))
+                   if self.table.item(row, self.COL_SAVE).checkState() == Qt.Checked and self._depth_cm(row) is None]
+        if invalid:
+            QtWidgets.QMessageBox.warning(
+                self, "Depth Reader OCR",
+                f"❌ Profundidade inválida nas linhas: {', '.join(map(str, invalid[:10]))}\n\n" +
+                "💡 Corrija o valor ou desmarque a linha.")
+            return
+        self.accept()
+
+    def decisions(self):
+        """[(resultado, veredito, profundidade_cm)] de todas as linhas (rejeitadas com profundidade None)"""
+        decisions = []
+        for row, result in enumerate(self.results):
+            if self.table.item(row, self.COL_SAVE).checkState() != Qt.Checked:
+                decisions.append((result, VERDICT_REJECTED, None))
+                continue
+            depth_cm = self._depth_cm(row)
+            verdict = VERDICT_ACCEPTED if depth_cm == result['depth_cm'] else VERDICT_CORRECTED
+            decisions.append((result, verdict, depth_cm))
+        return decisions
@@ -7,6 +7,7 @@ Verifica e instala automaticamente as bibliotecas necessárias
 import subprocess
 import sys
 import os
+import importlib.util
 from qgis.PyQt.QtWidgets import QMessageBox, QProgressDialog, QApplication
 from qgis.PyQt.QtCore import Qt
 from qgis.core import QgsMessageLog, Qgis
@@ -40,7 +41,9 @@ class DependencyChecker:
                 elif import_name == 'pytesseract':
                     import pytesseract
                 elif import_name == 'easyocr':
-                    import easyocr
+                    # Não importa: o EasyOCR carrega o torch inteiro (desnecessário com backend ONNX)
+                    if importlib.util.find_spec('easyocr') is None:
+                        raise ImportError("No module named 'easyocr'")
                     
                 available.append(import_name)
                 QgsMessageLog.logMessage(f"✅ {import_name} disponível", "DepthReaderOCR", Qgis.Info)
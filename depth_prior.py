@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Estimativa de profundidade a partir das sondagens já capturadas (sem Qt)
+O fundo varia de forma suave: a média ponderada pelo inverso da distância
+das sondagens vizinhas (lidas do CSV de saída e atualizadas a cada
+captura) indica que valores são plausíveis no ponto clicado. O pipeline usa
+a estimativa para penalizar leituras incompatíveis e encerrar a grade de
+rotações/filtros assim que aparece um candidato coerente com a vizinhança.
+"""
+
+import csv
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# Vizinhos usados na estimativa e mínimo para haver estimativa
+NEIGHBORS = 6
+MIN_NEIGHBORS = 3
+# O clique só é estimado se o vizinho mais próximo estiver a até este múltiplo do
+# espaçamento médio entre os próprios vizinhos (fora da nuvem capturada não há estimativa)
+MAX_GAP_FACTOR = 3.0
+# Tolerância: o maior entre o mínimo absoluto, a fração da profundidade e 2 desvios
+MIN_TOLERANCE_M = 1.0
+RELATIVE_TOLERANCE = 0.3
+
+DepthEstimate = namedtuple("DepthEstimate", "depth_m tolerance_m neighbors")
+
+
+def deviation(estimate, value_m):
+    """Distância do valor à estimativa, em tolerâncias (<= 1: coerente com a vizinhança)"""
+    return abs(value_m - estimate.depth_m) / estimate.tolerance_m
+
+
+class DepthPrior:
+    """Índice em memória das sondagens capturadas (x, y, profundidade em metros)"""
+
+    def __init__(self):
+        self._xy = np.zeros((0, 2), dtype=np.float64)
+        self._depth = np.zeros(0, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._depth)
+
+    @property
+    def nbytes(self):
+        return self._xy.nbytes + self._depth.nbytes
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        """Carrega as capturas do CSV de saída (colunas X_m, Y_m, Profundidade_cm)"""
+        prior = cls()
+        if not csv_path or not os.path.exists(csv_path):
+            return prior
+        points = []
+        try:
+            with open(csv_path, newline='', encoding='utf-8') as file:
+                for row in csv.DictReader(file):
+                    try:
+                        x, y, depth_cm = float(row['X_m']), float(row['Y_m']), int(float(row['Profundidade_cm']))
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    if depth_cm > 0:
+                        points.append((x, y, depth_cm / 100.0))
+        except OSError as e:
+            print(f"⚠️ Não foi possível ler as capturas de {csv_path}: {e}")
+        if points:
+            data = np.array(points, dtype=np.float64)
+            prior._xy, prior._depth = data[:, :2], data[:, 2]
+        return prior
+
+    def add(self, x, y, depth_cm):
+        """Acrescenta uma captura confirmada (valores de falha são ignorados)"""
+        if depth_cm is None or depth_cm <= 0:
+            return
+        with self._lock:
+            self._xy = np.vstack([self._xy, [[x, y]]])
+            self._depth = np.append(self._depth, depth_cm / 100.0)
+
+    def estimate(self, x, y):
+        """DepthEstimate no ponto, ou None sem vizinhos suficientes por perto"""
+        with self._lock:
+            xy, depth = self._xy, self._depth
+        if len(depth) < MIN_NEIGHBORS:
+            return None
+        distances = np.hypot(xy[:, 0] - x, xy[:, 1] - y)
+        k = min(NEIGHBORS, len(depth))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        near_xy, near_depth, near_distance = xy[nearest], depth[nearest], distances[nearest]
+
+        # Espaçamento médio entre os vizinhos: escala local da amostragem
+        pairs = np.hypot(near_xy[:, None, 0] - near_xy[None, :, 0], near_xy[:, None, 1] - near_xy[None, :, 1])
+        spacing = pairs.sum() / max(1, k * (k - 1))
+        if spacing > 0 and near_distance.min() > MAX_GAP_FACTOR * spacing:
+            return None
+
+        if near_distance.min() == 0:
+            weights = (near_distance == 0).astype(np.float64)
+        else:
+            weights = 1.0 / near_distance ** 2
+        weights /= weights.sum()
+        expected = float(weights @ near_depth)
+        spread = float(np.sqrt(weights @ (near_depth - expected) ** 2))
+        tolerance = max(MIN_TOLERANCE_M, RELATIVE_TOLERANCE * expected, 2.0 * spread)
+        return DepthEstimate(expected, tolerance, k)
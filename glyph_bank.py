@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Reconhecedor de dígitos treinado com a fonte de cada carta (sem Qt)
+Cada valor confirmado ou corrigido pelo usuário vira exemplos rotulados: os
+glifos da sondagem são alinhados na horizontal, normalizados para uma
+pequena matriz e guardados no banco de glifos da carta (.dro_glyphs.npz ao
+lado do raster). Com exemplos suficientes, o clique é respondido por
+comparação com os modelos (milissegundos); as engines de OCR continuam como
+alternativa quando a semelhança é baixa.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from . import text_regions
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+BANK_VERSION = 1
+BANK_SUFFIX = ".dro_glyphs.npz"
+FALLBACK_DIR = os.path.join(os.path.expanduser("~"), ".depth_reader_ocr", "glyphs")
+
+# Lado (px) da matriz normalizada de cada glifo
+GLYPH_SIZE = 16
+# Exemplos mantidos por dígito (os mais antigos saem primeiro)
+MAX_TEMPLATES_PER_DIGIT = 60
+# Confirmações antes de o reconhecedor responder cliques, exemplos mínimos para
+# um dígito contar como aprendido e dígitos aprendidos para o banco responder
+# (um dígito nunca visto seria lido como o aprendido mais parecido)
+MIN_CONFIRMATIONS = 12
+MIN_TEMPLATES_PER_DIGIT = 3
+MIN_DIGITS_COVERED = 10
+# Semelhança (cosseno) mínima de cada glifo e vantagem mínima sobre o segundo dígito
+MIN_SIMILARITY = 0.80
+MIN_MARGIN = 0.05
+MAX_DIGITS = 3
+
+
+def bank_path_for(raster_path):
+    """Banco ao lado do raster; em pastas somente leitura, no diretório do usuário"""
+    path = raster_path + BANK_SUFFIX
+    if os.access(os.path.dirname(os.path.abspath(raster_path)), os.W_OK):
+        return path
+    digest = hashlib.md5(os.path.abspath(raster_path).encode("utf-8")).hexdigest()
+    return os.path.join(FALLBACK_DIR, digest + ".npz")
+
+
+def _normalize_glyph(binary, box):
+    """Glifo centrado em um quadrado e reduzido para GLYPH_SIZE x GLYPH_SIZE (uint8)"""
+    x, y, w, h = box
+    crop = binary[y:y + h, x:x + w]
+    side = max(w, h)
+    square = np.zeros((side, side), dtype=np.uint8)
+    oy, ox = (side - h) // 2, (side - w) // 2
+    square[oy:oy + h, ox:ox + w] = crop
+    return cv2.resize(square, (GLYPH_SIZE, GLYPH_SIZE), interpolation=cv2.INTER_AREA)
+
+
+def _features(glyphs):
+    """Vetores de média zero e norma unitária (a semelhança vira um produto escalar)"""
+    vectors = glyphs.reshape(len(glyphs), -1).astype(np.float32)
+    vectors -= vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+
+def horizontal_glyphs(gray, flip=False):
+    """
+    Glifos da sondagem sob o centro do recorte, da esquerda para a direita,
+    depois de alinhar a sondagem na horizontal (flip: mais 180°). None se não
+    houver sondagem perto do centro.
+    """
+    found = text_regions.locate_click_glyphs(gray)
+    if found is None:
+        return None
+    _, cluster = found
+    angle = (text_regions.estimate_orientation(cluster) or 0.0) + (180.0 if flip else 0.0)
+    if abs(angle) > 1.0:
+        h, w = gray.shape[:2]
+        matrix = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+        gray = cv2.warpAffine(gray, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
+                              borderValue=int(np.median(gray)))
+        found = text_regions.locate_click_glyphs(gray)
+        if found is None:
+            return None
+        _, cluster = found
+    binary = text_regions.binarize_ink(gray)
+    return [_normalize_glyph(binary, box) for box in sorted(cluster, key=lambda g: g[0])]
+
+
+class GlyphBank:
+    """Exemplos de dígitos de uma carta e classificador por semelhança com os modelos"""
+
+    def __init__(self, raster_path, glyphs=None, labels=None, confirmations=0):
+        self.raster_path = raster_path
+        self.glyphs = np.zeros((0, GLYPH_SIZE, GLYPH_SIZE), dtype=np.uint8) if glyphs is None else glyphs
+        self.labels = np.zeros(0, dtype=np.int8) if labels is None else labels
+        self.confirmations = int(confirmations)
+        # Cliques respondidos pelo reconhecedor e cliques enviados às engines
+        self.hits = 0
+        self.fallbacks = 0
+        self._vectors = None
+
+    @property
+    def ready(self):
+        return self.confirmations >= MIN_CONFIRMATIONS and self.covered() >= MIN_DIGITS_COVERED
+
+    @property
+    def nbytes(self):
+        vectors = self._vectors.nbytes if self._vectors is not None else 0
+        return self.glyphs.nbytes + self.labels.nbytes + vectors
+
+    def counts(self):
+        return np.bincount(self.labels.astype(np.int64), minlength=10)
+
+    def covered(self):
+        """Dígitos com exemplos suficientes para o reconhecedor"""
+        return int(np.count_nonzero(self.counts() >= MIN_TEMPLATES_PER_DIGIT))
+
+    # ---------- Classificação ----------
+    def _classify(self, glyph_images, min_templates=MIN_TEMPLATES_PER_DIGIT):
+        """
+        Para cada glifo: (dígito, semelhança, vantagem sobre o segundo dígito), só
+        entre os dígitos com pelo menos min_templates exemplos (os demais ficam em -inf).
+        """
+        if self._vectors is None:
+            self._vectors = _features(self.glyphs)
+        similarity = _features(np.stack(glyph_images)) @ self._vectors.T
+        per_digit = np.full((len(glyph_images), 10), -np.inf, dtype=np.float32)
+        counts = self.counts()
+        for digit in np.unique(self.labels):
+            if counts[digit] >= min_templates:
+                per_digit[:, digit] = similarity[:, self.labels == digit].max(axis=1)
+        order = np.argsort(per_digit, axis=1)
+        best, second = order[:, -1], order[:, -2]
+        rows = np.arange(len(glyph_images))
+        return [(int(d), float(s), float(s - t))
+                for d, s, t in zip(best, per_digit[rows, best], per_digit[rows, second])]
+
+    def recognize(self, gray):
+        """
+        Lê a sondagem do recorte. Retorna (texto, confiança) ou None quando o
+        banco ainda não está pronto ou algum glifo não é reconhecido com segurança.
+        """
+        if not self.ready or len(self.labels) == 0:
+            return None
+        best = None
+        for flip in (False, True):
+            glyph_images = horizontal_glyphs(gray, flip)
+            if not glyph_images or len(glyph_images) > MAX_DIGITS:
+                continue
+            predictions = self._classify(glyph_images)
+            if all(similarity >= MIN_SIMILARITY and margin >= MIN_MARGIN for _, similarity, margin in predictions):
+                confidence = min(similarity for _, similarity, _ in predictions)
+                if best is None or confidence > best[1]:
+                    best = ("".join(str(digit) for digit, _, _ in predictions), confidence)
+            if len(glyph_images) == 1:
+                break  # um único dígito: a leitura invertida (6/9) não é confiável
+        if best is None or best[1] < MIN_SIMILARITY:
+            return None
+        return best
+
+    # ---------- Treino ----------
+    def harvest(self, gray, text):
+        """
+        Acrescenta os glifos de uma sondagem confirmada (texto = dígitos lidos).
+        Retorna o número de glifos aprendidos (0 se a segmentação não bate com o texto).
+        """
+        if not text.isdigit() or len(text) > MAX_DIGITS:
+            return 0
+        label = [int(c) for c in text]
+        options = []
+        for flip in (False, True):
+            glyph_images = horizontal_glyphs(gray, flip)
+            if glyph_images is not None and len(glyph_images) == len(label):
+                options.append(glyph_images)
+            if len(label) == 1:
+                break
+        if not options:
+            return 0
+        chosen = options[0]
+        if len(options) > 1 and len(self.labels):
+            # Sentido de leitura que melhor concorda com o rótulo segundo os exemplos atuais
+            agreement = [sum(d == l for (d, _, _), l in zip(self._classify(images, min_templates=1), label))
+                         for images in options]
+            chosen = options[int(np.argmax(agreement))]
+
+        self.glyphs = np.concatenate([self.glyphs, np.stack(chosen)])
+        self.labels = np.concatenate([self.labels, np.array(label, dtype=np.int8)])
+        self._trim()
+        self.confirmations += 1
+        self._vectors = None
+        return len(label)
+
+    def _trim(self):
+        keep = np.ones(len(self.labels), dtype=bool)
+        for digit in range(10):
+            positions = np.nonzero(self.labels == digit)[0]
+            if len(positions) > MAX_TEMPLATES_PER_DIGIT:
+                keep[positions[:-MAX_TEMPLATES_PER_DIGIT]] = False
+        self.glyphs, self.labels = self.glyphs[keep], self.labels[keep]
+
+    # ---------- Persistência ----------
+    def save(self, path=None):
+        path = path or bank_path_for(self.raster_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(path, glyphs=self.glyphs, labels=self.labels,
+                            meta=np.array([BANK_VERSION, self.confirmations, GLYPH_SIZE], dtype=np.int64))
+        return path
+
+    @classmethod
+    def load(cls, raster_path):
+        """Banco gravado da carta, ou um banco vazio"""
+        path = bank_path_for(raster_path)
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    version, confirmations, glyph_size = data['meta'].tolist()
+                    if version == BANK_VERSION and glyph_size == GLYPH_SIZE:
+                        return cls(raster_path, data['glyphs'], data['labels'], confirmations)
+            except (OSError, KeyError, ValueError) as e:
+                print(f"⚠️ Banco de glifos inválido ({path}): {e}")
+        return cls(raster_path)
+
+    def diagnostics_line(self):
+        counts = self.counts()
+        learned = "".join(str(d) for d in range(10) if counts[d] >= MIN_TEMPLATES_PER_DIGIT)
+        status = "ativo" if self.ready else \
+            f"aprendendo ({self.confirmations}/{MIN_CONFIRMATIONS} confirmações, {self.covered()}/{MIN_DIGITS_COVERED} dígitos)"
+        return (f"• {os.path.basename(self.raster_path)}: {status}, {len(self.labels)} glifos, " +
+                f"dígitos aprendidos: {learned or '-'} | respondidos: {self.hits}, enviados às engines: {self.fallbacks}")
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Separação de cores das cartas náuticas (sem Qt)
+As sondagens das cartas da Marinha são impressas em preto sobre as tintas
+azul/branca de profundidade, com sobreposições magenta e cinza. A máscara de
+tinta de sondagem é calculada sobre as bandas RGB (croma baixo e valor
+escuro) e só ela segue para o OCR: as bordas das tintas deixam de gerar
+candidatos falsos e um único filtro passa a bastar.
+"""
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Croma máximo (max - min dos canais) da tinta preta; azuis e magentas ficam bem acima
+MAX_INK_CHROMA = 60
+# Valor (canal mais claro) máximo da tinta; o limiar efetivo é o menor entre este e o
+# Otsu dos pixels acromáticos do recorte (separa o preto do cinza e do branco)
+MAX_INK_VALUE = 110
+# Pixels de borda (antisserrilhado) são aceitos ao lado da tinta até este valor
+MAX_EDGE_VALUE = 170
+# Abaixo desta fração de tinta o recorte não tem sondagem preta: usa o cinza comum
+MIN_INK_FRACTION = 0.002
+
+
+def ink_mask(rgb, max_chroma=MAX_INK_CHROMA, max_value=MAX_INK_VALUE):
+    """Máscara booleana da tinta preta de sondagem de um recorte RGB (uint8)"""
+    rgb = rgb[:, :, :3]
+    value = rgb.max(axis=2)
+    chroma = value - rgb.min(axis=2)
+    achromatic = chroma <= max_chroma
+    if cv2 is not None and achromatic.any():
+        # Otsu só sobre os pixels acromáticos: preto da tinta x cinza/branco do fundo
+        otsu, _ = cv2.threshold(value[achromatic].reshape(1, -1), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        max_value = min(max_value, int(otsu))
+    core = achromatic & (value <= max_value)
+    if cv2 is None or not core.any():
+        return core
+    # Bordas antisserrilhadas misturadas com a tinta de fundo: vizinhas da tinta e escuras
+    grown = cv2.dilate(core.view(np.uint8), np.ones((3, 3), np.uint8)).view(bool)
+    return core | (grown & (value <= MAX_EDGE_VALUE))
+
+
+def separate(rgb):
+    """
+    Recorte cinza só com a tinta de sondagem (fundo branco), ou None quando o
+    recorte não é colorido ou não tem tinta preta suficiente.
+    """
+    if rgb.ndim != 3 or rgb.shape[2] < 3:
+        return None
+    mask = ink_mask(rgb)
+    if mask.mean() < MIN_INK_FRACTION:
+        return None
+    # Mantém a intensidade original da tinta (contornos suaves para o OCR)
+    gray = cv2.cvtColor(np.ascontiguousarray(rgb[:, :, :3]), cv2.COLOR_RGB2GRAY)
+    return np.where(mask, gray, np.uint8(255)).astype(np.uint8)
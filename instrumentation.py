@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentação de desempenho do plugin Depth Reader OCR
+Cada clique gera um registro estruturado (ClickTrace) com tempos monotônicos
+por etapa e contagem de candidatos. O TraceRecorder agrega os registros em
+histogramas e, opcionalmente, grava um arquivo JSON lines.
+"""
+
+import json
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+# Limites superiores (ms) das faixas dos histogramas
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+# Amostras mantidas por etapa para os percentis
+MAX_SAMPLES_PER_STAGE = 2000
+
+
+class ClickTrace:
+    """Registro de tempos de um clique (seguro para uso pelas threads dos workers)"""
+
+    def __init__(self, x_m=None, y_m=None, **meta):
+        self.started = datetime.now().isoformat(timespec="milliseconds")
+        self.x_m = x_m
+        self.y_m = y_m
+        self.meta = dict(meta)
+        self.stages = []
+        self.counters = {}
+        self.result = None
+        self.total_ms = None
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, **meta):
+        """Mede a duração de um trecho: with trace.stage("gdal_read"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, (time.perf_counter() - start) * 1000.0, start, **meta)
+
+    def add_stage(self, name, elapsed_ms, start=None, **meta):
+        entry = {
+            "name": name,
+            "offset_ms": round(((start or time.perf_counter()) - self._t0) * 1000.0, 3),
+            "ms": round(elapsed_ms, 3),
+        }
+        if meta:
+            entry["meta"] = meta
+        with self._lock:
+            self.stages.append(entry)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def finish(self, result=None):
+        self.result = result
+        self.total_ms = round((time.perf_counter() - self._t0) * 1000.0, 3)
+        return self
+
+    def stage_totals(self):
+        """Soma dos tempos por nome de etapa"""
+        totals = {}
+        for entry in self.stages:
+            totals[entry["name"]] = totals.get(entry["name"], 0.0) + entry["ms"]
+        return totals
+
+    def to_dict(self):
+        return {
+            "started": self.started,
+            "x_m": self.x_m,
+            "y_m": self.y_m,
+            "meta": self.meta,
+            "result": self.result,
+            "total_ms": self.total_ms,
+            "counters": dict(self.counters),
+            "stage_totals_ms": {k: round(v, 3) for k, v in self.stage_totals().items()},
+            "stages": list(self.stages),
+        }
+
+    def summary(self):
+        """Resumo de uma linha para o QgsMessageLog"""
+        totals = sorted(self.stage_totals().items(), key=lambda item: item[1], reverse=True)
+        top = ", ".join(f"{name}={ms:.0f}ms" for name, ms in totals[:5])
+        counters = ", ".join(f"{k}={v}" for k, v in sorted(self.counters.items()))
+        return f"⏱️ Clique ({self.x_m}, {self.y_m}): {self.total_ms or 0:.0f}ms total | {top} | {counters}"
+
+
+class _NullTrace:
+    """Trace que não registra nada (evita condicionais no caminho crítico)"""
+
+    @contextmanager
+    def stage(self, name, **meta):
+        yield
+
+    def add_stage(self, name, elapsed_ms, start=None, **meta):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+class TraceRecorder:
+    """Agrega os traces da sessão em histogramas e grava JSON lines opcionalmente"""
+
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.clicks = 0
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, trace):
+        record = trace.to_dict()
+        with self._lock:
+            self.clicks += 1
+            samples = dict(record["stage_totals_ms"])
+            if record["total_ms"] is not None:
+                samples["total"] = record["total_ms"]
+            for name, ms in samples.items():
+                self._samples.setdefault(name, deque(maxlen=MAX_SAMPLES_PER_STAGE)).append(ms)
+            if self.trace_path:
+                try:
+                    os.makedirs(os.path.dirname(self.trace_path) or ".", exist_ok=True)
+                    with open(self.trace_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    print(f"❌ Erro ao gravar trace: {e}")
+        return record
+
+    def histograms(self):
+        """Percentis e contagem por faixa de cada etapa"""
+        with self._lock:
+            samples = {name: np.array(values) for name, values in self._samples.items()}
+        result = {}
+        for name, values in samples.items():
+            edges = list(HISTOGRAM_BUCKETS_MS)
+            counts = np.histogram(values, bins=[0] + edges + [np.inf])[0]
+            labels = [f"<{edge}ms" for edge in edges] + [f">={edges[-1]}ms"]
+            result[name] = {
+                "count": int(values.size),
+                "p50": float(np.percentile(values, 50)),
+                "p95": float(np.percentile(values, 95)),
+                "max": float(values.max()),
+                "buckets": dict(zip(labels, (int(c) for c in counts))),
+            }
+        return result
+
+    def diagnostics_text(self):
+        histograms = self.histograms()
+        if not histograms:
+            return "⏳ Nenhum clique registrado nesta sessão"
+        lines = [f"🖱️ Cliques registrados: {self.clicks}"]
+        ordered = sorted(histograms.items(), key=lambda item: item[1]["p50"] * item[1]["count"], reverse=True)
+        for name, h in ordered:
+            lines.append(f"• {name}: n={h['count']} p50={h['p50']:.1f}ms p95={h['p95']:.1f}ms max={h['max']:.1f}ms")
+        if self.trace_path:
+            lines.append(f"💾 Trace: {self.trace_path}")
+        return "\n".join(lines)
+
+
+class EngineStats:
+    """
+    Taxas de acerto por engine na cascata: quantas variantes cada engine
+    analisou ou pulou, em quantas encontrou um candidato, quanto concordou com a
+    outra engine e quantas vezes produziu o valor escolhido. Servem para ajustar
+    a ordem e os limiares da cascata com dados reais.
+    """
+
+    FIELDS = ("runs", "hits", "skipped", "compared", "agreed", "wins")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.clips = 0
+            self._counts = {}
+
+    def _entry(self, engine):
+        return self._counts.setdefault(engine, dict.fromkeys(self.FIELDS, 0))
+
+    def record_run(self, engine, hit):
+        with self._lock:
+            entry = self._entry(engine)
+            entry["runs"] += 1
+            entry["hits"] += int(bool(hit))
+
+    def record_skip(self, engine):
+        with self._lock:
+            self._entry(engine)["skipped"] += 1
+
+    def record_agreement(self, engines, agreed):
+        """Variante em que as duas engines leram algo: concordaram no texto principal?"""
+        with self._lock:
+            for engine in engines:
+                entry = self._entry(engine)
+                entry["compared"] += 1
+                entry["agreed"] += int(agreed)
+
+    def record_clip(self, winners):
+        """Recorte concluído: engines que produziram o valor escolhido"""
+        with self._lock:
+            self.clips += 1
+            for engine in winners:
+                self._entry(engine)["wins"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"clips": self.clips, "engines": {name: dict(entry) for name, entry in self._counts.items()}}
+
+    def diagnostics_text(self):
+        snapshot = self.snapshot()
+        if not snapshot["engines"]:
+            return "⏳ Nenhuma variante analisada nesta sessão"
+        lines = [f"🖼️ Recortes analisados: {snapshot['clips']}"]
+        for name, e in snapshot["engines"].items():
+            hit_rate = e["hits"] / e["runs"] * 100 if e["runs"] else 0.0
+            win_rate = e["wins"] / snapshot["clips"] * 100 if snapshot["clips"] else 0.0
+            agreement = f"{e['agreed'] / e['compared'] * 100:.0f}%" if e["compared"] else "-"
+            lines.append(f"• {name}: executada {e['runs']}x, pulada {e['skipped']}x | acerto {hit_rate:.0f}% | " +
+                         f"valor escolhido {win_rate:.0f}% | concordância {agreement}")
+        return "\n".join(lines)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Orçamento de memória do plugin Depth Reader OCR (sem Qt)
+Par do ResourceGovernor para a memória: um teto único para os caches que
+crescem durante a sessão (índices de texto e bancos de glifos por carta,
+mantidos com descarte do menos usado, e o cache de blocos do GDAL) e a
+leitura da memória residente por componente para o diagnóstico.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+MB = 1024 * 1024
+# Teto padrão dos caches e fração dele reservada ao cache de blocos do GDAL
+DEFAULT_CACHE_LIMIT_MB = 512
+GDAL_CACHE_SHARE = 0.5
+# Minutos sem análise até os modelos das engines serem liberados (0 = nunca)
+DEFAULT_IDLE_UNLOAD_MIN = 10
+
+
+def rss_mb():
+    """Memória residente atual do processo em MB (None se não for possível medir)"""
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss / MB
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # Sem /proc (macOS): só o pico está disponível
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / MB if sys.platform == 'darwin' else peak / 1024.0
+    except ImportError:
+        return None
+
+
+class BoundedCache(OrderedDict):
+    """
+    Dicionário com descarte do item menos usado quando o total dos caches do
+    orçamento passa do teto. O último item inserido nunca é descartado.
+    Consultado também pelo pré-carregamento sob o cursor (outra thread): toda
+    leitura e alteração da ordem passa pelo lock do orçamento.
+    """
+
+    def __init__(self, budget, name, size_of):
+        super().__init__()
+        self.budget = budget
+        self.name = name
+        self.size_of = size_of
+        self.evictions = 0
+        budget.register(self)
+
+    def __getitem__(self, key):
+        with self.budget._lock:
+            value = super().__getitem__(key)
+            self.move_to_end(key)
+            return value
+
+    def get(self, key, default=None):
+        with self.budget._lock:
+            return self[key] if key in self else default
+
+    def __setitem__(self, key, value):
+        with self.budget._lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            self.budget.enforce()
+
+    def __delitem__(self, key):
+        with self.budget._lock:
+            super().__delitem__(key)
+
+    def clear(self):
+        with self.budget._lock:
+            super().clear()
+
+    def snapshot(self):
+        """Cópia dos valores para iterar sem segurar o lock"""
+        with self.budget._lock:
+            return list(super().values())
+
+    def nbytes(self):
+        return sum(self.size_of(value) for value in self.snapshot())
+
+    def evict_oldest(self):
+        """Descarta o item menos usado; False se só resta o mais recente."""
+        with self.budget._lock:
+            if len(self) <= 1:
+                return False
+            key, _ = self.popitem(last=False)
+        self.evictions += 1
+        print(f"🧹 Cache '{self.name}': {os.path.basename(str(key))} descartado (teto de memória)")
+        return True
+
+
+class MemoryBudget:
+    """Teto de memória dos caches da sessão e leitura da memória por componente"""
+
+    def __init__(self, cache_limit_mb=DEFAULT_CACHE_LIMIT_MB):
+        self.caches = []
+        self._lock = threading.RLock()
+        self.configure(cache_limit_mb)
+
+    def configure(self, cache_limit_mb):
+        """Aplica o teto: metade para o cache de blocos do GDAL, o resto para os caches do plugin"""
+        self.cache_limit_mb = max(16, int(cache_limit_mb or DEFAULT_CACHE_LIMIT_MB))
+        self.gdal_limit_mb = int(self.cache_limit_mb * GDAL_CACHE_SHARE)
+        self.cache_limit = (self.cache_limit_mb - self.gdal_limit_mb) * MB
+        if gdal is not None:
+            gdal.SetCacheMax(self.gdal_limit_mb * MB)
+        self.enforce()
+
+    def register(self, cache):
+        self.caches.append(cache)
+
+    def cache_bytes(self):
+        return sum(cache.nbytes() for cache in self.caches)
+
+    def enforce(self):
+        """Descarta os itens menos usados (do maior cache primeiro) até caber no teto"""
+        with self._lock:
+            while self.cache_bytes() > self.cache_limit:
+                if not any(cache.evict_oldest() for cache in sorted(self.caches, key=lambda c: -c.nbytes())):
+                    break
+
+    def clear(self):
+        for cache in self.caches:
+            cache.clear()
+
+    def components(self, extra=None):
+        """MB por componente: caches do orçamento, cache do GDAL e os informados em extra"""
+        sizes = {cache.name: cache.nbytes() / MB for cache in self.caches}
+        if gdal is not None:
+            sizes["Cache de blocos GDAL"] = gdal.GetCacheUsed() / MB
+        for name, size_mb in (extra or {}).items():
+            if size_mb is not None:
+                sizes[name] = size_mb
+        return sizes
+
+    def diagnostics_text(self, extra=None):
+        """Resumo legível para o diálogo de diagnóstico"""
+        rss = rss_mb()
+        lines = [f"🧠 Memória residente do QGIS: {rss:.0f} MB" if rss is not None else
+                 "🧠 Memória residente: indisponível (instale psutil)"]
+        for name, size_mb in self.components(extra).items():
+            lines.append(f"   {name}: {size_mb:.1f} MB")
+        evictions = sum(cache.evictions for cache in self.caches)
+        lines.append(f"📏 Teto dos caches: {self.cache_limit_mb} MB (GDAL: {self.gdal_limit_mb} MB), " +
+                     f"{evictions} descarte(s) na sessão")
+        return "\n".join(lines)
@@ -0,0 +1,838 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline OCR do plugin Depth Reader OCR (sem dependência de Qt/QGIS)
+Reúne carregamento das engines, pré-processamento, grade de rotações/filtros
+e pontuação dos candidatos. É usado pelo OCRWorkerThread e por ferramentas
+headless (benchmark, processamento em lote).
+"""
+
+import gc
+import os
+import re
+import logging
+import warnings
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import onnx_backend
+from . import text_regions
+from . import preprocess_graph
+from . import ink_separation
+from . import depth_prior
+from . import tesseract_montage
+from .candidate_table import CandidateTable
+from . import ocr_server
+from . import memory_budget
+from .resource_governor import ResourceGovernor
+from .instrumentation import NULL_TRACE, EngineStats
+
+# ============== SISTEMA DE DEPENDÊNCIAS ==============
+# Imports opcionais - só importa se estiver disponível
+OPENCV_AVAILABLE = False
+TESSERACT_AVAILABLE = False
+EASYOCR_AVAILABLE = False
+PIL_AVAILABLE = False
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+    print("✅ OpenCV disponível")
+except ImportError:
+    cv2 = None
+    print("❌ OpenCV não disponível")
+
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+    print("✅ PyTesseract disponível")
+except ImportError:
+    pytesseract = None
+    print("❌ PyTesseract não disponível")
+
+# EasyOCR é verificado sem importar: o import carrega o torch, desnecessário com o backend ONNX
+easyocr = None
+if importlib.util.find_spec("easyocr") is not None:
+    EASYOCR_AVAILABLE = True
+    print("✅ EasyOCR disponível")
+else:
+    print("❌ EasyOCR não disponível")
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+    print("✅ PIL disponível")
+except ImportError:
+    Image = None
+    print("❌ PIL não disponível")
+# ============== FIM DO SISTEMA DE DEPENDÊNCIAS ==============
+
+# Configuração do Tesseract para Windows (só se disponível)
+if TESSERACT_AVAILABLE and pytesseract:
+    try:
+        config_file = os.path.join(os.path.expanduser('~'), 'tesseract_config.txt')
+        if os.path.exists(config_file):
+            with open(config_file, 'r') as f:
+                pytesseract.pytesseract.tesseract_cmd = f.read().strip()
+        else:
+            # Tenta caminhos comuns no Windows
+            possible_paths = [
+                r"C:\Program Files\Tesseract-OCR\tesseract.exe",
+                r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
+            ]
+            for path in possible_paths:
+                if os.path.exists(path):
+                    pytesseract.pytesseract.tesseract_cmd = path
+                    break
+    except Exception as e:
+        print(f"⚠️ Erro na configuração do Tesseract: {e}")
+        pytesseract.pytesseract.tesseract_cmd = None
+
+
+DEFAULT_ROTATIONS = [-90, -45, 0, 45, 90]
+
+
+def _no_progress(message, percent):
+    pass
+
+
+def _never_cancelled():
+    return False
+
+
+class OCRPipeline:
+    """Pipeline OCR completo para um recorte de carta náutica"""
+
+    OCR_FAILED = -9999
+    # SUGESTÃO: Constantes para o algoritmo de scoring.
+    # Torna o código mais legível e fácil de ajustar.
+    COMMON_DEPTH_BONUS = 1.5
+    UNCOMMON_DEPTH_PENALTY = 0.8
+    TEXT_LENGTH_BONUS_FACTOR = 0.1
+    # Recorte adaptativo: janelas disponíveis, janela inicial e score mínimo
+    # abaixo do qual o recorte é ampliado e a análise repetida
+    CLIP_SIZES = (16, 32, 48, 64, 80, 96)
+    ADAPTIVE_START_SIZE = 32
+    LOW_CONFIDENCE_SCORE = 1.0
+    # Com a orientação estimada pelo índice de texto, só os ângulos até esta distância
+    # (módulo 180°, mantendo a leitura de cabeça para baixo) são analisados
+    ORIENTATION_TOLERANCE = 30
+    # Cascata de engines: a segunda engine só analisa a variante se a melhor leitura da
+    # primeira ficar abaixo desta confiança ou se houver empate entre textos diferentes
+    # (confianças a menos de CASCADE_TIE_MARGIN uma da outra)
+    ENGINES = ("easyocr", "tesseract")
+    CASCADE_CONFIDENCE = 0.85
+    CASCADE_TIE_MARGIN = 0.10
+    # Estimativa pela vizinhança (sondagens já capturadas): bônus dos valores coerentes,
+    # fator mínimo dos incoerentes e confiança OCR que encerra a grade ao ler um valor coerente
+    PRIOR_BONUS = 1.3
+    PRIOR_MIN_FACTOR = 0.4
+    PRIOR_STOP_CONFIDENCE = 0.85
+    # Calibração por engine (multiplica a confiança informada pela engine)
+    EASYOCR_CALIBRATION = 1.0
+    TESSERACT_CALIBRATION = 1.0
+    # Consenso: bônus por variante (ângulo/filtro) a mais que leu o mesmo valor, até um
+    # teto de votos; com CONSENSUS_STOP_VOTES variantes unânimes a grade é encerrada
+    CONSENSUS_WEIGHT = 0.1
+    CONSENSUS_MAX_VOTES = 5
+    CONSENSUS_STOP_VOTES = 4
+
+    def __init__(self, rotations=None, preprocess_methods=None, ocr_backend="torch", concurrency_config=None,
+                 use_click_roi=True, adaptive_clip=True, debug_dir=None, ocr_server=None, cascade_config=None,
+                 color_separation=True, tesseract_montage=True):
+        self.ocr_backend = ocr_backend
+        # Cliente do servidor OCR local (opcional): engines já carregadas em outro processo
+        self.ocr_server = ocr_server
+        self.use_click_roi = use_click_roi
+        self.adaptive_clip = adaptive_clip
+        # Separação de cores: só a tinta preta das sondagens segue para o OCR
+        self.color_separation = color_separation
+        # Montagem: todas as variantes do clique em uma única chamada do Tesseract
+        self.tesseract_montage = tesseract_montage
+        self.debug_dir = debug_dir
+        # Configuração única de concorrência aplicada a todas as engines
+        self.governor = ResourceGovernor(**(concurrency_config or {}))
+        self.easyocr_reader = None
+        # Memória (MB) que o carregamento local do EasyOCR acrescentou ao processo
+        self.engine_memory_mb = None
+        # Liberação por ociosidade: o próximo process() recarrega os modelos
+        self.engines_unloaded = False
+        self._engine_lock = threading.Lock()
+        self._busy = 0
+        self.tesseract_available = False
+        self.tesseract_local = False
+        self.set_cascade(cascade_config)
+        self.engine_stats = EngineStats()
+
+        self.rotations = rotations if rotations is not None else list(DEFAULT_ROTATIONS)
+        self.preprocess_methods = preprocess_methods if preprocess_methods is not None else \
+            self.build_preprocess_methods({"clahe": True, "gaussian": True})
+
+        logging.getLogger('easyocr').setLevel(logging.ERROR)
+        self.common_depths = set(range(1, 100 + 1))
+        if 11 in self.common_depths:
+            self.common_depths.remove(11)
+
+        self._check_tesseract()
+
+    @classmethod
+    def from_config(cls, config, debug_dir=None):
+        """
+        Cria o pipeline a partir de um dicionário com as chaves da aba Avançado
+        (usado pelas ferramentas headless: benchmark, workers de varredura).
+        """
+        pipeline = cls(
+            rotations=config.get("rotations"),
+            ocr_backend=config.get("ocr_backend", "torch"),
+            concurrency_config=config.get("concurrency"),
+            use_click_roi=config.get("use_click_roi", True),
+            adaptive_clip=config.get("adaptive_clip", True),
+            debug_dir=debug_dir,
+            ocr_server=ocr_server.OCRServerClient() if config.get("ocr_server") else None,
+            cascade_config=config.get("cascade"),
+            color_separation=config.get("color_separation", True),
+            tesseract_montage=config.get("tesseract_montage", True),
+        )
+        if "filters" in config:
+            pipeline.preprocess_methods = pipeline.build_preprocess_methods(
+                config["filters"], config.get("filter_before_rotate", False))
+        # Permite variar as constantes de scoring (COMMON_DEPTH_BONUS etc.) por configuração
+        for key, value in config.get("scoring", {}).items():
+            if not hasattr(cls, key):
+                raise ValueError(f"Constante de scoring desconhecida: {key}")
+            setattr(pipeline, key, value)
+        return pipeline
+
+    def config_signature(self):
+        """Parâmetros que influenciam o resultado (chave do armazenamento de resultados)"""
+        remote = isinstance(self.easyocr_reader, ocr_server.RemoteEasyOCRReader)
+        return {
+            'rotations': list(self.rotations),
+            'filters': self.preprocess_methods.names(),
+            'filter_before_rotate': self.preprocess_methods.filter_before_rotate,
+            # Com o servidor, vale o backend em que os modelos foram carregados lá
+            'ocr_backend': self.easyocr_reader.backend if remote else self.ocr_backend,
+            'use_click_roi': self.use_click_roi,
+            'adaptive_clip': self.adaptive_clip,
+            'color_separation': self.color_separation,
+            'tesseract_montage': self.tesseract_montage,
+            'engines': {'easyocr': EASYOCR_AVAILABLE or remote, 'tesseract': self.tesseract_available},
+            'cascade': self.cascade_config(),
+        }
+
+    def to_config(self):
+        """Configuração no formato de from_config (gravada no corpus de cliques)"""
+        return {
+            'rotations': list(self.rotations),
+            'filters': preprocess_graph.filters_config(self.preprocess_methods),
+            'filter_before_rotate': self.preprocess_methods.filter_before_rotate,
+            'ocr_backend': self.ocr_backend,
+            'use_click_roi': self.use_click_roi,
+            'adaptive_clip': self.adaptive_clip,
+            'color_separation': self.color_separation,
+            'tesseract_montage': self.tesseract_montage,
+            'cascade': self.cascade_config(),
+        }
+
+    # ---------- Cascata de engines ----------
+    def set_cascade(self, cascade_config=None):
+        """
+        Configura a cascata: {"enabled", "order", "confidence", "tie_margin"}.
+        Com enabled=False todas as engines analisam todas as variantes.
+        """
+        cascade_config = cascade_config or {}
+        order = list(cascade_config.get("order", self.ENGINES))
+        unknown = [engine for engine in order if engine not in self.ENGINES]
+        if unknown:
+            raise ValueError(f"Engine desconhecida na cascata: {', '.join(unknown)}")
+        self.engine_order = order + [engine for engine in self.ENGINES if engine not in order]
+        self.cascade_enabled = cascade_config.get("enabled", True)
+        self.cascade_confidence = cascade_config.get("confidence", self.CASCADE_CONFIDENCE)
+        self.cascade_tie_margin = cascade_config.get("tie_margin", self.CASCADE_TIE_MARGIN)
+
+    def cascade_config(self):
+        if not self.cascade_enabled:
+            return {'enabled': False}
+        return {'enabled': True, 'order': list(self.engine_order), 'confidence': self.cascade_confidence,
+                'tie_margin': self.cascade_tie_margin}
+
+    def _engine_ready(self, engine):
+        if engine == "easyocr":
+            return self.easyocr_reader is not None
+        return self.tesseract_available
+
+    def _needs_second_opinion(self, engine_results):
+        """A leitura da engine anterior é incerta (vazia, pouco confiante ou empatada)?"""
+        if not engine_results:
+            return True
+        ranked = sorted(engine_results, key=lambda r: r[2], reverse=True)
+        top_text, _, top_confidence = ranked[0]
+        if top_confidence < self.cascade_confidence:
+            return True
+        return any(text != top_text and top_confidence - confidence <= self.cascade_tie_margin
+                   for text, _, confidence in ranked[1:])
+
+    def _record_winners(self, all_results, result):
+        """Atualiza as taxas por engine com as engines que leram o valor escolhido"""
+        winners = set()
+        if result != self.OCR_FAILED:
+            winners = self._as_table(all_results).methods_for(result // 100)
+        self.engine_stats.record_clip(winners)
+
+    # ---------- Engines ----------
+    def _get_easyocr_reader(self):
+        with self._engine_lock:
+            self.engines_unloaded = False
+            if self.easyocr_reader is None and self.ocr_server is not None:
+                info = self.ocr_server.available()
+                if info and info.get('easyocr'):
+                    # Modelos já carregados no servidor: o torch nem é importado neste processo
+                    self.easyocr_reader = ocr_server.RemoteEasyOCRReader(
+                        self.ocr_server, self._load_local_reader, backend=info.get('backend'))
+                    return self.easyocr_reader
+            if self.easyocr_reader is None:
+                before = memory_budget.rss_mb()
+                self.easyocr_reader = self._load_local_reader()
+                after = memory_budget.rss_mb()
+                if self.easyocr_reader is not None and before is not None and after is not None:
+                    self.engine_memory_mb = max(0.0, after - before)
+            return self.easyocr_reader
+
+    def unload_engines(self):
+        """
+        Libera o leitor do EasyOCR (modelos torch/ONNX) se nenhuma análise estiver
+        em andamento. O próximo process() recarrega sob demanda. Retorna True se liberou.
+        """
+        with self._engine_lock:
+            if self._busy or self.easyocr_reader is None:
+                return False
+            self.easyocr_reader = None
+            self.engine_memory_mb = None
+            self.engines_unloaded = True
+        gc.collect()
+        return True
+
+    def adopt_engines(self, other):
+        """Reaproveita o leitor local de outro pipeline com o mesmo backend (troca de configuração)"""
+        reader = other.easyocr_reader
+        if (reader is None or self.easyocr_reader is not None or other.ocr_backend != self.ocr_backend or
+                isinstance(reader, ocr_server.RemoteEasyOCRReader)):
+            return False
+        self.easyocr_reader, self.engine_memory_mb = reader, other.engine_memory_mb
+        other.easyocr_reader, other.engine_memory_mb = None, None
+        return True
+
+    def _load_local_reader(self):
+        """Carrega o EasyOCR neste processo (PyTorch ou ONNX Runtime); None se indisponível."""
+        if self.ocr_backend in ("onnx", "onnx_int8"):
+            return self._load_onnx_reader()
+        if not EASYOCR_AVAILABLE:
+            return None
+        global easyocr
+        try:
+            old_level = logging.getLogger().level
+            logging.getLogger().setLevel(logging.ERROR)
+            warnings.filterwarnings("ignore")
+            try:
+                if easyocr is None:
+                    import easyocr
+                self.governor.apply_torch()
+                return easyocr.Reader(['en'], gpu=False, verbose=False)
+            finally:
+                logging.getLogger().setLevel(old_level)
+                warnings.resetwarnings()
+        except Exception as e:
+            print(f"Erro ao inicializar EasyOCR: {e}")
+            return None
+
+    def _load_onnx_reader(self):
+        """Carrega os modelos do EasyOCR via ONNX Runtime, exportando-os na primeira vez."""
+        if not onnx_backend.ONNXRUNTIME_AVAILABLE:
+            print("❌ onnxruntime não disponível. Usando backend PyTorch.")
+            self.ocr_backend = "torch"
+            return self._load_local_reader()
+
+        quantize = self.ocr_backend == "onnx_int8"
+        try:
+            old_level = logging.getLogger().level
+            logging.getLogger().setLevel(logging.ERROR)
+            warnings.filterwarnings("ignore")
+            try:
+                models_ready = onnx_backend.ensure_models(onnx_backend.DEFAULT_CACHE_DIR, quantize=quantize)
+            finally:
+                logging.getLogger().setLevel(old_level)
+                warnings.resetwarnings()
+            if not models_ready:
+                reason = f"modelos ONNX indisponíveis em {onnx_backend.DEFAULT_CACHE_DIR} (exportação ou quantização falhou)"
+            else:
+                num_threads = self.governor.onnx_threads()
+                reader = onnx_backend.OnnxEasyOCRReader(
+                    onnx_backend.DEFAULT_CACHE_DIR, quantize=quantize, num_threads=num_threads)
+                print(f"✅ EasyOCR carregado via ONNX Runtime ({'int8' if quantize else 'fp32'}, {num_threads} threads)")
+                return reader
+        except Exception as e:
+            reason = f"erro ao inicializar EasyOCR via ONNX: {e}"
+        # Mesmo tratamento da falta do onnxruntime: segue com o EasyOCR em PyTorch
+        print(f"❌ {reason}. Usando backend PyTorch.")
+        self.ocr_backend = "torch"
+        return self._load_local_reader()
+
+    def _check_tesseract(self):
+        if not hasattr(self, '_tesseract_checked'):
+            self._tesseract_checked = True
+            self.governor.apply_tesseract_env()
+            try:
+                if TESSERACT_AVAILABLE and pytesseract and pytesseract.pytesseract.tesseract_cmd:
+                    pytesseract.get_tesseract_version()
+                    self.tesseract_local = True
+                    print("✅ Tesseract disponível e configurado.")
+            except Exception as e:
+                print(f"❌ Tesseract não disponível ou erro: {e}")
+            info = self.ocr_server.available() if self.ocr_server is not None else None
+            self.tesseract_available = self.tesseract_local or bool(info and info.get('tesseract'))
+        return self.tesseract_available
+
+    # ---------- Pré-processamento ----------
+    def build_preprocess_methods(self, filters_config, filter_before_rotate=False):
+        """Constrói o grafo de pré-processamento a partir da seleção de filtros."""
+        return preprocess_graph.build_graph(filters_config, filter_before_rotate)
+
+    def _to_gray(self, img):
+        return self._separate_gray(img)[0]
+
+    def _separate_gray(self, img):
+        """
+        Cinza do recorte e se a separação de cores foi aplicada. O GDAL entrega as
+        bandas em RGB; com a separação ativa, só a tinta de sondagem é mantida.
+        """
+        if len(img.shape) != 3:
+            return img, False
+        if self.color_separation:
+            separated = ink_separation.separate(img)
+            if separated is not None:
+                return separated, True
+        return cv2.cvtColor(img[:, :, :3], cv2.COLOR_RGB2GRAY), False
+
+    # ---------- OCR ----------
+    def _perform_ocr_easyocr(self, img):
+        results = []
+        if self.easyocr_reader is not None:
+            try:
+                ocr_results = self.easyocr_reader.readtext(img, detail=True, allowlist='0123456789', width_ths=0.001, height_ths=0.001, paragraph=False, min_size=5)
+                for (bbox, text, confidence) in ocr_results:
+                    cleaned_text = re.sub(r'[^\d]', '', str(text))
+                    if cleaned_text and confidence > 0.5:
+                        results.append((cleaned_text, "easyocr", confidence))
+            except Exception as e:
+                print(f"❌ Erro EasyOCR: {e}")
+        return results
+
+    def _tesseract_data_local(self, img, tess_config):
+        if not (self.tesseract_local and PIL_AVAILABLE):
+            raise RuntimeError("Tesseract não disponível neste processo")
+        return pytesseract.image_to_data(Image.fromarray(img), output_type=pytesseract.Output.DICT, config=tess_config)
+
+    def _tesseract_data(self, img):
+        tess_config = r'--psm 6 -c tessedit_char_whitelist=0123456789'
+        data = self.ocr_server.tesseract_data(img, tess_config) if self.ocr_server is not None else None
+        if data is None:
+            data = self._tesseract_data_local(img, tess_config)
+        return data
+
+    def _tesseract_results(self, words):
+        results = []
+        for text, conf in words:
+            text = text.strip()
+            conf = int(float(conf))
+            cleaned_text = re.sub(r'[^\d]', '', str(text))
+            if cleaned_text and conf > 50:
+                results.append((cleaned_text, "tesseract", conf / 100.0))
+        return results
+
+    def _perform_ocr_tesseract(self, img):
+        results = []
+        if self.tesseract_available:
+            try:
+                data = self._tesseract_data(img)
+                results = self._tesseract_results(zip(data['text'], data['conf']))
+            except Exception as e:
+                print(f"❌ Erro Tesseract: {e}")
+        return results
+
+    def _perform_ocr_tesseract_montage(self, images):
+        """
+        Lê várias variantes em uma única chamada do Tesseract. Retorna uma lista de
+        resultados por imagem, ou None se a montagem não puder ser usada (o chamador
+        lê as variantes uma a uma).
+        """
+        try:
+            montage, bands = tesseract_montage.build(images)
+            data = self._tesseract_data(montage)
+            if 'top' not in data:
+                return None  # servidor antigo: sem as caixas não há como separar as variantes
+            return [self._tesseract_results(words) for words in tesseract_montage.split(data, bands)]
+        except Exception as e:
+            print(f"❌ Erro Tesseract (montagem): {e}")
+            return None
+
+    # ---------- Recorte adaptativo ----------
+    def select_adaptive_clip(self, read_clip, max_size):
+        """
+        Estratégia coarse-to-fine: começa com a menor janela e só cresce enquanto
+        a sondagem sob o cursor toca a borda do recorte (ou não é encontrada).
+        read_clip(size) retorna o recorte centrado no clique ou None se não couber.
+        Perto da borda do raster usa o maior recorte que couber; (None, None, None) se nenhum couber.
+        """
+        start = min(self.ADAPTIVE_START_SIZE, max_size)
+        sizes = sorted({s for s in self.CLIP_SIZES if start <= s <= max_size} | {max_size})
+        img_data_raw, region, size = None, None, None
+        for candidate_size in sizes:
+            clip = read_clip(candidate_size)
+            if clip is None:
+                break
+            img_data_raw, size = clip, candidate_size
+            region = text_regions.locate_click_region(self._to_gray(clip))
+            if region is not None and not region['touches_border']:
+                break
+        if img_data_raw is None:
+            # Nem a janela inicial coube (borda do raster): tenta as menores, da maior para a menor
+            for candidate_size in sorted((s for s in self.CLIP_SIZES if s < start), reverse=True):
+                clip = read_clip(candidate_size)
+                if clip is not None:
+                    img_data_raw, size = clip, candidate_size
+                    region = text_regions.locate_click_region(self._to_gray(clip))
+                    break
+        if img_data_raw is None:
+            return None, None, None
+        print(f"📐 Recorte adaptativo: {size}px" + (f" (altura do glifo: {region['glyph_height']:.0f}px)" if region else ""))
+        return img_data_raw, region, size
+
+    def make_clip_loader(self, read_clip, current_size, max_size):
+        """Retorna uma função que lê o próximo recorte maior (usada quando a confiança é baixa)."""
+        sizes = [s for s in self.CLIP_SIZES if current_size < s <= max_size]
+
+        def load_next():
+            while sizes:
+                size = sizes.pop(0)
+                clip = read_clip(size)
+                if clip is not None:
+                    print(f"📐 Confiança baixa: ampliando recorte para {size}px")
+                    return clip
+            return None
+        return load_next
+
+    # ---------- Grade de rotações/filtros ----------
+    def _run_variant(self, variant, prepared, ctx):
+        """Obtém a imagem filtrada do ângulo no grafo de pré-processamento e executa as engines de OCR."""
+        angle, node = variant
+        pp_name = node.name
+        progress, is_cancelled, trace = ctx['progress'], ctx['is_cancelled'], ctx['trace']
+        results = []
+        if is_cancelled() or ctx['stopped']:
+            return results
+
+        with ctx['lock']:
+            ctx['current'] += 1
+            progress_percent = 20 + int((ctx['current'] / ctx['total']) * 60)
+
+        if angle == 0:
+            angle_msg = "↗️ Analisando orientação normal"
+        elif angle > 0:
+            angle_msg = f"🔄 Rotacionando +{angle}° (horário)"
+        else:
+            angle_msg = f"🔄 Rotacionando {angle}° (anti-horário)"
+
+        filter_name = pp_name.replace("adaptive_thresh_", "").replace("_", " ")
+        progress(f"{angle_msg}\n🎛️ Filtro: {filter_name}", progress_percent)
+
+        with trace.stage(f"preprocess:{pp_name}", angle=angle):
+            processed_img = self.preprocess_methods.render(prepared, angle, node)
+
+        if (angle, pp_name) == ctx['debug_variant']:
+            with trace.stage("debug_save"):
+                self._save_debug_data(processed_img, ctx['x_m'], ctx['y_m'], f"processed_{pp_name}_{angle}")
+
+        if is_cancelled():
+            return results
+
+        engine_labels = {"easyocr": "🤖 EasyOCR", "tesseract": "🔤 Tesseract"}
+        engine_calls = {"easyocr": self._perform_ocr_easyocr, "tesseract": self._perform_ocr_tesseract}
+        previous = None
+        for engine in self.engine_order:
+            if not self._engine_ready(engine):
+                continue
+            if is_cancelled():
+                return results
+            # Cascata: a engine seguinte só roda se a leitura anterior for incerta
+            if previous is not None and self.cascade_enabled and not self._needs_second_opinion(previous[1]):
+                self.engine_stats.record_skip(engine)
+                trace.count(f"cascade_skip:{engine}")
+                continue
+
+            if engine == "tesseract" and ctx['montage'] is not None:
+                # Montagem: a leitura fica para a chamada única do Tesseract ao fim da grade
+                with ctx['lock']:
+                    ctx['montage'].append((ctx['order'][(angle, pp_name)], angle, pp_name,
+                                           processed_img.copy(), previous))
+                continue
+
+            progress(f"{engine_labels[engine]} analisando {angle}°...\n🎛️ Filtro: {filter_name}", progress_percent)
+            with trace.stage(f"ocr:{engine}", angle=angle, filter=pp_name):
+                engine_results = engine_calls[engine](processed_img)
+            results.extend(self._collect_engine_results(engine, engine_results, previous, angle, pp_name, trace))
+            previous = (engine, engine_results)
+
+        if self._consistent_with_prior(results, ctx['prior']):
+            # Leitura confiante e coerente com a vizinhança: as variantes restantes são dispensadas
+            with ctx['lock']:
+                if not ctx['stopped']:
+                    ctx['stopped'] = True
+                    trace.count("prior_stop")
+                    print(f"🧭 Leitura coerente com a vizinhança em {angle}° ({pp_name}): encerrando a grade")
+        return results
+
+    def _collect_engine_results(self, engine, engine_results, previous, angle, pp_name, trace):
+        """Registra as estatísticas da engine e converte suas leituras em candidatos da grade"""
+        trace.count(f"candidates:{engine}", len(engine_results))
+        self.engine_stats.record_run(engine, engine_results)
+        if previous is not None and previous[1] and engine_results:
+            top_previous = max(previous[1], key=lambda r: r[2])[0]
+            top_current = max(engine_results, key=lambda r: r[2])[0]
+            self.engine_stats.record_agreement((previous[0], engine), top_previous == top_current)
+        candidates = []
+        for text, method, confidence in engine_results:
+            candidates.append((text, method, angle, pp_name, confidence, len(text)))
+            print(f"🔄 Rot {angle:+4d}° PP {pp_name}: {method} detectou '{text}' (conf: {confidence:.2f}, len: {len(text)})")
+        return candidates
+
+    def _montage_applies(self, n_variants):
+        """
+        O Tesseract pode ser adiado para uma chamada única se nenhuma engine depender
+        da sua leitura (última engine da cascata, ou cascata desligada).
+        """
+        if not (self.tesseract_montage and n_variants > 1 and self._engine_ready("tesseract")):
+            return False
+        ready = [engine for engine in self.engine_order if self._engine_ready(engine)]
+        return not self.cascade_enabled or ready[-1] == "tesseract"
+
+    def _run_montage(self, queued, ctx):
+        """Lê em uma única chamada do Tesseract as variantes adiadas pela montagem"""
+        trace = ctx['trace']
+        queued.sort(key=lambda q: q[0])
+        ctx['progress'](f"🔤 Tesseract analisando {len(queued)} variante(s) em uma única chamada...", 82)
+        with trace.stage("ocr:tesseract", variants=len(queued)):
+            per_image = self._perform_ocr_tesseract_montage([img for _, _, _, img, _ in queued])
+        if per_image is None:
+            with trace.stage("ocr:tesseract", variants=len(queued), montage=False):
+                per_image = [self._perform_ocr_tesseract(img) for _, _, _, img, _ in queued]
+        else:
+            trace.count("tesseract_montages")
+        results = []
+        for (_, angle, pp_name, _, previous), engine_results in zip(queued, per_image):
+            results.extend(self._collect_engine_results("tesseract", engine_results, previous, angle, pp_name, trace))
+        return results
+
+    def _check_consensus(self, table, ctx):
+        """Encerra a grade quando variantes suficientes leram, sem divergência, o mesmo valor"""
+        if ctx['stopped'] or not self.CONSENSUS_STOP_VOTES:
+            return
+        ranking = table.ranking(limit=2)
+        if len(ranking) == 1 and ranking[0][2] >= self.CONSENSUS_STOP_VOTES:
+            with ctx['lock']:
+                ctx['stopped'] = True
+            ctx['trace'].count("consensus_stop")
+            print(f"🗳️ {ranking[0][2]} variantes leram {ranking[0][0]}m sem divergência: encerrando a grade")
+
+    def _consistent_with_prior(self, results, prior):
+        if prior is None:
+            return False
+        return any(confidence >= self.PRIOR_STOP_CONFIDENCE and depth_prior.deviation(prior, int(text)) <= 1.0
+                   for text, _, _, _, confidence, _ in results)
+
+    def _rotations_for(self, region):
+        """Ângulos da grade; restritos aos próximos da orientação quando ela é conhecida."""
+        orientation = region.get('orientation') if region else None
+        if orientation is None:
+            return self.rotations
+        selected = [angle for angle in self.rotations
+                    if abs((angle - orientation + 90) % 180 - 90) <= self.ORIENTATION_TOLERANCE]
+        return selected or self.rotations
+
+    def analyze_clip(self, img_raw, region=None, x_m=0.0, y_m=0.0, progress=_no_progress, is_cancelled=_never_cancelled,
+                     trace=NULL_TRACE, workers=None, prior=None):
+        """
+        Executa a grade de rotações/filtros sobre um recorte. Retorna None se cancelado.
+        workers sobrescreve o paralelismo de variantes (1 quando o chamador já usa um pool).
+        prior (DepthEstimate da vizinhança) encerra a grade no primeiro candidato coerente.
+        """
+        with trace.stage("to_gray"):
+            gray, separated = self._separate_gray(img_raw)
+        if separated:
+            trace.count("color_separated")
+            self._save_debug_data(gray, x_m, y_m, "ink")
+
+        progress("📐 Configurando rotações e filtros...", 10)
+
+        if region is None and (self.use_click_roi or self.adaptive_clip):
+            progress("🎯 Localizando a sondagem sob o cursor...", 12)
+            with trace.stage("roi_detect"):
+                region = text_regions.locate_click_region(gray)
+
+        if self.use_click_roi:
+            # Detecta o texto uma única vez e mantém apenas a sondagem sob o cursor
+            if region is not None:
+                with trace.stage("roi_crop"):
+                    gray = text_regions.crop_region(gray, region)
+                print(f"🎯 ROI: {region['n_glyphs']} glifo(s) em {region['bbox']} (distância ao clique: {region['distance']:.1f}px)")
+                self._save_debug_data(gray, x_m, y_m, "roi")
+            else:
+                print("🎯 ROI: nenhum texto próximo ao clique, usando o recorte completo")
+
+        progress("🔬 Aumentando resolução da imagem...", 15)
+        # Fator de ampliação escolhido pela altura medida do glifo (2x se desconhecida)
+        scale_factor = text_regions.choose_upscale_factor(region['glyph_height'] if region else None)
+        new_width = int(gray.shape[1] * scale_factor)
+        new_height = int(gray.shape[0] * scale_factor)
+        with trace.stage("upscale", factor=scale_factor):
+            upscaled_gray = cv2.resize(gray, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
+
+        if is_cancelled():
+            return None
+
+        # Intermediários compartilhados: filtros invariantes aplicados uma vez antes da
+        # rotação e cada ângulo rotacionado uma vez para os demais filtros
+        # Com a tinta isolada um único filtro basta (a grade encolhe na mesma proporção)
+        nodes = self.preprocess_methods.nodes
+        if separated and nodes:
+            nodes = [self.preprocess_methods.single_filter_node()]
+        with trace.stage("preprocess_shared"):
+            rotations = self._rotations_for(region)
+            prepared = self.preprocess_methods.prepare(upscaled_gray, rotations, nodes)
+
+        variants = [(angle, node) for angle in rotations for node in nodes]
+        trace.count("variants", len(variants))
+        ctx = {
+            'progress': progress, 'is_cancelled': is_cancelled, 'lock': threading.Lock(), 'trace': trace,
+            'current': 0, 'total': len(variants), 'x_m': x_m, 'y_m': y_m, 'prior': prior, 'stopped': False,
+            'order': {(angle, node.name): i for i, (angle, node) in enumerate(variants)},
+            'montage': [] if self._montage_applies(len(variants)) else None,
+            'debug_variant': (variants[0][0], variants[0][1].name) if variants else None,
+        }
+
+        # Tabela colunar: o ranking (com consenso) é atualizado a cada variante concluída
+        all_results = CandidateTable(self, prior)
+        if workers is None:
+            workers = self.governor.workers
+        if workers > 1:
+            # Variantes em paralelo; cada worker usa apenas sua fatia de threads (ver ResourceGovernor)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for variant_results in executor.map(lambda v: self._run_variant(v, prepared, ctx), variants):
+                    all_results.extend(variant_results)
+                    self._check_consensus(all_results, ctx)
+        else:
+            for variant in variants:
+                if is_cancelled():
+                    return None
+                if ctx['stopped']:
+                    break
+                all_results.extend(self._run_variant(variant, prepared, ctx))
+                self._check_consensus(all_results, ctx)
+
+        if is_cancelled():
+            return None
+        if ctx['montage']:
+            all_results.extend(self._run_montage(ctx['montage'], ctx))
+        if ctx['stopped']:
+            trace.count("variants_skipped", ctx['total'] - ctx['current'])
+        return all_results
+
+    def process(self, img_raw, region=None, clip_loader=None, x_m=0.0, y_m=0.0,
+                progress=_no_progress, is_cancelled=_never_cancelled, trace=NULL_TRACE, workers=None, prior=None):
+        """
+        Executa o pipeline completo (com ampliação do recorte se a confiança for baixa).
+        prior: DepthEstimate das sondagens vizinhas já capturadas (opcional).
+        Retorna (profundidade_cm, candidatos) ou None se cancelado.
+        """
+        with self._engine_lock:
+            self._busy += 1
+        try:
+            if self.engines_unloaded:
+                with trace.stage("engine_load"):
+                    self._get_easyocr_reader()
+            return self._process(img_raw, region, clip_loader, x_m, y_m, progress, is_cancelled, trace, workers,
+                                 prior)
+        finally:
+            with self._engine_lock:
+                self._busy -= 1
+
+    def _process(self, img_raw, region, clip_loader, x_m, y_m, progress, is_cancelled, trace, workers, prior):
+        self.governor.apply_opencv(cv2)
+        if prior is not None:
+            print(f"🧭 Vizinhança: ~{prior.depth_m:.1f}m (±{prior.tolerance_m:.1f}m, {prior.neighbors} sondagens)")
+
+        while True:
+            all_results = self.analyze_clip(img_raw, region, x_m, y_m, progress, is_cancelled, trace, workers, prior)
+            if all_results is None or is_cancelled():
+                return None
+            # Recorte adaptativo: amplia a janela só quando a melhor leitura é fraca
+            if clip_loader is None or self._best_score(all_results, prior) >= self.LOW_CONFIDENCE_SCORE:
+                break
+            with trace.stage("clip_regrow"):
+                larger_clip = clip_loader()
+            if larger_clip is None:
+                break
+            trace.count("clip_regrows")
+            img_raw, region = larger_clip, None
+
+        progress("🎯 Selecionando melhor resultado...", 95)
+        trace.count("candidates", len(all_results))
+        with trace.stage("score"):
+            result = self._process_all_results(all_results, prior)
+        self._record_winners(all_results, result)
+        return result, all_results
+
+    # ---------- Pontuação ----------
+    def engine_calibration(self, engine):
+        """Fator de calibração da confiança de uma engine (1.0 se não configurado)"""
+        return getattr(self, f"{engine.upper()}_CALIBRATION", 1.0)
+
+    def _as_table(self, candidates, prior=None):
+        """Candidatos como CandidateTable (listas de tuplas, p. ex. do banco, são convertidas)"""
+        if isinstance(candidates, CandidateTable):
+            return candidates
+        return CandidateTable.from_rows(self, candidates, prior)
+
+    def _best_score(self, candidates, prior=None):
+        best = self._as_table(candidates, prior).best()
+        return best[1] if best else 0.0
+
+    def _process_all_results(self, candidates, prior=None):
+        table = self._as_table(candidates, prior)
+        ranking = table.ranking(limit=5)
+        if not ranking:
+            return self.OCR_FAILED
+        for value, score, votes in ranking:
+            print(f"📊 Candidato: {value}m (Score Final: {score:.2f}, variantes: {votes})")
+        return int(ranking[0][0] * 100)
+
+    # ---------- Debug ----------
+    def _save_debug_data(self, data, x_m, y_m, suffix):
+        if not self.debug_dir:
+            return
+        try:
+            debug_dir = self.debug_dir
+            os.makedirs(debug_dir, exist_ok=True)
+            # Recortes coloridos chegam em RGB (GDAL); o cv2.imwrite espera BGR
+            img_to_save = np.ascontiguousarray(data[:, :, 2::-1]) if len(data.shape) == 3 and data.shape[2] >= 3 else data
+            if img_to_save.dtype != np.uint8:
+                img_min, img_max = img_to_save.min(), img_to_save.max()
+                img_to_save = ((img_to_save - img_min) / (img_max - img_min) * 255).astype(np.uint8) if img_max > img_min else np.full_like(img_to_save, 128, dtype=np.uint8)
+
+            filename = f"{suffix}_{x_m}_{y_m}.png"
+            filepath = os.path.join(debug_dir, filename)
+            cv2.imwrite(filepath, img_to_save)
+            print(f"💾 Debug salvo: {filepath}")
+        except Exception as e:
+            print(f"❌ Erro ao salvar debug: {e}")
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor OCR local do Depth Reader OCR (opcional)
+Um processo de longa duração mantém os modelos do EasyOCR carregados e
+atende todas as sessões do QGIS e scripts em lote da máquina, por socket Unix
+(ou localhost no Windows). Os recortes trafegam por memória compartilhada: o
+cliente escreve a imagem em um segmento reaproveitado e o servidor lê direto
+dele, sem cópia. Sem servidor em execução o pipeline roda tudo no processo.
+
+Uso (a partir da pasta de plugins do QGIS, com o Python do QGIS):
+    python -m deep_reader_ocr.ocr_server --backend onnx_int8
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+    SHARED_MEMORY_AVAILABLE = True
+except ImportError:
+    shared_memory = None
+    resource_tracker = None
+    SHARED_MEMORY_AVAILABLE = False
+
+PROTOCOL_VERSION = 1
+DEFAULT_SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".depth_reader_ocr", "ocr.sock")
+DEFAULT_PORT = 47863
+# Variável de ambiente com o endereço do servidor ("host:porta" ou caminho do socket)
+ADDRESS_ENV = "DEPTH_READER_OCR_SERVER"
+# Após uma falha de conexão o cliente só tenta de novo depois deste intervalo
+RETRY_INTERVAL = 30.0
+
+
+def default_address():
+    """Socket Unix quando disponível; senão localhost TCP"""
+    override = os.environ.get(ADDRESS_ENV)
+    if override:
+        host, sep, port = override.rpartition(":")
+        return (host, int(port)) if sep and port.isdigit() else override
+    if hasattr(socket, "AF_UNIX") and sys.platform != "win32":
+        return DEFAULT_SOCKET_PATH
+    return ("127.0.0.1", DEFAULT_PORT)
+
+
+# ---------- Protocolo: mensagens JSON com prefixo de tamanho ----------
+def _send(sock, message):
+    payload = json.dumps(message).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = sock.recv(size - len(chunks))
+        if not chunk:
+            raise ConnectionError("conexão encerrada")
+        chunks.extend(chunk)
+    return bytes(chunks)
+
+
+def _recv(sock):
+    size = struct.unpack(">I", _recv_exact(sock, 4))[0]
+    return json.loads(_recv_exact(sock, size).decode("utf-8"))
+
+
+def _jsonable_readtext(results):
+    """Converte a saída do readtext (caixas numpy) para JSON"""
+    return [[[[float(v) for v in point] for point in bbox], str(text), float(conf)] for bbox, text, conf in results]
+
+
+# ---------- Servidor ----------
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                request = _recv(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+            try:
+                response = server.dispatch(request)
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            _send(self.request, response)
+
+
+class _ServerMixin:
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def setup_engines(self, pipeline):
+        self.pipeline = pipeline
+        self.started = time.time()
+        self.requests = 0
+        self._count_lock = threading.Lock()
+
+    def _attach_image(self, request):
+        """Visão numpy do segmento compartilhado do cliente (sem cópia)"""
+        shm = shared_memory.SharedMemory(name=request["shm"])
+        # O segmento pertence ao cliente: o resource_tracker deste processo não deve removê-lo
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        img = np.ndarray(tuple(request["shape"]), dtype=np.dtype(request["dtype"]), buffer=shm.buf)
+        return shm, img
+
+    def dispatch(self, request):
+        with self._count_lock:
+            self.requests += 1
+        op = request.get("op")
+        if op == "ping":
+            return {
+                "ok": True, "protocol": PROTOCOL_VERSION, "pid": os.getpid(),
+                "backend": self.pipeline.ocr_backend,
+                "easyocr": self.pipeline.easyocr_reader is not None,
+                "tesseract": self.pipeline.tesseract_local,
+                "uptime": time.time() - self.started, "requests": self.requests,
+            }
+        if op not in ("readtext", "tesseract_data"):
+            return {"ok": False, "error": f"operação desconhecida: {op}"}
+
+        shm, img = self._attach_image(request)
+        try:
+            if op == "readtext":
+                reader = self.pipeline.easyocr_reader
+                if reader is None:
+                    return {"ok": False, "error": "EasyOCR não carregado no servidor"}
+                return {"ok": True, "results": _jsonable_readtext(reader.readtext(img, **request.get("kwargs", {})))}
+            data = self.pipeline._tesseract_data_local(img, request["config"])
+            # Caixas das palavras: a montagem de variantes separa as leituras pela posição
+            return {"ok": True, "data": {key: [v if isinstance(v, str) else float(v) for v in data[key]]
+                                         for key in ("text", "conf", "left", "top", "width", "height")}}
+        finally:
+            del img
+            shm.close()
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class UnixOCRServer(_ServerMixin, socketserver.ThreadingUnixStreamServer):
+        pass
+else:
+    UnixOCRServer = None
+
+
+class TCPOCRServer(_ServerMixin, socketserver.ThreadingTCPServer):
+    pass
+
+
+def serve(address=None, backend="torch", engine_threads=0):
+    """Carrega as engines uma vez e atende até ser interrompido."""
+    from .ocr_pipeline import OCRPipeline
+
+    address = address or default_address()
+    pipeline = OCRPipeline(ocr_backend=backend, concurrency_config={"engine_threads": engine_threads,
+                                                                     "reserve_ui_cores": 0})
+    print("🧠 Carregando engines...", file=sys.stderr)
+    pipeline._get_easyocr_reader()
+
+    if isinstance(address, str):
+        os.makedirs(os.path.dirname(address), exist_ok=True)
+        if os.path.exists(address):
+            os.unlink(address)
+        server = UnixOCRServer(address, _Handler)
+        os.chmod(address, 0o600)
+    else:
+        server = TCPOCRServer(address, _Handler)
+    server.setup_engines(pipeline)
+    print(f"✅ Servidor OCR em {address} (backend {pipeline.ocr_backend}, " +
+          f"EasyOCR: {pipeline.easyocr_reader is not None}, Tesseract: {pipeline.tesseract_local})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+    return 0
+
+
+# ---------- Cliente ----------
+class OCRServerClient:
+    """
+    Cliente do servidor OCR. readtext/tesseract_data retornam None quando o
+    servidor não está disponível, e o chamador executa a engine no próprio processo.
+    """
+
+    def __init__(self, address=None):
+        self.address = address or default_address()
+        self.info = None
+        self._next_attempt = 0.0
+        self._local = threading.local()
+        self._segments = []
+        self._segments_lock = threading.Lock()
+        atexit.register(self.close)
+
+    # Conexão e segmento de memória compartilhada são por thread (workers em paralelo)
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            if isinstance(self.address, str):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            else:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.settimeout(120)
+            sock.connect(self.address)
+            self._local.sock = sock
+        return sock
+
+    def _segment(self, nbytes):
+        shm = getattr(self._local, "shm", None)
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                self._release(shm)
+            # Folga para recortes um pouco maiores não realocarem o segmento
+            shm = shared_memory.SharedMemory(create=True, size=max(nbytes * 2, 1 << 20))
+            self._local.shm = shm
+            with self._segments_lock:
+                self._segments.append(shm)
+        return shm
+
+    def _release(self, shm):
+        with self._segments_lock:
+            if shm in self._segments:
+                self._segments.remove(shm)
+        try:
+            shm.close()
+            shm.unlink()
+        except (OSError, FileNotFoundError):
+            pass
+
+    def _drop_connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+        self._next_attempt = time.time() + RETRY_INTERVAL
+        self.info = None
+
+    def _call(self, request):
+        if time.time() < self._next_attempt:
+            return None
+        try:
+            sock = self._connection()
+            _send(sock, request)
+            return _recv(sock)
+        except (OSError, ConnectionError, ValueError):
+            self._drop_connection()
+            return None
+
+    def available(self):
+        """Consulta o servidor (ping); None se não estiver em execução"""
+        if not SHARED_MEMORY_AVAILABLE:
+            return None
+        if self.info is None:
+            response = self._call({"op": "ping"})
+            if response and response.get("ok") and response.get("protocol") == PROTOCOL_VERSION:
+                self.info = response
+                print(f"🔌 Servidor OCR conectado (pid {response['pid']}, backend {response['backend']})")
+        return self.info
+
+    def _image_request(self, op, img, **fields):
+        if not self.available():
+            return None
+        img = np.ascontiguousarray(img)
+        shm = self._segment(img.nbytes)
+        np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)[...] = img
+        response = self._call(dict(op=op, shm=shm.name, shape=list(img.shape), dtype=img.dtype.str, **fields))
+        if not response or not response.get("ok"):
+            if response:
+                print(f"⚠️ Servidor OCR: {response.get('error')}")
+            return None
+        return response
+
+    def readtext(self, img, **kwargs):
+        """Mesmo retorno de easyocr.Reader.readtext (caixa, texto, confiança), ou None"""
+        response = self._image_request("readtext", img, kwargs=kwargs)
+        if response is None:
+            return None
+        return [(bbox, text, conf) for bbox, text, conf in response["results"]]
+
+    def tesseract_data(self, img, config):
+        """Mesmo dicionário (text/conf/caixas) de pytesseract.image_to_data, ou None"""
+        response = self._image_request("tesseract_data", img, config=config)
+        return response["data"] if response is not None else None
+
+    def close(self):
+        with self._segments_lock:
+            segments, self._segments = self._segments, []
+        for shm in segments:
+            try:
+                shm.close()
+                shm.unlink()
+            except (OSError, FileNotFoundError):
+                pass
+
+
+class RemoteEasyOCRReader:
+    """Leitor com a interface do easyocr.Reader que usa o servidor e recorre ao leitor local"""
+
+    def __init__(self, client, load_local, backend=None):
+        self.client = client
+        self.backend = backend
+        self._load_local = load_local
+        self._local_reader = None
+        self._lock = threading.Lock()
+
+    def readtext(self, img, **kwargs):
+        results = self.client.readtext(img, **kwargs)
+        if results is not None:
+            return results
+        # Servidor caiu: carrega as engines no processo (uma única vez)
+        with self._lock:
+            if self._local_reader is None:
+                print("⚠️ Servidor OCR indisponível: carregando EasyOCR no processo")
+                self._local_reader = self._load_local()
+        if self._local_reader is None:
+            return []
+        return self._local_reader.readtext(img, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor OCR local do Depth Reader OCR")
+    parser.add_argument("--socket", help=f"Caminho do socket Unix (padrão: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument("--port", type=int, help="Usa localhost TCP nesta porta em vez do socket Unix")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "onnx_int8"])
+    parser.add_argument("--engine-threads", type=int, default=0, help="Threads por engine (0 = automático)")
+    args = parser.parse_args(argv)
+    if not SHARED_MEMORY_AVAILABLE:
+        print("❌ multiprocessing.shared_memory não disponível (Python 3.8+)", file=sys.stderr)
+        return 1
+    address = ("127.0.0.1", args.port) if args.port else (args.socket or None)
+    return serve(address, args.backend, args.engine_threads)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+Backend ONNX Runtime para os modelos do EasyOCR (CRAFT + CRNN)
+Exporta os modelos uma única vez, opcionalmente com quantização int8 dinâmica,
+e executa a inferência sem importar o torch nas sessões seguintes.
+"""
+
+import os
+import json
+import math
+import importlib.util
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ort = None
+    ONNXRUNTIME_AVAILABLE = False
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.depth_reader_ocr', 'onnx')
+
+DETECTOR_FILE = 'craft_detector.onnx'
+RECOGNIZER_FILE = 'crnn_recognizer.onnx'
+META_FILE = 'meta.json'
+
+# Parâmetros padrão do easyocr.Reader.readtext (mantidos para resultados equivalentes)
+CANVAS_SIZE = 2560
+TEXT_THRESHOLD = 0.7
+LOW_TEXT = 0.4
+LINK_THRESHOLD = 0.4
+ADD_MARGIN = 0.1
+MODEL_HEIGHT = 64
+
+# Normalização usada pelo CRAFT (ImageNet, escala 0-255)
+_DETECTOR_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255.0
+_DETECTOR_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255.0
+
+
+def installed_easyocr_version():
+    """Retorna a versão instalada do EasyOCR sem importá-lo (evita carregar o torch)"""
+    if importlib.util.find_spec('easyocr') is None:
+        return None
+    try:
+        from importlib.metadata import version
+        return version('easyocr')
+    except Exception:
+        return 'unknown'
+
+
+def model_paths(cache_dir, quantize=False):
+    """Retorna os caminhos (detector, reconhecedor, meta) dentro do cache"""
+    suffix = '_int8' if quantize else ''
+    detector = os.path.join(cache_dir, DETECTOR_FILE.replace('.onnx', f'{suffix}.onnx'))
+    recognizer = os.path.join(cache_dir, RECOGNIZER_FILE.replace('.onnx', f'{suffix}.onnx'))
+    return detector, recognizer, os.path.join(cache_dir, META_FILE)
+
+
+def is_cache_valid(cache_dir, quantize=False):
+    """Verifica se os modelos exportados existem e correspondem ao EasyOCR instalado"""
+    detector, recognizer, meta_path = model_paths(cache_dir, quantize)
+    if not all(os.path.exists(p) for p in (detector, recognizer, meta_path)):
+        return False
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    installed = installed_easyocr_version()
+    # Sem EasyOCR instalado o cache existente é a única opção: usa como está
+    return installed is None or meta.get('easyocr_version') == installed
+
+
+def export_easyocr_models(cache_dir, quantize=False, lang_list=('en',)):
+    """
+    Exporta detector e reconhecedor do EasyOCR para ONNX.
+    Só é chamado quando o cache não existe: é o único ponto que importa torch.
+    """
+    import torch
+    import easyocr
+
+    os.makedirs(cache_dir, exist_ok=True)
+    detector_path, recognizer_path, meta_path = model_paths(cache_dir, quantize=False)
+
+    reader = easyocr.Reader(list(lang_list), gpu=False, verbose=False)
+
+    detector = reader.detector.module if hasattr(reader.detector, 'module') else reader.detector
+    detector.eval()
+
+    class _DetectorWrapper(torch.nn.Module):
+        def __init__(self, net):
+            super().__init__()
+            self.net = net
+
+        def forward(self, x):
+            y, _feature = self.net(x)
+            return y
+
+    class _RecognizerWrapper(torch.nn.Module):
+        def __init__(self, net):
+            super().__init__()
+            self.net = net
+
+        def forward(self, x):
+            return self.net(x, None)
+
+    recognizer = reader.recognizer.module if hasattr(reader.recognizer, 'module') else reader.recognizer
+    recognizer.eval()
+
+    with torch.no_grad():
+        torch.onnx.export(
+            _DetectorWrapper(detector), torch.randn(1, 3, 192, 192), detector_path,
+            input_names=['image'], output_names=['score'], opset_version=13,
+            dynamic_axes={'image': {2: 'height', 3: 'width'}, 'score': {1: 'h2', 2: 'w2'}})
+        torch.onnx.export(
+            _RecognizerWrapper(recognizer), torch.randn(1, 1, MODEL_HEIGHT, 128), recognizer_path,
+            input_names=['image'], output_names=['preds'], opset_version=13,
+            dynamic_axes={'image': {0: 'batch', 3: 'width'}, 'preds': {0: 'batch', 1: 'steps'}})
+
+    meta = {
+        'easyocr_version': installed_easyocr_version(),
+        'lang_list': list(lang_list),
+        'character': reader.character,
+        'model_height': MODEL_HEIGHT,
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    del reader
+    print(f"💾 Modelos EasyOCR exportados para ONNX em: {cache_dir}")
+
+    if quantize:
+        quantize_models(cache_dir)
+
+
+def quantize_models(cache_dir):
+    """Gera as versões int8 (quantização dinâmica de pesos) dos modelos exportados"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    detector_path, recognizer_path, _ = model_paths(cache_dir, quantize=False)
+    detector_int8, recognizer_int8, _ = model_paths(cache_dir, quantize=True)
+    quantize_dynamic(detector_path, detector_int8, weight_type=QuantType.QUInt8)
+    quantize_dynamic(recognizer_path, recognizer_int8, weight_type=QuantType.QInt8)
+    print(f"💾 Modelos int8 gerados em: {cache_dir}")
+
+
+def ensure_models(cache_dir, quantize=False):
+    """Garante que os modelos ONNX existam no cache, exportando se necessário"""
+    if is_cache_valid(cache_dir, quantize):
+        return True
+    if installed_easyocr_version() is None:
+        print("❌ Modelos ONNX ausentes e EasyOCR não instalado para exportá-los")
+        return False
+    if is_cache_valid(cache_dir, quantize=False) and quantize:
+        quantize_models(cache_dir)
+    else:
+        export_easyocr_models(cache_dir, quantize=quantize)
+    return is_cache_valid(cache_dir, quantize)
+
+
+def _custom_mean(values):
+    """Mesma agregação de confiança usada pelo EasyOCR"""
+    return values.prod() ** (2.0 / np.sqrt(len(values)))
+
+
+class OnnxEasyOCRReader:
+    """
+    Substituto do easyocr.Reader baseado em ONNX Runtime.
+    Implementa o subconjunto de readtext() usado pelo plugin (caixas horizontais,
+    decodificação gulosa CTC, allowlist).
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, quantize=False, num_threads=None):
+        detector_path, recognizer_path, meta_path = model_paths(cache_dir, quantize)
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.character = meta['character']
+        self.model_height = meta.get('model_height', MODEL_HEIGHT)
+        self.quantized = quantize
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if num_threads:
+            options.intra_op_num_threads = int(num_threads)
+
+        providers = ['CPUExecutionProvider']
+        self.detector = ort.InferenceSession(detector_path, options, providers=providers)
+        self.recognizer = ort.InferenceSession(recognizer_path, options, providers=providers)
+        self._ignore_cache = {}
+
+    # ---------- Detecção (CRAFT) ----------
+    def _detect(self, img_color, min_size):
+        height, width = img_color.shape[:2]
+        target_size = min(float(max(height, width)), CANVAS_SIZE)
+        ratio = target_size / max(height, width)
+        target_h, target_w = int(height * ratio), int(width * ratio)
+        resized = cv2.resize(img_color, (target_w, target_h), interpolation=cv2.INTER_LINEAR)
+
+        # Preenche até múltiplo de 32, como o resize_aspect_ratio do EasyOCR
+        pad_h = target_h + (32 - target_h % 32) % 32
+        pad_w = target_w + (32 - target_w % 32) % 32
+        canvas = np.zeros((pad_h, pad_w, 3), dtype=np.float32)
+        canvas[:target_h, :target_w, :] = resized
+        canvas -= _DETECTOR_MEAN
+        canvas /= _DETECTOR_STD
+
+        x = np.ascontiguousarray(canvas.transpose(2, 0, 1)[np.newaxis])
+        score = self.detector.run(None, {'image': x})[0]
+        boxes = self._get_det_boxes(score[0, :, :, 0], score[0, :, :, 1])
+
+        # Mapa de score tem metade da resolução da entrada
+        scale = 2.0 / ratio
+        horizontal = []
+        for box in boxes:
+            box = box * scale
+            x_min, x_max = box[:, 0].min(), box[:, 0].max()
+            y_min, y_max = box[:, 1].min(), box[:, 1].max()
+            margin = int(ADD_MARGIN * min(x_max - x_min, y_max - y_min))
+            x_min = max(0, int(x_min) - margin)
+            y_min = max(0, int(y_min) - margin)
+            x_max = min(width, int(math.ceil(x_max)) + margin)
+            y_max = min(height, int(math.ceil(y_max)) + margin)
+            if max(x_max - x_min, y_max - y_min) > min_size:
+                horizontal.append((x_min, x_max, y_min, y_max))
+        return horizontal
+
+    @staticmethod
+    def _get_det_boxes(textmap, linkmap):
+        """Versão enxuta de getDetBoxes_core do EasyOCR"""
+        _, text_score = cv2.threshold(textmap, LOW_TEXT, 1, 0)
+        _, link_score = cv2.threshold(linkmap, LINK_THRESHOLD, 1, 0)
+        text_score_comb = np.clip(text_score + link_score, 0, 1).astype(np.uint8)
+        n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(text_score_comb, connectivity=4)
+
+        boxes = []
+        img_h, img_w = textmap.shape
+        for k in range(1, n_labels):
+            size = stats[k, cv2.CC_STAT_AREA]
+            if size < 10:
+                continue
+            component = labels == k
+            if np.max(textmap[component]) < TEXT_THRESHOLD:
+                continue
+
+            segmap = np.zeros(textmap.shape, dtype=np.uint8)
+            segmap[component] = 255
+            segmap[np.logical_and(link_score == 1, text_score == 0)] = 0
+            x, y = stats[k, cv2.CC_STAT_LEFT], stats[k, cv2.CC_STAT_TOP]
+            w, h = stats[k, cv2.CC_STAT_WIDTH], stats[k, cv2.CC_STAT_HEIGHT]
+            niter = int(math.sqrt(size * min(w, h) / (w * h)) * 2)
+            sx, ex = max(0, x - niter), min(img_w, x + w + niter + 1)
+            sy, ey = max(0, y - niter), min(img_h, y + h + niter + 1)
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1 + niter, 1 + niter))
+            segmap[sy:ey, sx:ex] = cv2.dilate(segmap[sy:ey, sx:ex], kernel)
+
+            ys, xs = np.nonzero(segmap)
+            points = np.stack([xs, ys], axis=1).astype(np.float32)
+            boxes.append(cv2.boxPoints(cv2.minAreaRect(points)))
+        return boxes
+
+    # ---------- Reconhecimento (CRNN + CTC) ----------
+    def _ignore_idx(self, allowlist):
+        if allowlist not in self._ignore_cache:
+            if allowlist:
+                ignore = [i + 1 for i, c in enumerate(self.character) if c not in allowlist]
+            else:
+                ignore = []
+            self._ignore_cache[allowlist] = np.array(ignore, dtype=np.int64)
+        return self._ignore_cache[allowlist]
+
+    def _recognize(self, img_gray, boxes, allowlist):
+        crops = []
+        max_ratio = 1.0
+        for x_min, x_max, y_min, y_max in boxes:
+            crop = img_gray[y_min:y_max, x_min:x_max]
+            if crop.size == 0:
+                continue
+            ratio = crop.shape[1] / float(crop.shape[0])
+            max_ratio = max(max_ratio, ratio)
+            resized_w = max(1, int(math.ceil(self.model_height * ratio)))
+            crops.append((x_min, x_max, y_min, y_max, cv2.resize(crop, (resized_w, self.model_height), interpolation=cv2.INTER_CUBIC)))
+        if not crops:
+            return []
+
+        # Lote único com padding replicando a última coluna (NormalizePAD do EasyOCR)
+        max_width = int(math.ceil(max_ratio)) * self.model_height
+        batch = np.empty((len(crops), 1, self.model_height, max_width), dtype=np.float32)
+        for i, (_, _, _, _, crop) in enumerate(crops):
+            crop = crop[:, :max_width].astype(np.float32) / 127.5 - 1.0
+            w = crop.shape[1]
+            batch[i, 0, :, :w] = crop
+            batch[i, 0, :, w:] = crop[:, w - 1:w]
+
+        preds = self.recognizer.run(None, {'image': batch})[0]
+        preds = preds - preds.max(axis=2, keepdims=True)
+        probs = np.exp(preds)
+        ignore_idx = self._ignore_idx(allowlist)
+        if ignore_idx.size:
+            probs[:, :, ignore_idx] = 0
+        probs /= probs.sum(axis=2, keepdims=True)
+
+        indices = probs.argmax(axis=2)
+        max_probs = probs.max(axis=2)
+        results = []
+        for i, (x_min, x_max, y_min, y_max, _) in enumerate(crops):
+            idx = indices[i]
+            keep = np.concatenate(([True], idx[1:] != idx[:-1])) & (idx != 0)
+            text = ''.join(self.character[j - 1] for j in idx[keep])
+            non_blank = max_probs[i][idx != 0]
+            confidence = float(_custom_mean(non_blank)) if len(non_blank) else 0.0
+            bbox = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+            results.append((bbox, text, confidence))
+        return results
+
+    def readtext(self, image, detail=1, allowlist=None, min_size=20, **_ignored):
+        """Mesma assinatura básica do easyocr.Reader.readtext"""
+        if len(image.shape) == 2:
+            img_gray = image
+            img_color = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        else:
+            img_color = image[:, :, :3]
+            img_gray = cv2.cvtColor(img_color, cv2.COLOR_BGR2GRAY)
+
+        boxes = self._detect(img_color, min_size)
+        results = self._recognize(img_gray, boxes, allowlist or '')
+        if not detail:
+            return [text for _, text, _ in results]
+        return results
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+OCR em lote de posições de sondagem já conhecidas (sem Qt)
+As posições vêm de uma camada de pontos ou de um CSV de coordenadas. Os
+recortes são lidos em uma única passada pelo raster, na ordem de
+armazenamento dos blocos, e analisados em paralelo por um pool que
+compartilha o mesmo OCRPipeline. As leituras que falharam ou ficaram com
+confiança baixa vão para uma lista de revisão em vez de interromper o lote.
+"""
+
+import csv
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+
+from . import raster_io
+from . import result_store
+from .ocr_pipeline import OCRPipeline
+
+# Situação de cada ponto
+STATUS_OK = "ok"
+STATUS_LOW_CONFIDENCE = "baixa_confianca"
+STATUS_FAILED = "falha_ocr"
+STATUS_OUTSIDE = "fora_do_raster"
+
+# Nomes das colunas aceitas para as coordenadas de um CSV (minúsculas)
+CSV_X_COLUMNS = ("x_m", "x", "este", "easting", "lon", "longitude")
+CSV_Y_COLUMNS = ("y_m", "y", "norte", "northing", "lat", "latitude")
+RESULT_COLUMNS = ["Profundidade_cm", "Profundidade_m", "Confianca", "Status_OCR"]
+
+
+def _no_progress(message, percent):
+    pass
+
+
+def _never_cancelled():
+    return False
+
+
+def _find_column(fieldnames, candidates):
+    lowered = {name.strip().lower(): name for name in fieldnames}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    return None
+
+
+def read_csv_points(csv_path):
+    """
+    Lê um CSV de coordenadas. Retorna (linhas, coluna_x, coluna_y, pontos), com
+    pontos = [(índice da linha, x, y)]; linhas sem coordenadas numéricas são ignoradas.
+    """
+    with open(csv_path, newline='', encoding='utf-8-sig') as file:
+        sample = file.read(4096)
+        file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(file, dialect=dialect)
+        rows = list(reader)
+        fieldnames = reader.fieldnames or []
+    x_column = _find_column(fieldnames, CSV_X_COLUMNS)
+    y_column = _find_column(fieldnames, CSV_Y_COLUMNS)
+    if x_column is None or y_column is None:
+        raise ValueError(f"Colunas de coordenadas não encontradas (X: {', '.join(CSV_X_COLUMNS)}; " +
+                         f"Y: {', '.join(CSV_Y_COLUMNS)})")
+    points = []
+    for i, row in enumerate(rows):
+        try:
+            points.append((i, float(row[x_column].replace(',', '.')), float(row[y_column].replace(',', '.'))))
+        except (TypeError, ValueError, AttributeError):
+            continue
+    return rows, x_column, y_column, points
+
+
+def write_csv_results(rows, fieldnames, results, csv_path):
+    """Grava o CSV de entrada com as colunas de resultado acrescentadas"""
+    by_key = {r['key']: r for r in results}
+    with open(csv_path, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(list(fieldnames) + RESULT_COLUMNS)
+        for i, row in enumerate(rows):
+            writer.writerow([row.get(name) for name in fieldnames] + result_values(by_key.get(i)))
+
+
+def result_values(result):
+    """Valores das colunas de resultado (RESULT_COLUMNS) de um ponto"""
+    if result is None:
+        return [None, None, None, None]
+    depth_cm = result['depth_cm']
+    return [depth_cm, depth_cm / 100 if depth_cm is not None else None,
+            round(result['score'], 3) if result['score'] is not None else None, result['status']]
+
+
+class PointBatch:
+    """Lê as profundidades de uma lista de posições em um raster"""
+
+    def __init__(self, pipeline, raster_path, clip_size=96, workers=None, store=None, index=None,
+                 min_score=OCRPipeline.LOW_CONFIDENCE_SCORE):
+        """
+        :param pipeline: OCRPipeline compartilhado por todos os workers.
+        :param index: TextIndex opcional da carta: cada posição é ajustada à sondagem
+            indexada mais próxima (até meio recorte) e só os ângulos próximos da
+            orientação estimada são analisados.
+        :param store: ResultStore opcional (reaproveita janelas já analisadas).
+        :param min_score: Score abaixo do qual a leitura vai para a revisão.
+        """
+        self.pipeline = pipeline
+        self.raster_path = raster_path
+        self.clip_size = clip_size
+        self.workers = workers or pipeline.governor.workers
+        self.store = store
+        self.index = index
+        self.min_score = min_score
+        self.stats = {}
+        self._fingerprint = None
+        self._config = None
+
+    # ---------- Leitura ----------
+    def _locate(self, geotransform, x, y):
+        """Pixel central do recorte e região conhecida (índice de texto) de uma posição"""
+        px, py = raster_io.map_to_pixel(geotransform, x, y)
+        if self.index is not None:
+            candidate = self.index.nearest(px, py, self.clip_size / 2.0)
+            if candidate is not None:
+                return self.index.center(candidate), candidate
+        return (px, py), None
+
+    def _prepare(self, clip, center, candidate):
+        """Recorte inicial, região e carregador de ampliação a partir do recorte máximo já lido"""
+        read_clip = lambda size: raster_io.center_crop(clip, size)
+        if candidate is not None:
+            size = self.index.clip_size_for(candidate, self.pipeline.CLIP_SIZES, self.clip_size)
+            return read_clip(size), self.index.region_in_clip(candidate, center[0], center[1], size), size, None
+        if self.pipeline.adaptive_clip:
+            img, region, size = self.pipeline.select_adaptive_clip(read_clip, self.clip_size)
+            return img, region, size, self.pipeline.make_clip_loader(read_clip, size, self.clip_size)
+        return clip, None, self.clip_size, None
+
+    @staticmethod
+    def _empty_result(key, x, y, center, candidate, status):
+        return {'key': key, 'x': x, 'y': y, 'px': center[0], 'py': center[1], 'depth_cm': None, 'score': None,
+                'status': status, 'snapped': candidate is not None}
+
+    def _read_point(self, key, x, y, center, clip, candidate, is_cancelled):
+        if is_cancelled():
+            return None
+        result = self._empty_result(key, x, y, center, candidate, STATUS_OUTSIDE)
+        if clip is None:
+            return result
+        img, region, size, clip_loader = self._prepare(clip, center, candidate)
+        if img is None:
+            return result
+
+        stored, confirmed = None, False
+        if self._fingerprint is not None:
+            stored = self.store.lookup(self._fingerprint, center[0], center[1], size,
+                                       result_store.config_hash(self._config))
+        if stored is not None and stored['verdict'] != result_store.VERDICT_REJECTED:
+            corrected = stored['verdict'] == result_store.VERDICT_CORRECTED
+            depth_cm, score = stored['final_cm'] if corrected else stored['chosen_cm'], stored['score']
+            # Valores já confirmados pelo usuário não voltam para a revisão
+            confirmed = stored['verdict'] in (result_store.VERDICT_ACCEPTED, result_store.VERDICT_CORRECTED)
+            result['resumed'] = True
+        else:
+            # O pool já ocupa os workers: as variantes de cada ponto rodam em série
+            outcome = self.pipeline.process(img, region, clip_loader, x_m=x, y_m=y, is_cancelled=is_cancelled,
+                                            workers=1)
+            if outcome is None:
+                return None
+            depth_cm, candidates = outcome
+            score = self.pipeline._best_score(candidates)
+            if self._fingerprint is not None:
+                self.store.save_result(self._fingerprint, center[0], center[1], size, self._config, depth_cm,
+                                       candidates, score=score, img_hash=result_store.clip_hash(img), x_m=x, y_m=y)
+
+        if depth_cm in (None, OCRPipeline.OCR_FAILED):
+            result['status'] = STATUS_FAILED
+        else:
+            result['depth_cm'] = depth_cm
+            result['score'] = score
+            result['status'] = STATUS_OK if confirmed or (score or 0.0) >= self.min_score else STATUS_LOW_CONFIDENCE
+        return result
+
+    def run(self, points, progress=_no_progress, is_cancelled=_never_cancelled):
+        """
+        Processa as posições [(chave, x, y)] (no CRS do raster). Retorna a lista de
+        resultados (dicts com key, x, y, depth_cm, score, status) na ordem de
+        entrada, ou None se cancelado. A revisão é review(resultados).
+        """
+        self.stats = {'points': len(points), 'ok': 0, 'review': 0, 'outside': 0, 'resumed': 0, 'snapped': 0}
+        dataset = raster_io.gdal.Open(self.raster_path, raster_io.gdal.GA_ReadOnly)
+        if dataset is None:
+            raise RuntimeError(f"Não foi possível abrir o raster com GDAL: {self.raster_path}")
+        self.pipeline._get_easyocr_reader()
+        if self.store is not None:
+            self._config = self.pipeline.config_signature()
+            self._fingerprint = self.store.raster_fingerprint(self.raster_path, dataset.RasterXSize,
+                                                              dataset.RasterYSize)
+
+        geotransform = dataset.GetGeoTransform()
+        located = [self._locate(geotransform, x, y) for _, x, y in points]
+        order = raster_io.block_order(dataset, [center for center, _ in located])
+        progress(f"📍 {len(points)} posição(ões): lendo os recortes na ordem dos blocos do raster...", 2)
+
+        # Uma única thread lê o raster (na ordem dos blocos) e alimenta o pool; o número
+        # de recortes em espera é limitado para a memória não crescer com o lote
+        max_pending = self.workers * 4
+        results = [None] * len(points)
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {}
+
+            def collect(return_when):
+                nonlocal done
+                finished, _ = wait(list(pending), return_when=return_when)
+                for future in finished:
+                    i = pending.pop(future)
+                    try:
+                        results[i] = future.result()
+                    except Exception as e:
+                        # O ponto com erro vai para a revisão como falha e o lote segue
+                        key, x, y = points[i]
+                        print(f"⚠️ Erro no ponto {key}: {e}")
+                        results[i] = self._empty_result(key, x, y, located[i][0], located[i][1], STATUS_FAILED)
+                    done += 1
+                    progress(f"🤖 OCR das posições: {done}/{len(points)}", 2 + int(done / max(1, len(points)) * 96))
+
+            for i in order:
+                if is_cancelled():
+                    break
+                key, x, y = points[i]
+                center, candidate = located[i]
+                clip = raster_io.read_clip(dataset, center[0], center[1], self.clip_size)
+                pending[executor.submit(self._read_point, key, x, y, center, clip, candidate, is_cancelled)] = i
+                if len(pending) >= max_pending:
+                    collect(FIRST_COMPLETED)
+            if pending:
+                collect(ALL_COMPLETED)
+        dataset = None
+        if is_cancelled() or any(r is None for r in results):
+            return None
+
+        self.stats['ok'] = sum(1 for r in results if r['status'] == STATUS_OK)
+        self.stats['outside'] = sum(1 for r in results if r['status'] == STATUS_OUTSIDE)
+        self.stats['review'] = len(review(results))
+        self.stats['resumed'] = sum(1 for r in results if r.get('resumed'))
+        self.stats['snapped'] = sum(1 for r in results if r['snapped'])
+        return results
+
+
+def review(results):
+    """Pontos que precisam de revisão manual (falha, baixa confiança ou fora do raster)"""
+    return [r for r in results if r['status'] != STATUS_OK]
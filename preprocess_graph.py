@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Grafo de pré-processamento do plugin Depth Reader OCR
+Cada filtro é um nó com operadores criados uma única vez (CLAHE, kernels) e
+buffers de saída reaproveitados por thread. Opcionalmente (filter_before_rotate)
+o planejador aplica os filtros quase invariantes à rotação uma única vez sobre
+a imagem ampliada e rotaciona o resultado. O threshold adaptativo com
+fechamento só é aproximadamente invariante (a janela e o kernel são
+quadrados), então a saída difere nas bordas dos glifos; por isso o padrão
+continua sendo filtrar após a rotação até o benchmark confirmar a acurácia.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Matrizes de rotação memorizadas (formato do recorte x ângulo); as mais antigas saem primeiro
+MAX_CACHED_MATRICES = 128
+
+
+class _ThreadBuffers(threading.local):
+    """Buffers reaproveitados por thread (realocados só quando o formato muda)"""
+
+    def __init__(self):
+        self.buffers = {}
+
+    def get(self, key, shape, dtype=np.uint8):
+        buf = self.buffers.get(key)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype)
+            self.buffers[key] = buf
+        return buf
+
+
+class FilterNode:
+    """Nó de filtro do grafo de pré-processamento"""
+
+    name = None
+    # Filtros com kernel simétrico podem ser aplicados antes da rotação (resultado aproximado)
+    rotation_invariant = False
+    # Valor de fundo da saída do filtro (preenche os cantos ao rotacionar)
+    border_value = 255
+    # Saída binária: após a rotação (interpolada) é binarizada novamente
+    binary = False
+
+    def apply(self, img, out=None, scratch=None):
+        raise NotImplementedError
+
+
+class ClaheNode(FilterNode):
+    """Equalização CLAHE (depende da grade de tiles, portanto não é invariante à rotação)"""
+
+    name = "clahe"
+
+    def __init__(self, clip_limit=2.0, tile_grid_size=(8, 8)):
+        self.clip_limit = clip_limit
+        self.tile_grid_size = tile_grid_size
+        # O objeto CLAHE guarda estado interno: um por thread, criado uma única vez
+        self._local = threading.local()
+
+    def _clahe(self):
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
+            clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.tile_grid_size)
+            self._local.clahe = clahe
+        return clahe
+
+    def apply(self, img, out=None, scratch=None):
+        return self._clahe().apply(img, out)
+
+
+class AdaptiveThresholdNode(FilterNode):
+    """Threshold adaptativo invertido seguido de fechamento morfológico"""
+
+    rotation_invariant = True
+    border_value = 0
+    binary = True
+
+    def __init__(self, name, method, block_size=11, C=2, close_kernel=(2, 2)):
+        self.name = name
+        self.method = method
+        self.block_size = block_size
+        self.C = C
+        self.kernel = np.ones(close_kernel, np.uint8)
+
+    def apply(self, img, out=None, scratch=None):
+        binary = cv2.adaptiveThreshold(img, 255, self.method, cv2.THRESH_BINARY_INV, self.block_size, self.C, scratch)
+        return cv2.morphologyEx(binary, cv2.MORPH_CLOSE, self.kernel, out)
+
+
+class PreparedClip:
+    """Intermediários compartilhados de um recorte: imagens rotacionadas e filtradas uma única vez"""
+
+    def __init__(self, source):
+        self.source = source
+        self.rotated = {}
+        self.filtered = {}
+
+
+class PreprocessGraph:
+    """Planeja e executa os filtros sobre todas as rotações de um recorte"""
+
+    def __init__(self, nodes, filter_before_rotate=False):
+        self.nodes = list(nodes)
+        self.filter_before_rotate = filter_before_rotate
+        self._buffers = _ThreadBuffers()
+        self._matrices = OrderedDict()
+        self._matrices_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def names(self):
+        return [node.name for node in self.nodes]
+
+    def _shared_filter(self, node):
+        return self.filter_before_rotate and node.rotation_invariant
+
+    def _rotation_matrix(self, shape, angle):
+        key = (shape[:2], angle)
+        with self._matrices_lock:
+            M = self._matrices.get(key)
+            if M is None:
+                center = (shape[1] // 2, shape[0] // 2)
+                M = cv2.getRotationMatrix2D(center, angle, 1.0)
+                self._matrices[key] = M
+                if len(self._matrices) > MAX_CACHED_MATRICES:
+                    self._matrices.popitem(last=False)
+            else:
+                self._matrices.move_to_end(key)
+        return M
+
+    def _rotate(self, img, angle, border_value, dst=None):
+        if angle == 0:
+            return img
+        M = self._rotation_matrix(img.shape, angle)
+        return cv2.warpAffine(img, M, (img.shape[1], img.shape[0]), dst,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=border_value)
+
+    def single_filter_node(self):
+        """Filtro usado sozinho quando a entrada já está limpa (primeiro binário, senão o primeiro)"""
+        return next((node for node in self.nodes if node.binary), self.nodes[0])
+
+    def prepare(self, upscaled, angles, nodes=None):
+        """
+        Calcula os intermediários compartilhados: cada filtro invariante é aplicado
+        uma vez sobre a imagem ampliada e cada ângulo é rotacionado uma vez para os
+        filtros que precisam da imagem já rotacionada. nodes restringe os filtros
+        (padrão: todos os do grafo).
+        """
+        nodes = self.nodes if nodes is None else nodes
+        prepared = PreparedClip(upscaled)
+        for node in nodes:
+            if self._shared_filter(node):
+                prepared.filtered[node.name] = node.apply(upscaled)
+        if any(not self._shared_filter(node) for node in nodes):
+            for angle in angles:
+                prepared.rotated[angle] = self._rotate(upscaled, angle, 255)
+        return prepared
+
+    def render(self, prepared, angle, node):
+        """
+        Retorna a imagem do filtro no ângulo pedido. A saída pode usar o buffer da
+        thread atual e só é válida até a próxima chamada de render nessa thread.
+        """
+        if self._shared_filter(node):
+            filtered = prepared.filtered[node.name]
+            if angle == 0:
+                return filtered
+            out = self._buffers.get('out', filtered.shape)
+            rotated = self._rotate(filtered, angle, node.border_value, out)
+            if node.binary:
+                cv2.threshold(rotated, 127, 255, cv2.THRESH_BINARY, rotated)
+            return rotated
+
+        rotated = prepared.rotated[angle]
+        out = self._buffers.get('out', rotated.shape)
+        scratch = self._buffers.get('scratch', rotated.shape)
+        return node.apply(rotated, out, scratch)
+
+
+# Nome do nó -> chave da seleção de filtros do diálogo
+FILTER_KEYS = {"clahe": "clahe", "adaptive_thresh_gaussian": "gaussian", "adaptive_thresh_mean": "mean"}
+
+
+def filters_config(graph):
+    """Seleção de filtros que reconstrói o grafo (inverso de build_graph)"""
+    return {FILTER_KEYS[name]: True for name in graph.names() if name in FILTER_KEYS}
+
+
+def build_graph(filters_config, filter_before_rotate=False):
+    """Constrói o grafo a partir da seleção de filtros do diálogo"""
+    nodes = []
+    if filters_config.get("clahe"):
+        nodes.append(ClaheNode())
+    if filters_config.get("gaussian"):
+        nodes.append(AdaptiveThresholdNode("adaptive_thresh_gaussian", cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 11, 2))
+    if filters_config.get("mean"):
+        nodes.append(AdaptiveThresholdNode("adaptive_thresh_mean", cv2.ADAPTIVE_THRESH_MEAN_C, 11, 2))
+    return PreprocessGraph(nodes, filter_before_rotate)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Processamento em lote de todas as cartas náuticas de um projeto (sem Qt)
+Cada carta é varrida em blocos para localizar as sondagens (grupos de glifos);
+as sondagens de todas as cartas são lidas por um único pool de workers que
+compartilha o mesmo OCRPipeline (um único modelo carregado). O resultado é
+um conjunto único de pontos com a carta de origem, sem as duplicatas das
+zonas de sobreposição entre cartas.
+"""
+
+import csv
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import raster_io
+from . import text_index
+from . import result_store
+from .ocr_pipeline import OCRPipeline
+
+CSV_HEADER = ['X_m', 'Y_m', 'Profundidade_cm', 'Profundidade_m', 'Carta', 'Confianca']
+
+
+def _no_progress(message, percent):
+    pass
+
+
+def _never_cancelled():
+    return False
+
+
+class ChartSource:
+    """Uma carta do projeto: nome (atributo de origem), caminho e transformação para o CRS de saída"""
+
+    def __init__(self, name, raster_path, transform_xy=None):
+        self.name = name
+        self.raster_path = raster_path
+        # transform_xy(x, y) -> (x, y) no CRS comum; None se já estiver no CRS de saída
+        self.transform_xy = transform_xy
+
+
+class ProjectBatch:
+    """Agenda a varredura e o OCR de várias cartas em um pool compartilhado"""
+
+    def __init__(self, pipeline, clip_size=96, workers=None, tile_size=text_index.TILE_SIZE, dedup_distance=None,
+                 store=None):
+        """
+        :param pipeline: OCRPipeline compartilhado por todos os workers.
+        :param store: ResultStore opcional: cada sondagem vira um checkpoint e as já
+            gravadas não são analisadas de novo (retomada após queda).
+        :param workers: Tamanho do pool (padrão: workers do ResourceGovernor).
+        :param dedup_distance: Distância (unidades do CRS de saída) abaixo da qual duas
+            sondagens de cartas diferentes são a mesma; None = altura do glifo.
+        """
+        self.pipeline = pipeline
+        self.clip_size = clip_size
+        self.workers = workers or pipeline.governor.workers
+        self.tile_size = tile_size
+        self.dedup_distance = dedup_distance
+        self.store = store
+        self._config = None
+        self._fingerprints = {}
+        self._datasets = raster_io.DatasetCache()
+        self.stats = {}
+
+    # ---------- Varredura ----------
+    def detect_soundings(self, chart, is_cancelled=_never_cancelled):
+        """Localiza as sondagens de uma carta. Retorna [(px, py, altura_glifo_px)]."""
+        dataset = self._datasets.get(chart.raster_path)
+        rows = text_index.scan_chart(dataset, self.clip_size, self.pipeline._to_gray, is_cancelled,
+                                     tile_size=self.tile_size)
+        if rows is None:
+            return []
+        return [(int((x0 + x1) / 2), int((y0 + y1) / 2), glyph_height) for x0, y0, x1, y1, glyph_height, _, _ in rows]
+
+    # ---------- OCR ----------
+    def _read_sounding(self, chart, sounding, is_cancelled):
+        if is_cancelled():
+            return None
+        px, py, glyph_height = sounding
+        fingerprint = self._fingerprints.get(chart.raster_path)
+        if fingerprint is not None:
+            stored = self.store.lookup(fingerprint, px, py, self.clip_size, result_store.config_hash(self._config))
+            if stored is not None and stored['verdict'] == result_store.VERDICT_REJECTED:
+                # Janela rejeitada pelo operador: a sondagem não volta para o CSV
+                return None
+            if stored is not None and stored['chosen_cm'] is not None:
+                corrected = stored['verdict'] == result_store.VERDICT_CORRECTED
+                depth_cm = stored['final_cm'] if corrected else stored['chosen_cm']
+                record = self._record(chart, px, py, glyph_height, depth_cm, stored['score'] or 0.0)
+                record['resumed'] = True
+                return record
+
+        dataset = self._datasets.get(chart.raster_path)
+        clip = raster_io.read_clip(dataset, px, py, self.clip_size)
+        if clip is None:
+            return {'chart': chart, 'px': px, 'py': py, 'glyph_height': glyph_height, 'depth_cm': None}
+        # O pool já ocupa os workers: as variantes de cada sondagem rodam em série
+        outcome = self.pipeline.process(clip, is_cancelled=is_cancelled, workers=1)
+        if outcome is None:
+            return None
+        depth_cm, candidates = outcome
+        score = self.pipeline._best_score(candidates)
+        if fingerprint is not None:
+            # Checkpoint: cada sondagem concluída é gravada em sua própria transação
+            self.store.save_result(fingerprint, px, py, self.clip_size, self._config, depth_cm, candidates,
+                                   score=score, img_hash=result_store.clip_hash(clip))
+        return self._record(chart, px, py, glyph_height, depth_cm, score)
+
+    def _record(self, chart, px, py, glyph_height, depth_cm, score):
+        return {
+            'chart': chart, 'px': px, 'py': py, 'glyph_height': glyph_height,
+            'depth_cm': None if depth_cm in (None, OCRPipeline.OCR_FAILED) else depth_cm,
+            'score': score,
+        }
+
+    def _to_output(self, record):
+        """Converte o pixel para o CRS de saída e calcula a tolerância de duplicata"""
+        chart = record['chart']
+        geotransform = self._datasets.get(chart.raster_path).GetGeoTransform()
+        x, y = raster_io.pixel_to_map(geotransform, record['px'], record['py'])
+        x_ref, y_ref = raster_io.pixel_to_map(geotransform, record['px'] + record['glyph_height'], record['py'])
+        if chart.transform_xy is not None:
+            x, y = chart.transform_xy(x, y)
+            x_ref, y_ref = chart.transform_xy(x_ref, y_ref)
+        return {
+            'x': x, 'y': y,
+            'tolerance': self.dedup_distance or math.hypot(x_ref - x, y_ref - y),
+            'depth_cm': record['depth_cm'],
+            'chart': chart.name,
+            'score': record['score'],
+        }
+
+    def run(self, charts, progress=_no_progress, is_cancelled=_never_cancelled):
+        """
+        Processa todas as cartas. Retorna a lista de sondagens (dicts com x, y,
+        depth_cm, chart, score) já sem duplicatas, ou None se cancelado.
+        """
+        self.stats = {'charts': len(charts), 'soundings': 0, 'failed': 0, 'outside': 0, 'duplicates': 0, 'resumed': 0}
+        self.pipeline._get_easyocr_reader()
+        if self.store is not None:
+            self._config = self.pipeline.config_signature()
+            progress("🗃️ Identificando as cartas no banco de resultados...", 1)
+            for chart in charts:
+                self._fingerprints[chart.raster_path] = self.store.raster_fingerprint(chart.raster_path)
+
+        progress(f"🗺️ Localizando sondagens em {len(charts)} carta(s)...", 2)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            detections = list(executor.map(lambda chart: self.detect_soundings(chart, is_cancelled), charts))
+            if is_cancelled():
+                return None
+
+            tasks = [(chart, sounding) for chart, found in zip(charts, detections) for sounding in found]
+            self.stats['soundings'] = len(tasks)
+            progress(f"🔢 {len(tasks)} sondagem(ns) encontradas. Iniciando OCR...", 10)
+
+            records = []
+            errors = 0
+            futures = {executor.submit(self._read_sounding, chart, sounding, is_cancelled): (chart, sounding)
+                       for chart, sounding in tasks}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # Uma sondagem com erro (leitura, OCR ou banco) conta como falha e o lote segue
+                    chart, (px, py, _) = futures[future]
+                    print(f"⚠️ Erro na sondagem ({px}, {py}) de {chart.name}: {e}")
+                    record = None
+                    errors += 1
+                if is_cancelled():
+                    for pending in futures:
+                        pending.cancel()
+                    return None
+                if record is not None:
+                    records.append(record)
+                progress(f"🤖 OCR das sondagens: {done}/{len(tasks)}", 10 + int(done / max(1, len(tasks)) * 85))
+
+        outside = [r for r in records if 'score' not in r]
+        failed = [r for r in records if 'score' in r and r['depth_cm'] is None]
+        self.stats['outside'] = len(outside)
+        self.stats['failed'] = len(failed) + errors
+        self.stats['resumed'] = sum(1 for r in records if r.get('resumed'))
+
+        # A conversão de coordenadas roda em uma única thread (transformações do QGIS não são thread-safe)
+        progress("🧩 Unindo cartas e removendo duplicatas...", 96)
+        points = [self._to_output(r) for r in records if r.get('depth_cm') is not None]
+        merged = deduplicate(points)
+        self.stats['duplicates'] = len(points) - len(merged)
+        self._datasets.close()
+        return merged
+
+
+def deduplicate(points):
+    """
+    Remove sondagens repetidas nas zonas de sobreposição: pontos de cartas
+    diferentes mais próximos que a tolerância são a mesma sondagem e fica o de
+    maior score. Usa uma grade de hashing para evitar comparações O(n²).
+    """
+    if not points:
+        return []
+    cell = max(p['tolerance'] for p in points) or 1.0
+    grid = {}
+    kept = []
+    for point in sorted(points, key=lambda p: p['score'], reverse=True):
+        gx, gy = int(math.floor(point['x'] / cell)), int(math.floor(point['y'] / cell))
+        duplicate = False
+        for nx in (gx - 1, gx, gx + 1):
+            for ny in (gy - 1, gy, gy + 1):
+                for other in grid.get((nx, ny), ()):
+                    if other['chart'] == point['chart']:
+                        continue
+                    limit = max(other['tolerance'], point['tolerance'])
+                    if math.hypot(other['x'] - point['x'], other['y'] - point['y']) <= limit:
+                        duplicate = True
+                        break
+                if duplicate:
+                    break
+            if duplicate:
+                break
+        if not duplicate:
+            grid.setdefault((gx, gy), []).append(point)
+            kept.append(point)
+    return kept
+
+
+def write_csv(points, csv_path):
+    """Grava o conjunto unificado (mesmas colunas da ferramenta de clique + carta e confiança)"""
+    with open(csv_path, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+        for p in sorted(points, key=lambda p: (p['chart'], p['y'], p['x'])):
+            writer.writerow([round(p['x'], 2), round(p['y'], 2), p['depth_cm'], p['depth_cm'] / 100,
+                             p['chart'], round(p['score'], 3)])
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Leitura de rasters (GDAL) do plugin Depth Reader OCR, sem dependência de Qt
+Usada pela ferramenta de clique e pelos processamentos em lote.
+"""
+
+import threading
+
+import numpy as np
+
+from .instrumentation import NULL_TRACE
+
+try:
+    from osgeo import gdal
+    GDAL_AVAILABLE = True
+except ImportError:
+    gdal = None
+    GDAL_AVAILABLE = False
+
+
+def map_to_pixel(geotransform, x, y):
+    """Coordenadas do mapa -> pixel (raster sem rotação)"""
+    return int((x - geotransform[0]) / geotransform[1]), int((y - geotransform[3]) / geotransform[5])
+
+
+def pixel_to_map(geotransform, px, py):
+    """Pixel (pode ser fracionário) -> coordenadas do mapa"""
+    x = geotransform[0] + px * geotransform[1] + py * geotransform[2]
+    y = geotransform[3] + px * geotransform[4] + py * geotransform[5]
+    return x, y
+
+
+def to_uint8(img):
+    """Normaliza rasters de 16 bits/float para uint8"""
+    if img.dtype == np.uint8:
+        return img
+    img_min, img_max = img.min(), img.max()
+    if img_max > img_min:
+        return ((img - img_min) / (img_max - img_min) * 255).astype(np.uint8)
+    return np.full_like(img, 128, dtype=np.uint8)
+
+
+def read_window(dataset, x_start, y_start, width, height, trace=NULL_TRACE):
+    """Lê uma janela retangular (até 3 bandas, normalizada para uint8)"""
+    img_bands = []
+    with trace.stage("gdal_read", size=max(width, height)):
+        for band_num in range(1, min(4, dataset.RasterCount + 1)):
+            band = dataset.GetRasterBand(band_num)
+            band_array = band.ReadAsArray(x_start, y_start, width, height)
+            if band_array is not None:
+                img_bands.append(band_array)
+    if not img_bands:
+        raise RuntimeError("Não foi possível ler dados do raster")
+
+    img_data_raw = np.stack(img_bands, axis=-1) if len(img_bands) > 1 else img_bands[0]
+    if len(img_data_raw.shape) == 3 and img_data_raw.shape[-1] >= 3:
+        img_data_raw = img_data_raw[:, :, :3]
+
+    if img_data_raw.dtype != np.uint8:
+        with trace.stage("normalize"):
+            img_data_raw = to_uint8(img_data_raw)
+    return img_data_raw
+
+
+def block_order(dataset, pixels):
+    """
+    Índices de pixels [(px, py)] na ordem de armazenamento do raster (faixas de
+    blocos, depois blocos, depois linhas): leituras consecutivas reaproveitam os
+    blocos já descompactados no cache do GDAL.
+    """
+    block_w, block_h = dataset.GetRasterBand(1).GetBlockSize()
+    block_w, block_h = max(1, block_w), max(1, block_h)
+    return sorted(range(len(pixels)),
+                  key=lambda i: (pixels[i][1] // block_h, pixels[i][0] // block_w, pixels[i][1], pixels[i][0]))
+
+
+def center_crop(img, size):
+    """Recorte central quadrado de uma imagem maior"""
+    h, w = img.shape[:2]
+    y0, x0 = (h - size) // 2, (w - size) // 2
+    return img[y0:y0 + size, x0:x0 + size]
+
+
+def read_clip(dataset, pixel_x, pixel_y, size, trace=NULL_TRACE):
+    """Lê um recorte quadrado centrado no pixel; None se não couber no raster."""
+    half = size // 2
+    width, height = dataset.RasterXSize, dataset.RasterYSize
+    if not (half <= pixel_x < width - half and half <= pixel_y < height - half):
+        return None
+    return read_window(dataset, pixel_x - half, pixel_y - half, size, size, trace)
+
+
+class DatasetCache(threading.local):
+    """Datasets GDAL abertos uma vez por thread (um dataset não deve ser compartilhado entre threads)"""
+
+    def __init__(self):
+        self.datasets = {}
+
+    def get(self, raster_path):
+        dataset = self.datasets.get(raster_path)
+        if dataset is None:
+            dataset = gdal.Open(raster_path, gdal.GA_ReadOnly)
+            if dataset is None:
+                raise RuntimeError(f"Não foi possível abrir o raster com GDAL: {raster_path}")
+            self.datasets[raster_path] = dataset
+        return dataset
+
+    def close(self):
+        self.datasets.clear()
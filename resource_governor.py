@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Governador de recursos de CPU para o plugin Depth Reader OCR
+Define uma única configuração de concorrência (workers e threads por engine)
+e a aplica ao torch, ONNX Runtime, OpenCV e Tesseract (OpenMP).
+"""
+
+import os
+
+
+class ResourceGovernor:
+    """Calcula e aplica os limites de threads de todas as engines de OCR"""
+
+    def __init__(self, workers=1, engine_threads=0, reserve_ui_cores=1):
+        """
+        :param workers: Número de variantes OCR processadas em paralelo.
+        :param engine_threads: Threads intra-op por engine (0 = automático).
+        :param reserve_ui_cores: Núcleos deixados livres para o QGIS (canvas/UI).
+        """
+        self.requested_workers = max(1, int(workers or 1))
+        self.requested_engine_threads = max(0, int(engine_threads or 0))
+        self.reserve_ui_cores = max(0, int(reserve_ui_cores or 0))
+        self.cpu_count = os.cpu_count() or 1
+        self.applied = {}
+
+        # Núcleos efetivamente disponíveis para OCR (sempre pelo menos um)
+        self.available_cores = max(1, self.cpu_count - self.reserve_ui_cores)
+        self.workers = min(self.requested_workers, self.available_cores)
+
+        # Cada worker recebe uma fatia fixa dos núcleos: workers x threads <= núcleos disponíveis
+        per_worker = max(1, self.available_cores // self.workers)
+        if self.requested_engine_threads:
+            self.engine_threads = min(self.requested_engine_threads, per_worker)
+        else:
+            self.engine_threads = per_worker
+
+        # O OpenMP do Tesseract só adiciona overhead em recortes pequenos
+        self.tesseract_threads = 1
+
+    def apply_torch(self):
+        """Limita o pool de threads do torch (chamar logo após importar easyocr/torch)"""
+        try:
+            import torch
+        except ImportError:
+            return
+        torch.set_num_threads(self.engine_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Só pode ser definido antes do primeiro trabalho paralelo do torch
+            pass
+        self.applied['torch'] = torch.get_num_threads()
+
+    def apply_opencv(self, cv2_module):
+        """Limita o pool de threads do OpenCV"""
+        if cv2_module is None:
+            return
+        cv2_module.setNumThreads(self.engine_threads)
+        self.applied['opencv'] = cv2_module.getNumThreads()
+
+    def apply_tesseract_env(self):
+        """Define OMP_THREAD_LIMIT herdado pelos subprocessos do Tesseract"""
+        os.environ['OMP_THREAD_LIMIT'] = str(self.tesseract_threads)
+        self.applied['tesseract'] = self.tesseract_threads
+
+    def onnx_threads(self):
+        """Threads intra-op para as sessões do ONNX Runtime"""
+        self.applied['onnxruntime'] = self.engine_threads
+        return self.engine_threads
+
+    def diagnostics(self):
+        """Retorna um dicionário com os valores solicitados e efetivos"""
+        return {
+            'cpu_count': self.cpu_count,
+            'reserve_ui_cores': self.reserve_ui_cores,
+            'available_cores': self.available_cores,
+            'requested_workers': self.requested_workers,
+            'workers': self.workers,
+            'requested_engine_threads': self.requested_engine_threads or 'auto',
+            'engine_threads': self.engine_threads,
+            'tesseract_threads': self.tesseract_threads,
+            'applied': dict(self.applied),
+        }
+
+    def diagnostics_text(self):
+        """Resumo legível para o diálogo de diagnóstico"""
+        info = self.diagnostics()
+        applied = info['applied']
+        lines = [
+            f"🖥️ Núcleos de CPU: {info['cpu_count']} (reservados para UI: {info['reserve_ui_cores']})",
+            f"⚙️ Workers OCR: {info['workers']} (solicitado: {info['requested_workers']})",
+            f"🧵 Threads por engine: {info['engine_threads']} (solicitado: {info['requested_engine_threads']})",
+            f"🔤 Threads Tesseract (OMP_THREAD_LIMIT): {info['tesseract_threads']}",
+        ]
+        if applied:
+            lines.append("✅ Aplicado: " + ", ".join(f"{k}={v}" for k, v in sorted(applied.items())))
+        else:
+            lines.append("⏳ Nenhuma engine inicializada ainda")
+        return "\n".join(lines)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento persistente dos resultados do Depth Reader OCR (SQLite em modo WAL)
+Cada análise é gravada pela impressão digital do conteúdo do raster e pela
+janela de pixels (centro e tamanho do recorte), com o hash do recorte, a
+configuração usada, todos os candidatos, o valor escolhido e o veredito do
+usuário. Reabrir uma carta reaproveita o trabalho anterior e os lotes longos
+podem ser retomados após uma queda.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser("~"), ".depth_reader_ocr", "results.sqlite")
+SCHEMA_VERSION = 1
+
+# Vereditos do usuário
+VERDICT_PENDING = "pending"      # OCR executado, ainda sem confirmação
+VERDICT_ACCEPTED = "accepted"    # valor do OCR confirmado
+VERDICT_CORRECTED = "corrected"  # valor digitado pelo usuário
+VERDICT_REJECTED = "rejected"    # ponto descartado
+
+# Impressão digital: blocos lidos ao longo do arquivo (não lê rasters de vários GB inteiros)
+FINGERPRINT_SAMPLES = 16
+FINGERPRINT_BLOCK = 64 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rasters (
+    fingerprint TEXT PRIMARY KEY,
+    path TEXT,
+    width INTEGER,
+    height INTEGER,
+    first_seen REAL
+);
+CREATE TABLE IF NOT EXISTS clips (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    px INTEGER NOT NULL,
+    py INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    config_hash TEXT NOT NULL,
+    clip_hash TEXT,
+    config TEXT,
+    x_m REAL,
+    y_m REAL,
+    chosen_cm INTEGER,
+    score REAL,
+    verdict TEXT NOT NULL DEFAULT 'pending',
+    final_cm INTEGER,
+    created REAL,
+    updated REAL,
+    UNIQUE (fingerprint, px, py, size, config_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_clips_window ON clips (fingerprint, px, py);
+CREATE INDEX IF NOT EXISTS idx_clips_verdict ON clips (fingerprint, verdict);
+CREATE TABLE IF NOT EXISTS candidates (
+    clip_id INTEGER NOT NULL REFERENCES clips (id) ON DELETE CASCADE,
+    text TEXT,
+    method TEXT,
+    angle INTEGER,
+    filter TEXT,
+    confidence REAL,
+    length INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_candidates_clip ON candidates (clip_id);
+"""
+
+
+def fingerprint_file(path, width=None, height=None):
+    """
+    Impressão digital do conteúdo do raster: tamanho, dimensões e blocos
+    amostrados ao longo do arquivo (o caminho não entra, então cópias e
+    renomeações reaproveitam os resultados).
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(f"{size}:{width}:{height}".encode("utf-8"))
+    with open(path, "rb") as f:
+        if size <= FINGERPRINT_SAMPLES * FINGERPRINT_BLOCK:
+            digest.update(f.read())
+        else:
+            step = (size - FINGERPRINT_BLOCK) // (FINGERPRINT_SAMPLES - 1)
+            for k in range(FINGERPRINT_SAMPLES):
+                f.seek(k * step)
+                digest.update(f.read(FINGERPRINT_BLOCK))
+    return digest.hexdigest()
+
+
+def clip_hash(img):
+    """Hash do conteúdo de um recorte (formato + pixels)"""
+    digest = hashlib.sha1(str(img.shape).encode("utf-8"))
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def config_hash(config):
+    """Hash estável de um dicionário de configuração"""
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class ResultStore:
+    """Banco SQLite (WAL) com os resultados de OCR, compartilhado entre threads"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._fingerprints = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------- Rasters ----------
+    def raster_fingerprint(self, path, width=None, height=None):
+        """Impressão digital do raster (calculada uma vez por versão do arquivo)"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        fingerprint = self._fingerprints.get(key)
+        if fingerprint is None:
+            fingerprint = fingerprint_file(path, width, height)
+            self._fingerprints[key] = fingerprint
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO rasters (fingerprint, path, width, height, first_seen) VALUES (?, ?, ?, ?, ?)",
+                    (fingerprint, path, width, height, time.time()))
+                self._conn.commit()
+        return fingerprint
+
+    # ---------- Recortes ----------
+    def lookup(self, fingerprint, px, py, size, config_key, img_hash=None):
+        """
+        Resultado gravado para a janela e configuração, ou None. Se img_hash for
+        informado, o recorte precisa ter o mesmo conteúdo.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM clips WHERE fingerprint=? AND px=? AND py=? AND size=? AND config_hash=?",
+                (fingerprint, px, py, size, config_key)).fetchone()
+        if row is None or (img_hash is not None and row['clip_hash'] not in (None, img_hash)):
+            return None
+        return dict(row)
+
+    def candidates(self, clip_id):
+        """Candidatos de um recorte no formato do pipeline (texto, método, ângulo, filtro, confiança, tamanho)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text, method, angle, filter, confidence, length FROM candidates WHERE clip_id=?",
+                (clip_id,)).fetchall()
+        return [tuple(row) for row in rows]
+
+    def save_result(self, fingerprint, px, py, size, config, chosen_cm, candidates, score=None,
+                    img_hash=None, x_m=None, y_m=None):
+        """
+        Grava (ou substitui) a análise de uma janela com todos os candidatos. Uma
+        nova análise volta a ficar pendente (o veredito antigo era de outra leitura).
+        Retorna o id do recorte. Cada chamada é uma transação: serve de checkpoint.
+        """
+        now = time.time()
+        config_key = config_hash(config)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO clips (fingerprint, px, py, size, config_hash, clip_hash, config, x_m, y_m,
+                                      chosen_cm, score, verdict, created, updated)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (fingerprint, px, py, size, config_hash) DO UPDATE SET
+                       clip_hash=excluded.clip_hash, x_m=excluded.x_m, y_m=excluded.y_m,
+                       chosen_cm=excluded.chosen_cm, score=excluded.score, verdict=excluded.verdict,
+                       final_cm=NULL, updated=excluded.updated""",
+                (fingerprint, px, py, size, config_key, img_hash, json.dumps(config, sort_keys=True), x_m, y_m,
+                 chosen_cm, score, VERDICT_PENDING, now, now))
+            clip_id = self._conn.execute(
+                "SELECT id FROM clips WHERE fingerprint=? AND px=? AND py=? AND size=? AND config_hash=?",
+                (fingerprint, px, py, size, config_key)).fetchone()[0]
+            self._conn.execute("DELETE FROM candidates WHERE clip_id=?", (clip_id,))
+            self._conn.executemany(
+                "INSERT INTO candidates (clip_id, text, method, angle, filter, confidence, length) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(clip_id, text, method, int(angle), pp_name, float(confidence), int(length))
+                 for text, method, angle, pp_name, confidence, length in candidates])
+        return clip_id
+
+    def set_verdict(self, clip_id, verdict, final_cm=None):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE clips SET verdict=?, final_cm=?, updated=? WHERE id=?",
+                               (verdict, final_cm, time.time(), clip_id))
+
+    def completed_windows(self, fingerprint, config_key):
+        """Janelas (px, py, size) já analisadas de um raster (para retomar lotes)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT px, py, size FROM clips WHERE fingerprint=? AND config_hash=?",
+                (fingerprint, config_key)).fetchall()
+        return {tuple(row) for row in rows}
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT verdict, COUNT(*) FROM clips GROUP BY verdict").fetchall()
+            n_candidates = self._conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+        stats = {row[0]: row[1] for row in rows}
+        stats['candidates'] = n_candidates
+        return stats
+
+    def diagnostics_text(self):
+        stats = self.stats()
+        total = sum(v for k, v in stats.items() if k != 'candidates')
+        return "\n".join([
+            f"💾 Banco: {self.db_path}",
+            f"📦 Recortes gravados: {total} (candidatos: {stats['candidates']})",
+            f"✅ Aceitos: {stats.get(VERDICT_ACCEPTED, 0)} | ✏️ Corrigidos: {stats.get(VERDICT_CORRECTED, 0)} | " +
+            f"🚫 Rejeitados: {stats.get(VERDICT_REJECTED, 0)} | ⏳ Pendentes: {stats.get(VERDICT_PENDING, 0)}",
+        ])
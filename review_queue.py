@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+Painel de revisão dos resultados do Depth Reader OCR
+Em vez de uma janela de confirmação por clique, cada resultado entra em uma
+fila em um painel encaixável (recorte, valor e score) e o operador confirma,
+corrige ou rejeita pelo teclado enquanto as próximas análises rodam em
+segundo plano. Leituras com score acima do limiar de aceite automático são
+gravadas sem passar pela fila.
+"""
+
+import numpy as np
+
+from qgis.PyQt import QtWidgets
+from qgis.PyQt.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, QEvent, pyqtSignal
+from qgis.PyQt.QtGui import QImage, QPixmap
+
+from .result_store import VERDICT_ACCEPTED, VERDICT_CORRECTED, VERDICT_REJECTED
+
+# Lado (px) da miniatura do recorte na fila
+THUMB_SIZE = 48
+
+
+def _thumbnail(img):
+    """Miniatura (QPixmap) de um recorte cinza ou RGB uint8"""
+    if img is None:
+        return None
+    img = np.ascontiguousarray(img if img.ndim == 2 else img[:, :, :3])
+    h, w = img.shape[:2]
+    fmt = QImage.Format_Grayscale8 if img.ndim == 2 else QImage.Format_RGB888
+    image = QImage(img.tobytes(), w, h, img.strides[0], fmt).copy()
+    return QPixmap.fromImage(image).scaled(THUMB_SIZE, THUMB_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+def _parse_depth_cm(text):
+    """Profundidade digitada (metros, vírgula ou ponto) em cm; None se vazia ou inválida."""
+    try:
+        value = float(str(text).strip().replace(",", "."))
+    except ValueError:
+        return None
+    return int(round(value * 100)) if value > 0 else None
+
+
+class ReviewQueueModel(QAbstractTableModel):
+    """Resultados aguardando revisão (dicts com x_m, y_m, depth_cm, score, thumb e o estado do clique)"""
+
+    COLUMNS = ["Recorte", "Profundidade (m)", "Score", "X", "Y"]
+    COL_THUMB, COL_DEPTH, COL_SCORE, COL_X, COL_Y = range(5)
+
+    # Profundidade corrigida na célula: item e valor em cm
+    depth_edited = pyqtSignal(object, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        if index.column() == self.COL_DEPTH:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        item, column = self.items[index.row()], index.column()
+        if role == Qt.DecorationRole and column == self.COL_THUMB:
+            return item['thumb']
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if column == self.COL_DEPTH:
+                return "" if item['depth_cm'] is None else f"{item['depth_cm'] / 100:.1f}"
+            if column == self.COL_SCORE:
+                return "—" if item['score'] is None else f"{item['score']:.2f}"
+            if column == self.COL_X:
+                return f"{item['x_m']:.2f}"
+            if column == self.COL_Y:
+                return f"{item['y_m']:.2f}"
+        if role == Qt.ToolTipRole and column == self.COL_DEPTH and item['depth_cm'] is None:
+            return "OCR sem leitura: digite a profundidade e Enter"
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or index.column() != self.COL_DEPTH:
+            return False
+        depth_cm = _parse_depth_cm(value)
+        if depth_cm is None:
+            return False
+        self.depth_edited.emit(self.items[index.row()], depth_cm)
+        return True
+
+    def add(self, item):
+        row = len(self.items)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.items.append(item)
+        self.endInsertRows()
+        return row
+
+    def remove(self, item):
+        if item not in self.items:
+            return False
+        row = self.items.index(item)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.items[row]
+        self.endRemoveRows()
+        return True
+
+
+class ReviewQueueDock(QtWidgets.QDockWidget):
+    """
+    Painel encaixável com a fila de revisão. Teclado: Enter/Espaço confirma,
+    digitar um número (ou F2) corrige e Delete/Backspace rejeita.
+    """
+
+    # Decisão do operador (ou aceite automático): item, veredito e profundidade final (cm)
+    decided = pyqtSignal(object, str, object)
+    # Linha selecionada: coordenadas (x, y) da sondagem no mapa
+    point_selected = pyqtSignal(float, float)
+    cancel_requested = pyqtSignal()
+
+    def __init__(self, parent=None, auto_accept_score=0.0):
+        super().__init__("🤖 Depth Reader OCR - Revisão", parent)
+        self.setObjectName("DepthReaderOCRReviewQueue")
+        self.auto_accepted = 0
+        self.reviewed = 0
+
+        self.model = ReviewQueueModel(self)
+        self.model.depth_edited.connect(self._on_depth_edited)
+        self.view = QtWidgets.QTableView()
+        self.view.setModel(self.model)
+        self.view.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.view.setEditTriggers(QtWidgets.QAbstractItemView.AnyKeyPressed |
+                                  QtWidgets.QAbstractItemView.EditKeyPressed |
+                                  QtWidgets.QAbstractItemView.DoubleClicked)
+        self.view.verticalHeader().setDefaultSectionSize(THUMB_SIZE + 4)
+        self.view.verticalHeader().setVisible(False)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.view.setColumnWidth(ReviewQueueModel.COL_THUMB, THUMB_SIZE + 8)
+        self.view.installEventFilter(self)
+        self.view.selectionModel().currentRowChanged.connect(self._on_current_changed)
+
+        self.status_label = QtWidgets.QLabel("✅ Nenhuma análise em andamento")
+        self.counter_label = QtWidgets.QLabel()
+        self.sbAutoAccept = QtWidgets.QDoubleSpinBox()
+        self.sbAutoAccept.setRange(0.0, 5.0)
+        self.sbAutoAccept.setSingleStep(0.1)
+        self.sbAutoAccept.setSpecialValueText("desativado")
+        self.sbAutoAccept.setToolTip("Leituras com score igual ou acima deste valor são gravadas sem passar pela fila")
+        self.sbAutoAccept.setValue(auto_accept_score)
+
+        btn_accept = QtWidgets.QPushButton("✅ Confirmar (Enter)")
+        btn_accept.clicked.connect(self.accept_current)
+        btn_correct = QtWidgets.QPushButton("✏️ Corrigir (F2)")
+        btn_correct.clicked.connect(self.edit_current)
+        btn_reject = QtWidgets.QPushButton("🗑️ Rejeitar (Del)")
+        btn_reject.clicked.connect(self.reject_current)
+        btn_accept_all = QtWidgets.QPushButton("✅ Confirmar todos")
+        btn_accept_all.clicked.connect(self.accept_all)
+        btn_cancel = QtWidgets.QPushButton("❌ Cancelar análises")
+        btn_cancel.clicked.connect(self.cancel_requested.emit)
+
+        actions = QtWidgets.QHBoxLayout()
+        for button in (btn_accept, btn_correct, btn_reject):
+            actions.addWidget(button)
+        auto = QtWidgets.QHBoxLayout()
+        auto.addWidget(QtWidgets.QLabel("Aceite automático com score ≥"))
+        auto.addWidget(self.sbAutoAccept)
+        auto.addStretch()
+        bottom = QtWidgets.QHBoxLayout()
+        bottom.addWidget(btn_accept_all)
+        bottom.addWidget(btn_cancel)
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.view)
+        layout.addLayout(actions)
+        layout.addLayout(bottom)
+        layout.addLayout(auto)
+        layout.addWidget(self.counter_label)
+        container = QtWidgets.QWidget()
+        container.setLayout(layout)
+        self.setWidget(container)
+        self._update_counters()
+
+    # ---------- Entrada ----------
+    def set_auto_accept(self, score):
+        self.sbAutoAccept.setValue(score or 0.0)
+
+    def add_result(self, item):
+        """
+        Acrescenta um resultado (x_m, y_m, depth_cm, score, img, ...). Com score acima
+        do limiar de aceite automático a decisão é emitida na hora.
+        """
+        item['thumb'] = _thumbnail(item.pop('img', None))
+        threshold = self.sbAutoAccept.value()
+        if threshold > 0 and item['depth_cm'] is not None and item['score'] is not None and item['score'] >= threshold:
+            self.auto_accepted += 1
+            self._update_counters()
+            self.decided.emit(item, VERDICT_ACCEPTED, item['depth_cm'])
+            return
+        row = self.model.add(item)
+        if not self.view.currentIndex().isValid():
+            self._select_row(row)
+        self._update_counters()
+        if not self.isVisible():
+            self.show()
+
+    def set_status(self, text):
+        self.status_label.setText(text)
+
+    def pending(self):
+        return len(self.model.items)
+
+    # ---------- Decisões ----------
+    def _current_item(self):
+        index = self.view.currentIndex()
+        return self.model.items[index.row()] if index.isValid() else None
+
+    def _decide(self, item, verdict, final_cm):
+        row = self.model.items.index(item) if item in self.model.items else -1
+        if not self.model.remove(item):
+            return
+        self.reviewed += 1
+        if self.model.items:
+            self._select_row(min(row, len(self.model.items) - 1))
+        self._update_counters()
+        self.decided.emit(item, verdict, final_cm)
+
+    def accept_current(self):
+        item = self._current_item()
+        if item is None:
+            return
+        if item['depth_cm'] is None:
+            # Sem leitura do OCR: confirmar significa digitar o valor
+            self.edit_current()
+            return
+        self._decide(item, VERDICT_ACCEPTED, item['depth_cm'])
+
+    def reject_current(self):
+        item = self._current_item()
+        if item is not None:
+            self._decide(item, VERDICT_REJECTED, None)
+
+    def edit_current(self):
+        index = self.view.currentIndex()
+        if index.isValid():
+            index = self.model.index(index.row(), ReviewQueueModel.COL_DEPTH)
+            self.view.setCurrentIndex(index)
+            self.view.edit(index)
+
+    def accept_all(self):
+        for item in [item for item in self.model.items if item['depth_cm'] is not None]:
+            self._decide(item, VERDICT_ACCEPTED, item['depth_cm'])
+
+    def _on_depth_edited(self, item, depth_cm):
+        # A linha só sai da fila depois que o editor fecha
+        verdict = VERDICT_ACCEPTED if depth_cm == item['depth_cm'] else VERDICT_CORRECTED
+        QTimer.singleShot(0, lambda: self._decide(item, verdict, depth_cm))
+
+    # ---------- Navegação ----------
+    def _select_row(self, row):
+        self.view.setCurrentIndex(self.model.index(row, ReviewQueueModel.COL_DEPTH))
+
+    def _on_current_changed(self, current, previous):
+        if current.isValid():
+            item = self.model.items[current.row()]
+            self.point_selected.emit(item['x_m'], item['y_m'])
+
+    def eventFilter(self, obj, event):
+        if obj is self.view and event.type() == QEvent.KeyPress and \
+                self.view.state() != QtWidgets.QAbstractItemView.EditingState:
+            if event.key() in (Qt.Key_Return, Qt.Key_Enter, Qt.Key_Space):
+                self.accept_current()
+                return True
+            if event.key() in (Qt.Key_Delete, Qt.Key_Backspace):
+                self.reject_current()
+                return True
+            if event.text().isdigit():
+                # Digitar um número começa a correção na coluna da profundidade
+                index = self.view.currentIndex()
+                if index.isValid() and index.column() != ReviewQueueModel.COL_DEPTH:
+                    self.view.setCurrentIndex(self.model.index(index.row(), ReviewQueueModel.COL_DEPTH))
+        return super().eventFilter(obj, event)
+
+    def _update_counters(self):
+        self.counter_label.setText(f"📋 Na fila: {self.pending()} | ✔️ Revisados: {self.reviewed} | " +
+                                   f"⚡ Aceitos automaticamente: {self.auto_accepted}")
@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+"""
+Varredura distribuída de cartas náuticas (headless, sem QGIS)
+Uma fila de blocos em um arquivo SQLite é criada a partir de uma lista de
+rasters; processos worker (na mesma máquina ou em várias máquinas que
+compartilham o sistema de arquivos) reservam blocos por lease, localizam as
+sondagens e executam o mesmo OCRPipeline da ferramenta de clique. Blocos de
+workers que morreram voltam para a fila quando o lease expira; a gravação dos
+resultados é idempotente. O comando merge gera o CSV final sem duplicatas.
+
+Uso (a partir da pasta de plugins do QGIS, com o Python do QGIS):
+    python -m deep_reader_ocr.sweep init --queue fila.sqlite cartas/*.tif
+    python -m deep_reader_ocr.sweep work --queue fila.sqlite --processes 4
+    python -m deep_reader_ocr.sweep status --queue fila.sqlite --watch 30
+    python -m deep_reader_ocr.sweep merge --queue fila.sqlite --output sondagens.csv
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import subprocess
+
+from . import raster_io
+from . import text_index
+from . import project_batch
+from .ocr_pipeline import OCRPipeline
+
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+# Janela usada para medir a vazão recente (ETA)
+RATE_WINDOW_SECONDS = 600
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS rasters (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    name TEXT,
+    width INTEGER,
+    height INTEGER,
+    geotransform TEXT,
+    projection TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    raster_id INTEGER NOT NULL REFERENCES rasters (id),
+    x0 INTEGER, y0 INTEGER, w INTEGER, h INTEGER,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    token TEXT,
+    lease_until REAL,
+    started REAL,
+    finished REAL,
+    soundings INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, lease_until);
+CREATE TABLE IF NOT EXISTS results (
+    raster_id INTEGER NOT NULL,
+    px INTEGER NOT NULL,
+    py INTEGER NOT NULL,
+    depth_cm INTEGER,
+    score REAL,
+    glyph_height REAL,
+    job_id INTEGER,
+    worker TEXT,
+    PRIMARY KEY (raster_id, px, py)
+);
+"""
+
+
+class LeaseLost(Exception):
+    """O lease do bloco expirou e outro worker pode tê-lo assumido"""
+
+
+class JobQueue:
+    """Fila de blocos com lease em um arquivo SQLite"""
+
+    def __init__(self, path, shared_fs=False):
+        """
+        :param shared_fs: Use em sistemas de arquivos de rede: o modo WAL depende de
+            memória compartilhada e só funciona com todos os processos na mesma máquina.
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=DELETE" if shared_fs else "PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA busy_timeout=60000")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- Criação ----------
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def add_raster(self, raster_path, tile_size, clip_size):
+        """Cadastra o raster e seus blocos; rasters já cadastrados são ignorados. Retorna o número de blocos."""
+        raster_path = os.path.abspath(raster_path)
+        if self.conn.execute("SELECT 1 FROM rasters WHERE path=?", (raster_path,)).fetchone():
+            return 0
+        dataset = raster_io.gdal.Open(raster_path, raster_io.gdal.GA_ReadOnly)
+        if dataset is None:
+            raise RuntimeError(f"Não foi possível abrir o raster com GDAL: {raster_path}")
+        width, height = dataset.RasterXSize, dataset.RasterYSize
+        tiles = list(text_index.chart_tiles(width, height, tile_size, clip_size))
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self.conn.execute(
+                "INSERT INTO rasters (path, name, width, height, geotransform, projection) VALUES (?, ?, ?, ?, ?, ?)",
+                (raster_path, os.path.splitext(os.path.basename(raster_path))[0], width, height,
+                 json.dumps(dataset.GetGeoTransform()), dataset.GetProjection()))
+            raster_id = cursor.lastrowid
+            self.conn.executemany("INSERT INTO jobs (raster_id, x0, y0, w, h) VALUES (?, ?, ?, ?, ?)",
+                                  [(raster_id,) + tile for tile in tiles])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(tiles)
+
+    # ---------- Leases ----------
+    def claim(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Reserva o próximo bloco pendente (ou com lease expirado). Retorna a linha
+        do bloco com o token do lease, ou None se não houver trabalho disponível.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Blocos que esgotaram as tentativas (worker morreu várias vezes) são marcados como falha
+            self.conn.execute(
+                "UPDATE jobs SET status=?, error=COALESCE(error, 'lease expirado') "
+                "WHERE status=? AND lease_until<? AND attempts>=?",
+                (JOB_FAILED, JOB_RUNNING, now, max_attempts))
+            row = self.conn.execute(
+                "SELECT jobs.*, rasters.path AS raster_path FROM jobs JOIN rasters ON rasters.id=jobs.raster_id "
+                "WHERE status=? OR (status=? AND lease_until<?) ORDER BY jobs.id LIMIT 1",
+                (JOB_PENDING, JOB_RUNNING, now)).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            token = uuid.uuid4().hex
+            self.conn.execute(
+                "UPDATE jobs SET status=?, attempts=attempts+1, worker=?, token=?, lease_until=?, started=? WHERE id=?",
+                (JOB_RUNNING, worker_id, token, now + lease_seconds, now, row['id']))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        job = dict(row)
+        job['token'] = token
+        return job
+
+    def renew(self, job, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Estende o lease; False se o bloco não pertence mais a este worker."""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET lease_until=? WHERE id=? AND token=? AND status=?",
+            (time.time() + lease_seconds, job['id'], job['token'], JOB_RUNNING))
+        return cursor.rowcount == 1
+
+    def complete(self, job, results, worker_id):
+        """
+        Grava as sondagens e conclui o bloco na mesma transação. A chave
+        (raster, px, py) torna a gravação idempotente: repetir um bloco reescreve
+        as mesmas linhas. Retorna False se o lease foi perdido.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            owner = self.conn.execute("SELECT token, status FROM jobs WHERE id=?", (job['id'],)).fetchone()
+            if owner is None or owner['token'] != job['token'] or owner['status'] != JOB_RUNNING:
+                self.conn.execute("ROLLBACK")
+                return False
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results (raster_id, px, py, depth_cm, score, glyph_height, job_id, worker) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(job['raster_id'], px, py, depth_cm, score, glyph_height, job['id'], worker_id)
+                 for px, py, depth_cm, score, glyph_height in results])
+            self.conn.execute("UPDATE jobs SET status=?, finished=?, soundings=?, error=NULL WHERE id=?",
+                              (JOB_DONE, time.time(), len(results), job['id']))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def fail(self, job, error, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Devolve o bloco para a fila (ou marca falha após max_attempts)."""
+        status = JOB_FAILED if job['attempts'] + 1 >= max_attempts else JOB_PENDING
+        self.conn.execute("UPDATE jobs SET status=?, error=?, token=NULL WHERE id=? AND token=?",
+                          (status, str(error)[:500], job['id'], job['token']))
+
+    def retry_failed(self):
+        cursor = self.conn.execute("UPDATE jobs SET status=?, attempts=0, error=NULL WHERE status=?",
+                                   (JOB_PENDING, JOB_FAILED))
+        return cursor.rowcount
+
+    # ---------- Progresso ----------
+    def progress(self):
+        now = time.time()
+        counts = {row[0]: row[1] for row in self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+        total = sum(counts.values())
+        done = counts.get(JOB_DONE, 0)
+        failed = counts.get(JOB_FAILED, 0)
+        remaining = total - done - failed
+        recent = self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status=? AND finished>=?",
+                                   (JOB_DONE, now - RATE_WINDOW_SECONDS)).fetchone()[0]
+        first_start = self.conn.execute("SELECT MIN(started) FROM jobs").fetchone()[0]
+        if recent:
+            rate = recent / float(max(1.0, min(RATE_WINDOW_SECONDS, now - first_start)))
+        elif done and first_start:
+            rate = done / float(max(1.0, now - first_start))
+        else:
+            rate = 0.0
+        workers = self.conn.execute("SELECT COUNT(DISTINCT worker) FROM jobs WHERE status=? AND lease_until>=?",
+                                    (JOB_RUNNING, now)).fetchone()[0]
+        soundings = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {
+            'total': total, 'done': done, 'failed': failed, 'remaining': remaining,
+            'running': counts.get(JOB_RUNNING, 0), 'active_workers': workers, 'soundings': soundings,
+            'jobs_per_minute': rate * 60.0,
+            'eta_seconds': remaining / rate if rate > 0 else None,
+        }
+
+
+# ---------- Worker ----------
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def process_job(job, pipeline, clip_size, datasets, renew):
+    """
+    Localiza e lê as sondagens de um bloco. renew() estende o lease entre as
+    sondagens e lança LeaseLost se o bloco foi assumido por outro worker.
+    """
+    dataset = datasets.get(job['raster_path'])
+    tile = (job['x0'], job['y0'], job['w'], job['h'])
+    rows = text_index.scan_tile(dataset, tile, clip_size, pipeline._to_gray)
+    # Mesmo formato do índice de texto: a região vai pronta para o pipeline (sem nova detecção)
+    index = text_index.TextIndex(job['raster_path'], rows, [], clip_size)
+    results = []
+    for i in range(len(index)):
+        px, py = index.center(i)
+        size = index.clip_size_for(i, OCRPipeline.CLIP_SIZES, clip_size)
+        clip = raster_io.read_clip(dataset, px, py, size)
+        if clip is None:
+            continue
+        depth_cm, candidates = pipeline.process(clip, index.region_in_clip(i, px, py, size))
+        results.append((px, py, None if depth_cm == OCRPipeline.OCR_FAILED else depth_cm,
+                        pipeline._best_score(candidates), float(index.boxes[i, 4])))
+        renew()
+    return results
+
+
+def run_worker(queue_path, shared_fs=False, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS,
+               engine_threads=0, idle_exit=True, poll_seconds=10):
+    """Laço do worker: reserva blocos até a fila esvaziar."""
+    queue = JobQueue(queue_path, shared_fs)
+    config = dict(queue.get_meta("config", {}))
+    clip_size = queue.get_meta("clip_size", 96)
+    # Cada processo usa uma fatia dos núcleos; o paralelismo vem do número de processos
+    config["concurrency"] = {"workers": 1, "engine_threads": engine_threads, "reserve_ui_cores": 0}
+    pipeline = OCRPipeline.from_config(config)
+    pipeline._get_easyocr_reader()
+    me = worker_id()
+    datasets = raster_io.DatasetCache()
+    print(f"🛠️ Worker {me} iniciado ({queue_path})", file=sys.stderr)
+
+    processed = 0
+    while True:
+        job = queue.claim(me, lease_seconds, max_attempts)
+        if job is None:
+            if idle_exit and queue.progress()['running'] == 0:
+                break
+            # Há blocos em execução em outros workers: aguarda (podem voltar se o lease expirar)
+            time.sleep(poll_seconds)
+            continue
+
+        def renew(job=job):
+            if not queue.renew(job, lease_seconds):
+                raise LeaseLost(f"bloco {job['id']}")
+
+        try:
+            results = process_job(job, pipeline, clip_size, datasets, renew)
+            if queue.complete(job, results, me):
+                processed += 1
+                print(f"✅ Bloco {job['id']}: {len(results)} sondagem(ns)", file=sys.stderr)
+        except LeaseLost as e:
+            print(f"⚠️ Lease perdido ({e}); outro worker continua o bloco", file=sys.stderr)
+        except Exception as e:
+            print(f"❌ Bloco {job['id']} falhou: {e}", file=sys.stderr)
+            queue.fail(job, e, max_attempts)
+    queue.close()
+    print(f"🏁 Worker {me} encerrado: {processed} bloco(s)", file=sys.stderr)
+    return processed
+
+
+def spawn_workers(args):
+    """Inicia N processos worker locais e aguarda todos terminarem."""
+    cpu = os.cpu_count() or 1
+    engine_threads = args.engine_threads or max(1, cpu // args.processes)
+    command = [sys.executable, "-m", f"{__package__}.sweep"] + (["--shared-fs"] if args.shared_fs else []) + [
+        "work", "--queue", args.queue, "--processes", "1", "--lease", str(args.lease),
+        "--max-attempts", str(args.max_attempts), "--engine-threads", str(engine_threads)]
+    processes = [subprocess.Popen(command) for _ in range(args.processes)]
+    return max(p.wait() for p in processes)
+
+
+# ---------- Coordenador ----------
+def _format_eta(seconds):
+    if seconds is None:
+        return "—"
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}h{rest // 60:02d}min"
+
+
+def status_text(queue):
+    info = queue.progress()
+    percent = 100.0 * info['done'] / info['total'] if info['total'] else 0.0
+    return (f"📊 Blocos: {info['done']}/{info['total']} ({percent:.1f}%) | em execução: {info['running']} | " +
+            f"falhas: {info['failed']} | workers ativos: {info['active_workers']} | " +
+            f"sondagens: {info['soundings']} | {info['jobs_per_minute']:.1f} blocos/min | ETA: {_format_eta(info['eta_seconds'])}")
+
+
+# ---------- Merge ----------
+def merge_results(queue, target_crs=None, dedup_distance=None):
+    """
+    Une os resultados de todos os rasters em um só conjunto de pontos, no CRS
+    de cada carta ou reprojetado para target_crs (ex.: EPSG:4326).
+    """
+    osr = None
+    target = None
+    if target_crs:
+        from osgeo import osr
+        target = osr.SpatialReference()
+        target.SetFromUserInput(target_crs)
+        target.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+    points = []
+    for raster in queue.conn.execute("SELECT * FROM rasters"):
+        geotransform = json.loads(raster['geotransform'])
+        transform = None
+        if target is not None and raster['projection']:
+            source = osr.SpatialReference()
+            source.ImportFromWkt(raster['projection'])
+            source.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            transform = osr.CoordinateTransformation(source, target)
+        rows = queue.conn.execute("SELECT * FROM results WHERE raster_id=? AND depth_cm IS NOT NULL", (raster['id'],))
+        for row in rows:
+            x, y = raster_io.pixel_to_map(geotransform, row['px'], row['py'])
+            x_ref, y_ref = raster_io.pixel_to_map(geotransform, row['px'] + row['glyph_height'], row['py'])
+            if transform is not None:
+                x, y = transform.TransformPoint(x, y)[:2]
+                x_ref, y_ref = transform.TransformPoint(x_ref, y_ref)[:2]
+            points.append({
+                'x': x, 'y': y, 'depth_cm': row['depth_cm'], 'chart': raster['name'], 'score': row['score'] or 0.0,
+                'tolerance': dedup_distance or ((x_ref - x) ** 2 + (y_ref - y) ** 2) ** 0.5,
+            })
+    return project_batch.deduplicate(points), len(points)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Varredura distribuída de cartas náuticas do Depth Reader OCR")
+    parser.add_argument("--shared-fs", action="store_true",
+                        help="Fila em sistema de arquivos de rede (desativa o modo WAL)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_init = sub.add_parser("init", help="Cria (ou amplia) a fila a partir de uma lista de rasters")
+    p_init.add_argument("--queue", required=True)
+    p_init.add_argument("--config", help="JSON com a configuração do pipeline (chaves da aba Avançado)")
+    p_init.add_argument("--clip-size", type=int, default=96)
+    p_init.add_argument("--tile-size", type=int, default=text_index.TILE_SIZE)
+    p_init.add_argument("rasters", nargs="+")
+
+    p_work = sub.add_parser("work", help="Processa blocos da fila até ela esvaziar")
+    p_work.add_argument("--queue", required=True)
+    p_work.add_argument("--processes", type=int, default=1, help="Processos worker locais")
+    p_work.add_argument("--engine-threads", type=int, default=0, help="Threads por engine em cada processo (0 = automático)")
+    p_work.add_argument("--lease", type=int, default=DEFAULT_LEASE_SECONDS, help="Duração do lease (s)")
+    p_work.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+
+    p_status = sub.add_parser("status", help="Progresso, vazão e ETA")
+    p_status.add_argument("--queue", required=True)
+    p_status.add_argument("--watch", type=int, default=0, help="Atualiza a cada N segundos até concluir")
+    p_status.add_argument("--retry-failed", action="store_true", help="Devolve os blocos com falha para a fila")
+
+    p_merge = sub.add_parser("merge", help="Gera o CSV final sem duplicatas")
+    p_merge.add_argument("--queue", required=True)
+    p_merge.add_argument("--output", required=True)
+    p_merge.add_argument("--crs", help="CRS de saída (ex.: EPSG:4326); padrão: CRS de cada carta")
+    p_merge.add_argument("--dedup-distance", type=float, help="Distância de duplicata (unidades do CRS de saída)")
+    args = parser.parse_args(argv)
+
+    if args.command == "work" and args.processes > 1:
+        return spawn_workers(args)
+
+    queue = JobQueue(args.queue, args.shared_fs)
+    if args.command == "init":
+        config = {}
+        if args.config:
+            with open(args.config, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        if queue.get_meta("config") is None:
+            queue.set_meta("config", config)
+            queue.set_meta("clip_size", args.clip_size)
+        clip_size = queue.get_meta("clip_size")
+        for raster_path in args.rasters:
+            n_tiles = queue.add_raster(raster_path, args.tile_size, clip_size)
+            print(f"🗺️ {raster_path}: {n_tiles} bloco(s)", file=sys.stderr)
+        print(status_text(queue))
+    elif args.command == "work":
+        queue.close()
+        run_worker(args.queue, args.shared_fs, args.lease, args.max_attempts, args.engine_threads)
+    elif args.command == "status":
+        if args.retry_failed:
+            print(f"🔁 {queue.retry_failed()} bloco(s) devolvidos para a fila")
+        print(status_text(queue))
+        while args.watch and queue.progress()['remaining']:
+            time.sleep(args.watch)
+            print(status_text(queue))
+    elif args.command == "merge":
+        points, total = merge_results(queue, args.crs, args.dedup_distance)
+        project_batch.write_csv(points, args.output)
+        print(f"💾 {len(points)} sondagem(ns) em {args.output} ({total - len(points)} duplicata(s) removidas)",
+              file=sys.stderr)
+    queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
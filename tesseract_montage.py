@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Montagem das variantes de um clique em uma única imagem para o Tesseract
+Cada chamada do pytesseract inicia um processo e carrega o modelo; com a
+montagem, todas as variantes rotacionadas/filtradas do clique são empilhadas
+(com espaçamento) e lidas em uma única chamada de image_to_data. As palavras
+voltam para a variante de origem pela posição da caixa.
+"""
+
+import numpy as np
+
+# Margem ao redor da montagem e espaçamento mínimo entre as variantes (px)
+MARGIN = 10
+MIN_GAP = 16
+# Espaçamento relativo à altura da variante (evita que o Tesseract junte linhas)
+GAP_FACTOR = 0.5
+
+
+def _dark_on_light(img):
+    """Texto escuro sobre fundo claro (as saídas binárias dos filtros são invertidas)"""
+    return 255 - img if img.mean() < 127 else img
+
+
+def build(images):
+    """
+    Empilha as imagens (cinza, uint8) na vertical sobre fundo branco.
+    Retorna (montagem, faixas), com faixas = [(y0, y1)] de cada imagem.
+    """
+    gap = max(MIN_GAP, int(GAP_FACTOR * max(img.shape[0] for img in images)))
+    width = max(img.shape[1] for img in images) + 2 * MARGIN
+    height = sum(img.shape[0] for img in images) + gap * (len(images) - 1) + 2 * MARGIN
+    montage = np.full((height, width), 255, dtype=np.uint8)
+    bands = []
+    y = MARGIN
+    for img in images:
+        h, w = img.shape[:2]
+        montage[y:y + h, MARGIN:MARGIN + w] = _dark_on_light(img)
+        bands.append((y, y + h))
+        y += h + gap
+    return montage, bands
+
+
+def split(data, bands):
+    """
+    Distribui as palavras de image_to_data entre as imagens da montagem pelo
+    centro vertical da caixa. Retorna uma lista (por imagem) de [(texto, conf)].
+    """
+    per_image = [[] for _ in bands]
+    starts = np.array([y0 for y0, _ in bands])
+    for i, text in enumerate(data['text']):
+        center = int(data['top'][i]) + int(data['height'][i]) / 2.0
+        k = int(np.searchsorted(starts, center, side='right')) - 1
+        if 0 <= k < len(bands) and center < bands[k][1]:
+            per_image[k].append((text, data['conf'][i]))
+    return per_image
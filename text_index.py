@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de candidatos de texto de uma carta inteira (sem Qt)
+A carta é varrida em blocos com o detector de glifos de text_regions; cada
+sondagem candidata é guardada com sua caixa, altura do glifo e orientação
+estimada. O índice é gravado ao lado do raster (.dro_text.npz) e permite que
+o clique vá direto ao reconhecimento, sem detectar o texto de novo.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from . import raster_io
+from . import text_regions
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".dro_text.npz"
+FALLBACK_DIR = os.path.join(os.path.expanduser("~"), ".depth_reader_ocr", "text_index")
+
+# Varredura da carta: blocos grandes com sobreposição maior que uma sondagem
+TILE_SIZE = 1024
+TILE_OVERLAP = 96
+# Bloco do threshold adaptativo na varredura (próximo ao tamanho do recorte)
+SCAN_BLOCK_SIZE = 31
+# Uma sondagem tem no máximo este número de dígitos
+MAX_SOUNDING_GLYPHS = 4
+
+# Colunas do índice (uma linha por candidato, em pixels do raster)
+COLUMNS = ('x0', 'y0', 'x1', 'y1', 'glyph_height', 'n_glyphs', 'orientation')
+
+
+def _never_cancelled():
+    return False
+
+
+def _no_progress(message, percent):
+    pass
+
+
+def chart_tiles(width, height, tile_size, clip_size):
+    """Blocos (x0, y0, w, h) que cobrem a carta, com sobreposição maior que uma sondagem"""
+    tile_size = max(tile_size, 2 * clip_size)
+    step = tile_size - TILE_OVERLAP
+    for y0 in range(0, max(1, height - TILE_OVERLAP), step):
+        for x0 in range(0, max(1, width - TILE_OVERLAP), step):
+            yield x0, y0, min(tile_size, width - x0), min(tile_size, height - y0)
+
+
+def find_soundings(gray, clip_size):
+    """
+    Sondagens candidatas de uma imagem cinza já lida. Retorna tuplas na ordem de
+    COLUMNS, em pixels da imagem (NaN na orientação de sondagens de um dígito).
+    """
+    binary = text_regions.binarize_ink(gray, SCAN_BLOCK_SIZE)
+    glyphs = text_regions.find_glyph_components(gray, binary, max_glyph_size=clip_size / 2.0)
+    rows = []
+    for cluster in text_regions.group_glyphs(glyphs):
+        if len(cluster) > MAX_SOUNDING_GLYPHS:
+            continue
+        region = text_regions.cluster_region(cluster, gray.shape)
+        bx0, by0, bx1, by1 = region['bbox']
+        if bx1 - bx0 >= clip_size or by1 - by0 >= clip_size:
+            continue
+        orientation = text_regions.estimate_orientation(cluster)
+        rows.append((bx0, by0, bx1, by1, region['glyph_height'], region['n_glyphs'],
+                     np.nan if orientation is None else orientation))
+    return rows
+
+
+def scan_tile(dataset, tile, clip_size, to_gray):
+    """
+    Localiza as sondagens candidatas de um bloco (ver find_soundings), em pixels
+    da carta. Cada sondagem pertence ao bloco que contém seu centro fora da
+    sobreposição, então não há repetições entre blocos vizinhos.
+    """
+    x0, y0, w, h = tile
+    width, height = dataset.RasterXSize, dataset.RasterYSize
+    half_overlap = TILE_OVERLAP // 2
+    gray = to_gray(raster_io.read_window(dataset, x0, y0, w, h))
+    # Limites do "núcleo" do bloco (a sobreposição pertence ao bloco vizinho)
+    core_x0 = x0 + (half_overlap if x0 > 0 else 0)
+    core_y0 = y0 + (half_overlap if y0 > 0 else 0)
+    core_x1 = x0 + w - (half_overlap if x0 + w < width else 0)
+    core_y1 = y0 + h - (half_overlap if y0 + h < height else 0)
+    rows = []
+    for bx0, by0, bx1, by1, glyph_height, n_glyphs, orientation in find_soundings(gray, clip_size):
+        cx, cy = x0 + (bx0 + bx1) / 2.0, y0 + (by0 + by1) / 2.0
+        if core_x0 <= cx < core_x1 and core_y0 <= cy < core_y1:
+            rows.append((x0 + bx0, y0 + by0, x0 + bx1, y0 + by1, glyph_height, n_glyphs, orientation))
+    return rows
+
+
+def scan_chart(dataset, clip_size, to_gray, is_cancelled=_never_cancelled, progress=_no_progress,
+               tile_size=TILE_SIZE):
+    """Localiza as sondagens candidatas da carta inteira (ver scan_tile), ou None se cancelado."""
+    tiles = list(chart_tiles(dataset.RasterXSize, dataset.RasterYSize, tile_size, clip_size))
+    rows = []
+    for done, tile in enumerate(tiles, 1):
+        if is_cancelled():
+            return None
+        rows.extend(scan_tile(dataset, tile, clip_size, to_gray))
+        progress(f"🗂️ Indexando texto da carta: bloco {done}/{len(tiles)}", int(done / len(tiles) * 100))
+    return rows
+
+
+def _raster_signature(raster_path, dataset=None):
+    """Identifica a versão do arquivo do raster (tamanho, data de modificação e dimensões)"""
+    stat = os.stat(raster_path)
+    signature = [INDEX_VERSION, stat.st_size, stat.st_mtime_ns]
+    if dataset is not None:
+        signature += [dataset.RasterXSize, dataset.RasterYSize]
+    return signature
+
+
+def index_path_for(raster_path):
+    """Índice ao lado do raster; em pastas somente leitura, no diretório do usuário"""
+    path = raster_path + INDEX_SUFFIX
+    if os.access(os.path.dirname(os.path.abspath(raster_path)), os.W_OK):
+        return path
+    digest = hashlib.md5(os.path.abspath(raster_path).encode("utf-8")).hexdigest()
+    return os.path.join(FALLBACK_DIR, digest + ".npz")
+
+
+class TextIndex:
+    """Candidatos de texto de uma carta, ordenados pelo centro em Y para consultas por janela"""
+
+    def __init__(self, raster_path, rows, signature, clip_size):
+        self.raster_path = raster_path
+        self.signature = list(signature)
+        self.clip_size = clip_size
+        data = np.array(rows, dtype=np.float64).reshape(-1, len(COLUMNS))
+        order = np.argsort((data[:, 1] + data[:, 3]) / 2.0, kind='stable')
+        self.boxes = data[order]
+        self.cx = (self.boxes[:, 0] + self.boxes[:, 2]) / 2.0
+        self.cy = (self.boxes[:, 1] + self.boxes[:, 3]) / 2.0
+        # Candidatos já capturados nesta sessão (não são mais destacados no canvas)
+        self.captured = np.zeros(len(self.boxes), dtype=bool)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    @property
+    def nbytes(self):
+        return self.boxes.nbytes + self.cx.nbytes + self.cy.nbytes + self.captured.nbytes
+
+    # ---------- Consultas ----------
+    def query_window(self, x0, y0, x1, y1):
+        """Índices dos candidatos com centro dentro da janela (pixels)"""
+        lo, hi = np.searchsorted(self.cy, [y0, y1])
+        if hi <= lo:
+            return np.empty(0, dtype=np.int64)
+        inside = (self.cx[lo:hi] >= x0) & (self.cx[lo:hi] <= x1)
+        return np.nonzero(inside)[0] + lo
+
+    def nearest(self, px, py, max_distance):
+        """Candidato cuja caixa está mais próxima do pixel (dentro de max_distance), ou None"""
+        # A janela considera o centro; uma caixa pode chegar a meio recorte dele
+        margin = max_distance + self.clip_size / 2.0
+        candidates = self.query_window(px - margin, py - margin, px + margin, py + margin)
+        if candidates.size == 0:
+            return None
+        boxes = self.boxes[candidates]
+        dx = np.maximum.reduce([boxes[:, 0] - px, np.zeros(len(boxes)), px - boxes[:, 2]])
+        dy = np.maximum.reduce([boxes[:, 1] - py, np.zeros(len(boxes)), py - boxes[:, 3]])
+        distance = np.hypot(dx, dy)
+        best = int(np.argmin(distance))
+        if distance[best] > max_distance:
+            return None
+        return int(candidates[best])
+
+    def center(self, i):
+        return int(round(self.cx[i])), int(round(self.cy[i]))
+
+    def clip_size_for(self, i, sizes, max_size):
+        """Menor janela disponível que contém a caixa com margem de um glifo"""
+        x0, y0, x1, y1, glyph_height = self.boxes[i, :5]
+        needed = max(x1 - x0, y1 - y0) + 2 * glyph_height
+        for size in sizes:
+            if needed <= size <= max_size:
+                return size
+        return max_size
+
+    def region_in_clip(self, i, pixel_x, pixel_y, size):
+        """Região no formato de text_regions, em coordenadas do recorte centrado em (pixel_x, pixel_y)"""
+        x0, y0, x1, y1, glyph_height, n_glyphs, orientation = self.boxes[i]
+        origin_x, origin_y = pixel_x - size // 2, pixel_y - size // 2
+        bbox = (int(x0 - origin_x), int(y0 - origin_y), int(np.ceil(x1 - origin_x)), int(np.ceil(y1 - origin_y)))
+        return {
+            'bbox': bbox,
+            'glyph_height': float(glyph_height),
+            'n_glyphs': int(n_glyphs),
+            'touches_border': bbox[0] <= 0 or bbox[1] <= 0 or bbox[2] >= size or bbox[3] >= size,
+            'distance': 0.0,
+            'orientation': None if np.isnan(orientation) else float(orientation),
+        }
+
+    # ---------- Persistência ----------
+    def save(self, path=None):
+        path = path or index_path_for(self.raster_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(path, boxes=self.boxes, signature=np.array(self.signature, dtype=np.int64),
+                            clip_size=np.array(self.clip_size))
+        return path
+
+    @classmethod
+    def load(cls, raster_path, clip_size, dataset=None):
+        """Carrega o índice gravado se ainda corresponder ao raster e ao tamanho de recorte; senão None"""
+        path = index_path_for(raster_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                signature = data['signature'].tolist()
+                current = _raster_signature(raster_path, dataset)
+                if signature[:len(current)] != current or int(data['clip_size']) != clip_size:
+                    return None
+                return cls(raster_path, data['boxes'], signature, clip_size)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Índice de texto inválido ({path}): {e}")
+            return None
+
+
+def build_text_index(raster_path, clip_size, to_gray, is_cancelled=_never_cancelled, progress=_no_progress):
+    """Varre a carta e retorna o TextIndex (None se cancelado)"""
+    dataset = raster_io.gdal.Open(raster_path, raster_io.gdal.GA_ReadOnly)
+    if dataset is None:
+        raise RuntimeError(f"Não foi possível abrir o raster com GDAL: {raster_path}")
+    signature = _raster_signature(raster_path, dataset)
+    rows = scan_chart(dataset, clip_size, to_gray, is_cancelled, progress)
+    dataset = None
+    if rows is None:
+        return None
+    return TextIndex(raster_path, rows, signature, clip_size)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Localização de texto (blobs de dígitos) para o plugin Depth Reader OCR
+Detecta componentes com tamanho de glifo, agrupa dígitos vizinhos em
+sondagens e seleciona a sondagem mais próxima do ponto clicado.
+"""
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Limites de forma para aceitar um componente como glifo
+MIN_GLYPH_SIZE = 4
+MAX_GLYPH_FRACTION = 0.6
+MAX_GLYPH_ASPECT = 6.0
+MIN_FILL_RATIO = 0.1
+
+# Dois glifos pertencem à mesma sondagem se a distância entre suas caixas
+# for menor que esta fração do maior glifo e os tamanhos forem compatíveis
+GROUP_GAP_FACTOR = 0.6
+GROUP_SIZE_RATIO = 2.0
+
+# Distância máxima (fração do recorte) entre o clique e a sondagem escolhida
+MAX_CENTER_DISTANCE = 0.35
+
+# Altura de glifo alvo após a ampliação (faixa em que EasyOCR e Tesseract rendem melhor)
+TARGET_GLYPH_HEIGHT = 32
+DEFAULT_UPSCALE = 2.0
+MIN_UPSCALE = 1.0
+MAX_UPSCALE = 4.0
+
+
+def binarize_ink(gray, block_size=None):
+    """Binariza tinta escura sobre fundo claro (tinta = 255)"""
+    if block_size is None:
+        block_size = max(11, (min(gray.shape[:2]) // 6) | 1)
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, block_size, 10)
+
+
+def find_glyph_components(gray, binary=None, max_glyph_size=None):
+    """
+    Retorna as caixas (x, y, w, h) dos componentes com forma de glifo.
+    Linhas de contorno e manchas que atravessam o recorte são descartadas.
+    max_glyph_size limita o lado do glifo em pixels (em blocos grandes da carta).
+    """
+    if binary is None:
+        binary = binarize_ink(gray)
+    n_labels, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    img_h, img_w = binary.shape[:2]
+    max_side = MAX_GLYPH_FRACTION * min(img_h, img_w)
+    if max_glyph_size is not None:
+        max_side = min(max_side, max_glyph_size)
+
+    glyphs = []
+    for k in range(1, n_labels):
+        x, y, w, h, area = stats[k]
+        longest, shortest = max(w, h), max(1, min(w, h))
+        if longest < MIN_GLYPH_SIZE or longest > max_side:
+            continue
+        if longest / shortest > MAX_GLYPH_ASPECT:
+            continue
+        if area < MIN_FILL_RATIO * w * h:
+            continue
+        glyphs.append((int(x), int(y), int(w), int(h)))
+    return glyphs
+
+
+def _box_gap(a, b):
+    """Maior distância entre as bordas de duas caixas (0 se sobrepostas)"""
+    gap_x = max(a[0] - (b[0] + b[2]), b[0] - (a[0] + a[2]), 0)
+    gap_y = max(a[1] - (b[1] + b[3]), b[1] - (a[1] + a[3]), 0)
+    return max(gap_x, gap_y)
+
+
+def group_glyphs(glyphs):
+    """Agrupa glifos vizinhos (dígitos de uma mesma sondagem) por union-find"""
+    parent = list(range(len(glyphs)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(glyphs)):
+        size_i = max(glyphs[i][2], glyphs[i][3])
+        for j in range(i + 1, len(glyphs)):
+            size_j = max(glyphs[j][2], glyphs[j][3])
+            if max(size_i, size_j) > GROUP_SIZE_RATIO * min(size_i, size_j):
+                continue
+            if _box_gap(glyphs[i], glyphs[j]) <= GROUP_GAP_FACTOR * max(size_i, size_j):
+                parent[find(i)] = find(j)
+
+    clusters = {}
+    for i, glyph in enumerate(glyphs):
+        clusters.setdefault(find(i), []).append(glyph)
+    return list(clusters.values())
+
+
+def cluster_region(cluster, img_shape):
+    """Resume um grupo de glifos: caixa envolvente, altura típica e contato com a borda"""
+    x0 = min(g[0] for g in cluster)
+    y0 = min(g[1] for g in cluster)
+    x1 = max(g[0] + g[2] for g in cluster)
+    y1 = max(g[1] + g[3] for g in cluster)
+    img_h, img_w = img_shape[:2]
+    return {
+        'bbox': (x0, y0, x1, y1),
+        'glyph_height': float(np.median([max(g[2], g[3]) for g in cluster])),
+        'n_glyphs': len(cluster),
+        'touches_border': x0 <= 0 or y0 <= 0 or x1 >= img_w or y1 >= img_h,
+    }
+
+
+def estimate_orientation(cluster):
+    """
+    Ângulo (graus, em (-90, 90]) da linha que passa pelos centros dos dígitos,
+    no mesmo sentido de cv2.getRotationMatrix2D: rotacionar o recorte por este
+    ângulo (ou por ele + 180) deixa a sondagem na horizontal. None com um só glifo.
+    """
+    if len(cluster) < 2:
+        return None
+    centers = np.array([(g[0] + g[2] / 2.0, g[1] + g[3] / 2.0) for g in cluster])
+    centered = centers - centers.mean(axis=0)
+    # Direção principal (PCA) dos centros
+    _, _, vt = np.linalg.svd(centered, full_matrices=False)
+    dx, dy = vt[0]
+    angle = float(np.degrees(np.arctan2(dy, dx)))
+    if angle <= -90:
+        angle += 180
+    elif angle > 90:
+        angle -= 180
+    return angle
+
+
+def _distance_to_box(point, bbox):
+    px, py = point
+    x0, y0, x1, y1 = bbox
+    dx = max(x0 - px, 0, px - x1)
+    dy = max(y0 - py, 0, py - y1)
+    return float(np.hypot(dx, dy))
+
+
+def locate_click_region(gray, center=None, binary=None):
+    """
+    Detecta as sondagens do recorte e retorna a mais próxima do clique
+    (centro do recorte), ou None se não houver texto perto do ponto.
+    """
+    found = locate_click_glyphs(gray, center, binary)
+    return found[0] if found is not None else None
+
+
+def locate_click_glyphs(gray, center=None, binary=None):
+    """Como locate_click_region, mas retorna (região, glifos do grupo), ou None."""
+    if cv2 is None:
+        return None
+    img_h, img_w = gray.shape[:2]
+    if center is None:
+        center = (img_w / 2.0, img_h / 2.0)
+
+    glyphs = find_glyph_components(gray, binary)
+    if not glyphs:
+        return None
+
+    best, best_key = None, None
+    for cluster in group_glyphs(glyphs):
+        region = cluster_region(cluster, gray.shape)
+        distance = _distance_to_box(center, region['bbox'])
+        # Em caso de empate (clique dentro de duas caixas) prefere a sondagem com mais dígitos
+        key = (distance, -region['n_glyphs'])
+        if best_key is None or key < best_key:
+            best, best_key = (region, cluster), key
+
+    if best_key[0] > MAX_CENTER_DISTANCE * min(img_h, img_w):
+        return None
+    best[0]['distance'] = best_key[0]
+    return best
+
+
+def crop_region(gray, region, margin_factor=0.5):
+    """
+    Recorta a região com margem proporcional à altura do glifo e completa
+    com a cor de fundo até um quadrado do tamanho da diagonal, para que as
+    rotações posteriores não cortem os dígitos.
+    """
+    img_h, img_w = gray.shape[:2]
+    x0, y0, x1, y1 = region['bbox']
+    margin = int(np.ceil(margin_factor * region['glyph_height']))
+    x0, y0 = max(0, x0 - margin), max(0, y0 - margin)
+    x1, y1 = min(img_w, x1 + margin), min(img_h, y1 + margin)
+    crop = gray[y0:y1, x0:x1]
+
+    side = int(np.ceil(np.hypot(crop.shape[0], crop.shape[1])))
+    pad_y, pad_x = side - crop.shape[0], side - crop.shape[1]
+    background = int(np.median(gray))
+    return cv2.copyMakeBorder(
+        crop, pad_y // 2, pad_y - pad_y // 2, pad_x // 2, pad_x - pad_x // 2,
+        cv2.BORDER_CONSTANT, value=background)
+
+
+def choose_upscale_factor(glyph_height):
+    """
+    Fator de ampliação que leva o glifo medido à altura alvo, em passos de 0.5.
+    Sem medição, mantém o fator 2x histórico.
+    """
+    if not glyph_height:
+        return DEFAULT_UPSCALE
+    factor = TARGET_GLYPH_HEIGHT / float(glyph_height)
+    factor = round(factor * 2) / 2.0
+    return min(MAX_UPSCALE, max(MIN_UPSCALE, factor))